@@ -1,38 +1,30 @@
 
 from flask import Blueprint, request, jsonify
+from sqlalchemy import tuple_
 from extensions import db
 from models import User, ServiceProvider, AuditLog
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from werkzeug.security import generate_password_hash
-from functools import wraps
+from pagination import InvalidPageRequest, decode_cursor, page, parse_datetime, parse_limit, parse_uuid, parse_uuid_list
+import audit_log
+import exports
+import provider_availability
+from passwords import hash_password
+from auth import admin_required, current_identity, invalidate_user
+from instrumentation import query_budget
+from replicas import use_primary
 import uuid
+from datetime import datetime
 
 admin_bp = Blueprint('admin_bp', __name__)
 
-def admin_required():
-    def wrapper(fn):
-        @wraps(fn)
-        @jwt_required()
-        def decorator(*args, **kwargs):
-            claims = get_jwt()
-            if claims.get("role") != "Admin":
-                return jsonify({"msg": "Admins only!"}), 403
-            return fn(*args, **kwargs)
-        return decorator
-    return wrapper
+VALID_ROLES = ['Admin', 'Resident', 'Staff']
 
 def log_admin_action(admin_id, action, target_id=None, details=None):
-    try:
-        log = AuditLog(
-            admin_id=admin_id,
-            action=action,
-            target_id=target_id,
-            details=details
-        )
-        db.session.add(log)
-        # We don't commit here to allow the caller to commit as part of the transaction
-    except Exception as e:
-        print(f"Failed to create audit log: {e}")
+    # Written by the audit writer once the caller's transaction commits
+    audit_log.record(admin_id, action, target_id=target_id, details=details)
+
+@admin_bp.errorhandler(InvalidPageRequest)
+def invalid_page_request(e):
+    return jsonify({"msg": str(e)}), 400
 
 @admin_bp.route('/users', methods=['POST'])
 @admin_required()
@@ -48,20 +40,20 @@ def create_user():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({"msg": "Email already exists"}), 409
 
-    if data['role'] not in ['Admin', 'Resident', 'Staff']: 
+    if data['role'] not in VALID_ROLES: 
         return jsonify({"msg": "Invalid role"}), 400
 
-    # Hierarchical Admin Check
+    # Hierarchical Admin Check. Granting admin rights is checked against the
+    # (cached) user row rather than token claims, which may be minutes old.
     if data['role'] == 'Admin':
-        current_user_id = get_jwt_identity()
-        current_admin = User.query.get(current_user_id)
-        if not current_admin or not current_admin.is_super_admin:
+        current_admin = current_identity().user()
+        if not current_admin or not current_admin['is_super_admin']:
             return jsonify({"msg": "Unauthorized: Only Super Admins can create new Admins"}), 403
 
     try:
         new_user = User(
             email=data['email'],
-            password_hash=generate_password_hash(data['password']),
+            password_hash=hash_password(data['password']),
             role=data['role'],
             is_super_admin=False, # New admins are never super admins
             first_name=data['first_name'],
@@ -72,9 +64,8 @@ def create_user():
         db.session.add(new_user)
         db.session.flush() # Get ID
         
-        current_user_id = get_jwt_identity()
         log_admin_action(
-            admin_id=current_user_id,
+            admin_id=current_identity().user_id,
             action='CREATE_USER',
             target_id=new_user.id,
             details={'email': new_user.email, 'role': new_user.role}
@@ -88,23 +79,53 @@ def create_user():
         return jsonify({"msg": str(e)}), 500
 
 @admin_bp.route('/users', methods=['GET'])
+@query_budget(1)
 @admin_required()
 def get_users():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    if not current_user:
-        return jsonify({"msg": "User not found"}), 404
-
     query = User.query
     
     # Filter out admins if the requester is not a super admin
-    if not current_user.is_super_admin:
+    if not current_identity().is_super_admin:
         query = query.filter(User.role != 'Admin')
     
     users = query.all()
     return jsonify([u.to_dict() for u in users]), 200
 
+@admin_bp.route('/users/<user_id>/role', methods=['PUT'])
+@admin_required()
+def update_user_role(user_id):
+    data = request.get_json()
+    role = data.get('role')
+    if role not in VALID_ROLES:
+        return jsonify({"msg": "Invalid role"}), 400
+
+    current_admin = current_identity().user()
+    if not current_admin or not current_admin['is_super_admin']:
+        return jsonify({"msg": "Unauthorized: Only Super Admins can change roles"}), 403
+
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        return jsonify({"msg": "User not found"}), 404
+    user = db.session.get(User, user_uuid)
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+    if user.is_super_admin:
+        return jsonify({"msg": "Super Admin roles cannot be changed"}), 400
+
+    previous_role = user.role
+    user.role = role
+    log_admin_action(
+        admin_id=current_identity().user_id,
+        action='UPDATE_USER_ROLE',
+        target_id=user.id,
+        details={'from': previous_role, 'to': role}
+    )
+    db.session.commit()
+    # Drop the cached row; the user's token claims follow on their next refresh
+    invalidate_user(user.id)
+    return jsonify({"msg": "Role updated"}), 200
+
 @admin_bp.route('/service-providers', methods=['POST'])
 @admin_required()
 def create_service_provider():
@@ -120,6 +141,12 @@ def create_service_provider():
     if data['service_type'] not in valid_types:
         return jsonify({"msg": f"Invalid service type. Must be one of {valid_types}"}), 400
 
+    availability = data.get('availability', '9 AM - 6 PM')
+    try:
+        provider_availability.parse(availability)
+    except provider_availability.InvalidAvailability as e:
+        return jsonify({"msg": f"Invalid availability: {e}"}), 400
+
     try:
         new_provider = ServiceProvider(
             name=data['name'],
@@ -128,15 +155,14 @@ def create_service_provider():
             rating=data.get('rating', 4.5),
             is_verified=True, # Admins creating them implies verification
             photo_url=data.get('photo_url'),
-            availability=data.get('availability', '9 AM - 6 PM')
+            availability=availability
         )
         
         db.session.add(new_provider)
         db.session.flush()
         
-        current_user_id = get_jwt_identity()
         log_admin_action(
-            admin_id=current_user_id,
+            admin_id=current_identity().user_id,
             action='CREATE_SERVICE_PROVIDER',
             target_id=new_provider.id,
             details={'name': new_provider.name, 'type': new_provider.service_type}
@@ -148,3 +174,68 @@ def create_service_provider():
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": str(e)}), 500
+
+@admin_bp.route('/audit-logs', methods=['GET'])
+@use_primary
+@admin_required()
+def get_audit_logs():
+    # Entries this worker has queued but not yet written should be visible too; if the
+    # database refuses them they stay spooled, and the log is still readable
+    audit_log.writer.flush_quietly()
+
+    limit = parse_limit()
+    query = db.session.query(AuditLog, User.email).outerjoin(User, User.id == AuditLog.admin_id)
+
+    admin_ids = parse_uuid_list('admin_id')
+    if admin_ids:
+        query = query.filter(AuditLog.admin_id.in_(admin_ids))
+    actions = [a for raw in request.args.getlist('action') for a in raw.split(',') if a]
+    if actions:
+        query = query.filter(AuditLog.action.in_(actions))
+    date_from = parse_datetime('from')
+    if date_from:
+        query = query.filter(AuditLog.timestamp >= date_from)
+    date_to = parse_datetime('to')
+    if date_to:
+        query = query.filter(AuditLog.timestamp < date_to)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        timestamp, log_id = decode_cursor(cursor, 2)
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            raise InvalidPageRequest('Invalid cursor')
+        query = query.filter(
+            tuple_(AuditLog.timestamp, AuditLog.id) < tuple_(timestamp, parse_uuid(log_id, 'cursor'))
+        )
+
+    # Newest first
+    rows = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+    rows, next_cursor = page(rows, limit, key=lambda row: (row.AuditLog.timestamp, row.AuditLog.id))
+
+    return jsonify({
+        'items': [{**log.to_dict(), 'admin_email': email} for log, email in rows],
+        'next_cursor': next_cursor
+    }), 200
+
+@admin_bp.route('/exports/<kind>', methods=['GET'])
+@admin_required()
+def export_rows(kind):
+    # ?format=csv|ndjson&from=...&to=...&tower_id=...&gzip=true
+    fmt = request.args.get('format', 'csv')
+    date_from = parse_datetime('from')
+    date_to = parse_datetime('to')
+    tower_ids = parse_uuid_list('tower_id')
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+    response = exports.export(kind, fmt, date_from, date_to, tower_ids, compress)
+
+    log_admin_action(current_identity().user_id, 'EXPORT', details={
+        'export': kind,
+        'format': fmt,
+        'from': date_from.isoformat() if date_from else None,
+        'to': date_to.isoformat() if date_to else None,
+        'tower_ids': [str(t) for t in tower_ids]
+    })
+    db.session.commit()
+    return response
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import Booking
+
+# Bookings in these states hold their slot; the exclusion constraint uses the same list
+ACTIVE_STATUSES = ('Pending', 'Confirmed')
+MAX_SLOT = timedelta(hours=4)
+DEFAULT_WINDOW = timedelta(days=7)
+MAX_WINDOW = timedelta(days=62)
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def to_utc(value):
+    """Timestamps are stored as naive UTC; convert aware input and pass naive input through."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_time(value, field):
+    try:
+        return to_utc(datetime.fromisoformat(str(value)))
+    except ValueError:
+        raise ValueError(f'{field} must be an ISO 8601 datetime')
+
+
+def overlapping(amenity_id, start, end):
+    """``(start_time, end_time)`` of active bookings of the amenity that intersect [start, end), by start."""
+    query = db.select(Booking.start_time, Booking.end_time).where(
+        Booking.amenity_id == amenity_id,
+        Booking.status.in_(ACTIVE_STATUSES)
+    )
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Same expression as ex_bookings_amenity_slot, so its GiST index answers the range lookup
+        query = query.where(
+            func.tsrange(Booking.start_time, Booking.end_time).op('&&')(func.tsrange(start, end))
+        )
+    else:
+        query = query.where(Booking.start_time < end, Booking.end_time > start)
+    return db.session.execute(query.order_by(Booking.start_time)).all()
+
+
+def merge(intervals, start, end):
+    """Clip start-ordered intervals to [start, end) and merge the ones that touch or overlap."""
+    merged = []
+    for s, e in intervals:
+        s, e = max(s, start), min(e, end)
+        if s >= e:
+            continue
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+def free_gaps(busy, start, end, min_length=timedelta(0)):
+    """Gaps of at least ``min_length`` in [start, end) between merged busy intervals."""
+    gaps, cursor = [], start
+    for s, e in busy:
+        if s > cursor and s - cursor >= min_length:
+            gaps.append([cursor, s])
+        cursor = max(cursor, e)
+    if end > cursor and end - cursor >= min_length:
+        gaps.append([cursor, end])
+    return gaps
+
+
+def availability(amenity_id, start, end, min_length=timedelta(0)):
+    busy = merge(overlapping(amenity_id, start, end), start, end)
+    return busy, free_gaps(busy, start, end, min_length)
+
+
+def book(amenity_id, user_id, start, end):
+    """Insert a confirmed booking for [start, end), or raise SlotUnavailable if it overlaps another."""
+    if overlapping(amenity_id, start, end):
+        raise SlotUnavailable()
+    booking = Booking(
+        user_id=user_id,
+        amenity_id=amenity_id,
+        start_time=start,
+        end_time=end,
+        status='Confirmed'
+    )
+    try:
+        # The exclusion constraint catches a concurrent booking that slipped past the check above
+        with db.session.begin_nested():
+            db.session.add(booking)
+    except IntegrityError:
+        raise SlotUnavailable()
+    return booking
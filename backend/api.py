@@ -1,34 +1,62 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
 from datetime import datetime, date, timedelta
-from sqlalchemy import func
+from decimal import Decimal
+from sqlalchemy import func, literal_column, tuple_
+from sqlalchemy.orm import joinedload, selectinload
 from extensions import db
-from models import User, Tower, Unit, Amenity, Booking, Lease, Payment, UnitAmenity, ServiceProvider
-from auth import admin_required
+from models import User, Tower, Unit, Amenity, Booking, Lease, Payment, UnitAmenity, ServiceProvider, OccupancyCount
+from auth import admin_required, current_identity
+from instrumentation import query_budget
+from json_output import stream_array
+import amenity_bookings
+import booking_decisions
+import catalog_cache
+import lease_balances
+import occupancy
+import provider_availability
+import unit_import
+import unit_search
+from pagination import (
+    InvalidPageRequest, decode_cursor, page, parse_datetime, parse_int, parse_limit, parse_uuid,
+    parse_uuid_list
+)
 
 api_bp = Blueprint('api', __name__)
 
+@api_bp.errorhandler(InvalidPageRequest)
+def invalid_page_request(e):
+    return jsonify({'msg': str(e)}), 400
 
 
 # --- Dashboard Stats (Admin) ---
 @api_bp.route('/stats', methods=['GET'])
 @admin_required()
 def get_stats():
-    total_units = Unit.query.count()
-    occupied_units = Unit.query.filter_by(status='Occupied').count()
-    available_units = Unit.query.filter_by(status='Vacant').count()
-    occupancy_rate = (occupied_units / total_units * 100) if total_units > 0 else 0
-    
-    return jsonify({
-        "total_units": total_units,
-        "occupied_units": occupied_units,
-        "available_units": available_units,
-        "occupancy_rate": round(occupancy_rate, 2)
-    })
+    # Served from the occupancy snapshot rather than counting units
+    result = occupancy.summarize(occupancy.get_counts())
+
+    if request.args.get('by') == 'tower':
+        rows = db.session.query(
+            Tower.id, Tower.name, OccupancyCount.status, OccupancyCount.unit_count
+        ).outerjoin(OccupancyCount, OccupancyCount.tower_id == Tower.id) \
+         .order_by(Tower.name).all()
+        towers = {}
+        for tower_id, name, status, count in rows:
+            tower = towers.setdefault(tower_id, {'name': name, 'counts': {}})
+            if status is not None:
+                tower['counts'][status] = count
+        result['towers'] = [
+            {'tower_id': str(tower_id), 'tower_name': t['name'], **occupancy.summarize(t['counts'])}
+            for tower_id, t in towers.items()
+        ]
+
+    return jsonify(result)
 
 # --- Towers ---
 @api_bp.route('/towers', methods=['GET'])
 @jwt_required()
+@catalog_cache.cached('towers')
 def get_towers():
     towers = Tower.query.all()
     return jsonify([{
@@ -47,37 +75,119 @@ def create_tower():
     return jsonify({'msg': 'Tower created', 'id': str(tower.id)}), 201
 
 # --- Units ---
+def serialize_unit(u):
+    amenities = list(u.amenities)
+    return {
+        'id': str(u.id),
+        'tower_id': str(u.tower_id) if u.tower_id else None,
+        'unit_number': u.unit_number,
+        'floor': u.floor,
+        'status': u.status,
+        'tower_name': u.tower.name if u.tower else 'N/A',
+        'amenities': [a.name for a in amenities],
+        'amenity_ids': [str(a.id) for a in amenities],
+        'photos': u.photos,
+        'nearby_places': u.nearby_places
+    }
+
 @api_bp.route('/units', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_units():
-    claims = get_jwt()
-    role = claims.get('role')
-    
-    query = Unit.query
-    # Residents only see Vacant units usually, but requirements say "Browse Flats"
-    # Step 5.2 says "Shows only AVAILABLE units" for User.
-    # Step 6.2 says "Shows ALL units" for Admin.
-    
-    if role != 'Admin':
-        query = query.filter_by(status='Vacant')
-        
-    units = query.all()
-    
-    results = []
-    for u in units:
-        results.append({
-            'id': str(u.id),
-            'tower_id': str(u.tower_id) if u.tower_id else None,
-            'unit_number': u.unit_number,
-            'floor': u.floor,
-            'status': u.status,
-            'tower_name': u.tower.name if u.tower else 'N/A',
-            'amenities': [a.name for a in u.amenities],
-            'amenity_ids': [str(a.id) for a in u.amenities],
-            'photos': u.photos,
-            'nearby_places': u.nearby_places
-        })
-    return jsonify(results)
+    identity = current_identity()
+    limit = parse_limit()
+
+    # Tower is a many-to-one so it rides along in the main SELECT; amenities are
+    # fetched for the whole page with one IN query. One page == two statements.
+    query = Unit.query.options(joinedload(Unit.tower), selectinload(Unit.amenities))
+
+    # Residents only see Vacant units ("Browse Flats"); admins see all units
+    # and may filter by status.
+    if not identity.is_admin:
+        query = query.filter(Unit.status == 'Vacant')
+    elif request.args.get('status'):
+        query = query.filter(Unit.status == request.args['status'])
+
+    tower_ids = parse_uuid_list('tower_id')
+    if tower_ids:
+        query = query.filter(Unit.tower_id.in_(tower_ids))
+
+    min_floor = parse_int('min_floor')
+    if min_floor is not None:
+        query = query.filter(Unit.floor >= min_floor)
+    max_floor = parse_int('max_floor')
+    if max_floor is not None:
+        query = query.filter(Unit.floor <= max_floor)
+
+    # Units must have every requested amenity
+    amenity_ids = set(parse_uuid_list('amenity_ids'))
+    if amenity_ids:
+        with_amenities = db.select(UnitAmenity.unit_id).where(
+            UnitAmenity.amenity_id.in_(amenity_ids)
+        ).group_by(UnitAmenity.unit_id).having(
+            func.count(UnitAmenity.amenity_id) == len(amenity_ids)
+        )
+        query = query.filter(Unit.id.in_(with_amenities))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        unit_number, unit_id = decode_cursor(cursor, 2)
+        query = query.filter(
+            tuple_(Unit.unit_number, Unit.id) > tuple_(unit_number, parse_uuid(unit_id, 'cursor'))
+        )
+
+    units = query.order_by(Unit.unit_number, Unit.id).limit(limit + 1).all()
+    units, next_cursor = page(units, limit, key=lambda u: (u.unit_number, u.id))
+
+    return jsonify({
+        'items': [serialize_unit(u) for u in units],
+        'next_cursor': next_cursor
+    })
+
+@api_bp.route('/units/search', methods=['GET'])
+@jwt_required()
+def search_units():
+    # Vacant units only, like the resident catalog
+    limit = parse_limit()
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        unit_number, unit_id = decode_cursor(cursor, 2)
+        after = (unit_number, parse_uuid(unit_id, 'cursor'))
+
+    keys, total, counts = unit_search.index.search(
+        text=(request.args.get('q') or '').strip() or None,
+        tower_ids=set(parse_uuid_list('tower_id')),
+        min_floor=parse_int('min_floor'),
+        max_floor=parse_int('max_floor'),
+        amenity_ids=set(parse_uuid_list('amenity_ids')),
+        after=after,
+        limit=limit
+    )
+    keys, next_cursor = page(keys, limit, key=lambda k: k)
+
+    # The index may trail a status change by a sync interval; never return a taken unit
+    units = {u.id: u for u in Unit.query.options(joinedload(Unit.tower), selectinload(Unit.amenities))
+             .filter(Unit.id.in_([unit_id for _, unit_id in keys]), Unit.status == 'Vacant')}
+    tower_names = dict(db.session.query(Tower.id, Tower.name).filter(Tower.id.in_(counts['towers'])))
+    amenity_names = dict(db.session.query(Amenity.id, Amenity.name).filter(Amenity.id.in_(counts['amenities'])))
+
+    return jsonify({
+        'items': [serialize_unit(units[unit_id]) for _, unit_id in keys if unit_id in units],
+        'next_cursor': next_cursor,
+        'total': total,
+        'facets': {
+            'towers': sorted(
+                ({'id': str(t), 'name': tower_names.get(t), 'count': n} for t, n in counts['towers'].items()),
+                key=lambda f: f['name'] or ''
+            ),
+            'floors': [{'floor': f, 'count': n} for f, n in sorted(counts['floors'].items())],
+            'amenities': sorted(
+                ({'id': str(a), 'name': amenity_names.get(a), 'count': n} for a, n in counts['amenities'].items()),
+                key=lambda f: f['name'] or ''
+            )
+        }
+    })
 
 @api_bp.route('/units', methods=['POST'])
 @admin_required()
@@ -94,15 +204,53 @@ def create_unit():
     
     # Handle Amenities
     if 'amenities' in data and isinstance(data['amenities'], list):
-        for amenity_id in data['amenities']:
-            amenity = Amenity.query.get(amenity_id)
-            if amenity:
-                unit.amenities.append(amenity)
+        amenity_ids, _ = unit_import.parse_amenity_refs(data['amenities'])
+        if amenity_ids:
+            unit.amenities = Amenity.query.filter(Amenity.id.in_(amenity_ids)).all()
 
     db.session.add(unit)
     db.session.commit()
     return jsonify({'msg': 'Unit created', 'id': str(unit.id)}), 201
 
+@api_bp.route('/units/bulk', methods=['POST'])
+@admin_required()
+def bulk_create_units():
+    # JSON: {"tower_id": ..., "units": [{unit_number, floor, status, amenities, ...}]}
+    # CSV: text/csv body or a multipart "file", with ?tower_id=...
+    if request.is_json:
+        data = request.get_json()
+        tower_id = data.get('tower_id')
+        rows = data.get('units')
+        if not isinstance(rows, list):
+            return jsonify({'msg': 'units must be a list'}), 400
+    else:
+        tower_id = request.args.get('tower_id') or request.form.get('tower_id')
+        upload = request.files.get('file')
+        text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+        rows = unit_import.read_csv(text)
+
+    if not tower_id:
+        return jsonify({'msg': 'tower_id is required'}), 400
+    tower = db.session.get(Tower, parse_uuid(tower_id, 'tower_id'))
+    if not tower:
+        return jsonify({'msg': 'Tower not found'}), 404
+    if not rows:
+        return jsonify({'msg': 'No units to create'}), 400
+    if len(rows) > unit_import.MAX_BULK_UNITS:
+        return jsonify({'msg': f'At most {unit_import.MAX_BULK_UNITS} units per request'}), 400
+
+    units, links, errors = unit_import.validate(tower.id, rows)
+    if errors:
+        # All or nothing: report every bad row and create none
+        return jsonify({'msg': 'Validation failed', 'errors': errors}), 400
+
+    unit_import.insert_units(units, links)
+    db.session.commit()
+    return jsonify({
+        'msg': f'{len(units)} units created',
+        'ids': [str(u['id']) for u in units]
+    }), 201
+
 @api_bp.route('/units/<unit_id>', methods=['PUT'])
 @admin_required()
 def update_unit(unit_id):
@@ -120,13 +268,9 @@ def update_unit(unit_id):
     if 'nearby_places' in data:
         unit.nearby_places = data['nearby_places']
     
-    # Handle Amenities (Replace existing)
+    # Handle Amenities (Replace existing, touching only what changed)
     if 'amenities' in data and isinstance(data['amenities'], list):
-        unit.amenities = [] # Clear existing
-        for amenity_id in data['amenities']:
-            amenity = Amenity.query.get(amenity_id)
-            if amenity:
-                unit.amenities.append(amenity)
+        unit_import.replace_amenities(unit.id, data['amenities'])
         
     db.session.commit()
     return jsonify({'msg': 'Unit updated'}), 200
@@ -134,13 +278,15 @@ def update_unit(unit_id):
 # --- Amenities ---
 @api_bp.route('/amenities', methods=['GET'])
 @jwt_required()
+@catalog_cache.cached('amenities')
 def get_amenities():
     amenities = Amenity.query.all()
     return jsonify([{
         'id': str(a.id),
         'name': a.name,
         'category': a.category,
-        'description': a.description
+        'description': a.description,
+        'is_bookable': bool(a.is_bookable)
     } for a in amenities])
 
 @api_bp.route('/amenities', methods=['POST'])
@@ -157,6 +303,31 @@ def create_amenity():
     db.session.commit()
     return jsonify({'msg': 'Amenity created', 'id': str(amenity.id)}), 201
 
+@api_bp.route('/amenities/<amenity_id>/availability', methods=['GET'])
+@jwt_required()
+def get_amenity_availability(amenity_id):
+    amenity = db.session.get(Amenity, parse_uuid(amenity_id, 'amenity_id'))
+    if not amenity:
+        return jsonify({'msg': 'Amenity not found'}), 404
+
+    start = amenity_bookings.to_utc(parse_datetime('from') or datetime.utcnow())
+    end = amenity_bookings.to_utc(parse_datetime('to') or start + amenity_bookings.DEFAULT_WINDOW)
+    if end <= start:
+        return jsonify({'msg': 'to must be after from'}), 400
+    if end - start > amenity_bookings.MAX_WINDOW:
+        return jsonify({'msg': f'Window may span at most {amenity_bookings.MAX_WINDOW.days} days'}), 400
+    min_minutes = parse_int('min_minutes') or 0
+
+    busy, free = amenity_bookings.availability(amenity.id, start, end, timedelta(minutes=min_minutes))
+    return jsonify({
+        'amenity_id': str(amenity.id),
+        'is_bookable': bool(amenity.is_bookable),
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'busy': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in busy],
+        'free': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in free]
+    })
+
 @api_bp.route('/units/<unit_id>/amenities', methods=['POST'])
 @admin_required()
 def assign_amenity(unit_id):
@@ -186,41 +357,45 @@ def assign_amenity(unit_id):
 # I will do this in a separate step. For now, let's assume I will fix the model.
 
 @api_bp.route('/bookings', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_bookings():
-    current_user_id = get_jwt_identity()
-    claims = get_jwt()
-    
-    if claims.get('role') == 'Admin':
-        bookings = Booking.query.all()
-    else:
-        bookings = Booking.query.filter_by(user_id=current_user_id).all()
-        
-    results = []
-    for b in bookings:
+    identity = current_identity()
+
+    # One joined query instead of lazy-loading user, unit and amenity per booking
+    query = db.select(
+        Booking.id, Booking.status, Booking.start_time, Booking.end_time, User.email,
+        Unit.id.label('unit_id'), Unit.unit_number, Amenity.name.label('amenity_name')
+    ).join(User, User.id == Booking.user_id) \
+        .outerjoin(Unit, Unit.id == Booking.unit_id) \
+        .outerjoin(Amenity, Amenity.id == Booking.amenity_id)
+    if not identity.is_admin:
+        query = query.where(Booking.user_id == identity.user_id)
+
+    def serialize(b):
         item = {
-            'id': str(b.id),
+            'id': b.id,
             'status': b.status,
             'start_time': b.start_time.isoformat() if b.start_time else None,
             'end_time': b.end_time.isoformat() if b.end_time else None,
-            'user_email': b.resident.email
+            'user_email': b.email
         }
         # Handle if it's a unit booking or amenity booking
-        if hasattr(b, 'unit') and b.unit:
-             item['type'] = 'Unit'
-             item['target_name'] = b.unit.unit_number
-             item['unit_id'] = str(b.unit.id)
-        elif b.amenity:
-             item['type'] = 'Amenity'
-             item['target_name'] = b.amenity.name
-        
-        results.append(item)
-    return jsonify(results)
+        if b.unit_id:
+            item['type'] = 'Unit'
+            item['target_name'] = b.unit_number
+            item['unit_id'] = b.unit_id
+        elif b.amenity_name:
+            item['type'] = 'Amenity'
+            item['target_name'] = b.amenity_name
+        return item
+
+    return stream_array(query, serialize)
 
 @api_bp.route('/bookings', methods=['POST'])
 @jwt_required()
 def create_booking():
-    current_user_id = get_jwt_identity()
+    current_user_id = current_identity().user_id
     data = request.get_json()
     
     # "Booking Flats"
@@ -244,40 +419,64 @@ def create_booking():
         db.session.commit()
         return jsonify({'msg': 'Booking requested', 'id': str(booking.id)}), 201
 
+    # Amenity slots are confirmed immediately if nothing overlaps
+    if 'amenity_id' in data:
+        amenity = db.session.get(Amenity, parse_uuid(data['amenity_id'], 'amenity_id'))
+        if not amenity or not amenity.is_bookable:
+            return jsonify({'msg': 'Amenity not bookable'}), 400
+        try:
+            start = amenity_bookings.parse_time(data.get('start_time'), 'start_time')
+            end = amenity_bookings.parse_time(data.get('end_time'), 'end_time')
+        except ValueError as e:
+            return jsonify({'msg': str(e)}), 400
+        if end <= start:
+            return jsonify({'msg': 'end_time must be after start_time'}), 400
+        if end - start > amenity_bookings.MAX_SLOT:
+            return jsonify({'msg': f'Slots may last at most {amenity_bookings.MAX_SLOT.seconds // 3600} hours'}), 400
+        if start < datetime.utcnow():
+            return jsonify({'msg': 'Slot is in the past'}), 400
+
+        try:
+            booking = amenity_bookings.book(amenity.id, current_user_id, start, end)
+        except amenity_bookings.SlotUnavailable:
+            db.session.rollback()
+            return jsonify({'msg': 'Slot already booked'}), 409
+        db.session.commit()
+        return jsonify({'msg': 'Amenity booked', 'id': str(booking.id)}), 201
+
     return jsonify({'msg': 'Invalid booking request'}), 400
 
+@api_bp.route('/bookings/decisions', methods=['PUT'])
+@admin_required()
+def decide_bookings():
+    data = request.get_json(silent=True) or {}
+    order, actions, errors = booking_decisions.parse(data.get('decisions'))
+    if errors:
+        return jsonify({'msg': 'Invalid decisions', 'errors': errors}), 400
+
+    results, auto_rejected = booking_decisions.apply(order, actions)
+    db.session.commit()
+    return jsonify({'results': results, 'auto_rejected': auto_rejected}), 200
+
 @api_bp.route('/bookings/<booking_id>/approve', methods=['PUT'])
 @admin_required()
 def approve_booking(booking_id):
-    booking = Booking.query.get_or_404(booking_id)
-    
-    if booking.status != 'Pending':
-        return jsonify({'msg': 'Booking not pending'}), 400
-        
-    # Logic for Unit Booking Approval
-    if hasattr(booking, 'unit_id') and booking.unit_id:
-        # 1. Create Lease
-        lease = Lease(
-            unit_id=booking.unit_id,
-            resident_id=booking.user_id,
-            start_date=date.today(),
-            end_date=date.today() + timedelta(days=365),
-            rent_amount=1000.00, # Should probably come from Unit or Booking
-            status='Active'
-        )
-        db.session.add(lease)
-        
-        # 2. Update Unit Status
-        unit = Unit.query.get(booking.unit_id)
-        unit.status = 'Occupied'
-        
-        # 3. Update Booking Status
-        booking.status = 'Approved'
-        
-        db.session.commit()
+    booking_id = parse_uuid(booking_id, 'booking_id')
+    [result], _ = booking_decisions.apply([booking_id], {booking_id: 'approve'})
+    db.session.commit()
+
+    outcome = result['outcome']
+    if outcome == 'approved':
         return jsonify({'msg': 'Booking approved, Lease created'}), 200
-        
-    return jsonify({'msg': 'Not a unit booking'}), 400
+    if outcome == 'not_found':
+        return jsonify({'msg': 'Booking not found'}), 404
+    if outcome == 'not_pending':
+        return jsonify({'msg': 'Booking not pending'}), 400
+    if outcome == 'not_unit_booking':
+        return jsonify({'msg': 'Not a unit booking'}), 400
+    if outcome == 'unit_unavailable':
+        return jsonify({'msg': 'Unit not available'}), 409
+    return jsonify({'msg': 'Booking is being processed, try again'}), 409
 
 @api_bp.route('/bookings/<booking_id>/reject', methods=['PUT'])
 @admin_required()
@@ -291,7 +490,7 @@ def reject_booking(booking_id):
 @api_bp.route('/leases/current', methods=['GET'])
 @jwt_required()
 def get_current_lease():
-    current_user_id = get_jwt_identity()
+    current_user_id = current_identity().user_id
     lease = Lease.query.filter_by(resident_id=current_user_id, status='Active').first()
     
     if not lease:
@@ -306,10 +505,12 @@ def get_current_lease():
     })
 
 @api_bp.route('/leases', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_leases():
-    current_user_id = get_jwt_identity()
-    leases = Lease.query.filter_by(resident_id=current_user_id, status='Active').all()
+    current_user_id = current_identity().user_id
+    leases = Lease.query.options(joinedload(Lease.unit).joinedload(Unit.tower)) \
+        .filter_by(resident_id=current_user_id, status='Active').all()
     
     results = []
     for lease in leases:
@@ -325,28 +526,87 @@ def get_leases():
 
 # --- Payments ---
 @api_bp.route('/payments', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_payments():
-    claims = get_jwt()
-    current_user_id = get_jwt_identity()
-    
-    if claims.get('role') == 'Admin':
-        payments = Payment.query.all()
-    else:
+    identity = current_identity()
+    limit = parse_limit()
+
+    # Project only the ledger columns in one joined SELECT instead of walking
+    # payment -> lease -> resident/unit -> tower per row.
+    query = db.session.query(
+        Payment.id,
+        Payment.lease_id,
+        Payment.amount,
+        Payment.payment_date,
+        Payment.payment_type,
+        Payment.status,
+        User.email.label('resident_email'),
+        Unit.unit_number,
+        Tower.name.label('tower_name')
+    ).join(Lease, Payment.lease_id == Lease.id) \
+     .join(User, Lease.resident_id == User.id) \
+     .join(Unit, Lease.unit_id == Unit.id) \
+     .outerjoin(Tower, Unit.tower_id == Tower.id)
+
+    if not identity.is_admin:
         # User sees payments for their leases
-        payments = Payment.query.join(Lease).filter(Lease.resident_id == current_user_id).all()
-        
-    return jsonify([{
-        'id': str(p.id),
-        'lease_id': str(p.lease_id),
-        'amount': str(p.amount),
-        'date': p.payment_date.isoformat(),
-        'type': p.payment_type,
-        'status': p.status,
-        'resident_email': p.lease.resident.email if p.lease and p.lease.resident else 'Unknown',
-        'unit_number': p.lease.unit.unit_number if p.lease and p.lease.unit else 'Unknown',
-        'tower_name': p.lease.unit.tower.name if p.lease and p.lease.unit and p.lease.unit.tower else 'N/A'
-    } for p in payments])
+        query = query.filter(Lease.resident_id == identity.user_id)
+
+    date_from = parse_datetime('from')
+    if date_from:
+        query = query.filter(Payment.payment_date >= date_from)
+    date_to = parse_datetime('to')
+    if date_to:
+        query = query.filter(Payment.payment_date < date_to)
+    tower_ids = parse_uuid_list('tower_id')
+    if tower_ids:
+        query = query.filter(Unit.tower_id.in_(tower_ids))
+    if request.args.get('status'):
+        query = query.filter(Payment.status == request.args['status'])
+    if request.args.get('type'):
+        query = query.filter(Payment.payment_type == request.args['type'])
+
+    totals = None
+    if request.args.get('totals') in ('1', 'true'):
+        subq = query.subquery()
+        count, amount = db.session.query(
+            func.count(subq.c.id), func.coalesce(func.sum(subq.c.amount), 0)
+        ).one()
+        totals = {'count': count, 'amount': str(amount)}
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        payment_date, payment_id = decode_cursor(cursor, 2)
+        try:
+            payment_date = datetime.fromisoformat(payment_date)
+        except (TypeError, ValueError):
+            raise InvalidPageRequest('Invalid cursor')
+        query = query.filter(
+            tuple_(Payment.payment_date, Payment.id) < tuple_(payment_date, parse_uuid(payment_id, 'cursor'))
+        )
+
+    # Newest first
+    rows = query.order_by(Payment.payment_date.desc(), Payment.id.desc()).limit(limit + 1).all()
+    rows, next_cursor = page(rows, limit, key=lambda p: (p.payment_date, p.id))
+
+    result = {
+        'items': [{
+            'id': str(p.id),
+            'lease_id': str(p.lease_id),
+            'amount': str(p.amount),
+            'date': p.payment_date.isoformat(),
+            'type': p.payment_type,
+            'status': p.status,
+            'resident_email': p.resident_email,
+            'unit_number': p.unit_number,
+            'tower_name': p.tower_name or 'N/A'
+        } for p in rows],
+        'next_cursor': next_cursor
+    }
+    if totals is not None:
+        result['totals'] = totals
+    return jsonify(result)
 
 @api_bp.route('/payments', methods=['POST'])
 @jwt_required()
@@ -363,24 +623,77 @@ def make_payment():
     db.session.commit()
     return jsonify({'msg': 'Payment successful'}), 201
 
+# --- Reports (Admin) ---
+@api_bp.route('/reports/arrears', methods=['GET'])
+@admin_required()
+def get_arrears_report():
+    as_of = date.today()
+    cutoff, rows = lease_balances.arrears(
+        as_of, current_app.config['RENT_GRACE_DAYS'], parse_uuid_list('tower_id')
+    )
+    # A new month's rent is accrued by `flask balances accrue`, never by this read;
+    # until the job runs, leases missing it are reported rather than counted
+    unaccrued = lease_balances.unaccrued_count(db.session.connection(), cutoff)
+
+    include_leases = request.args.get('leases', 'true') != 'false'
+    towers = {}
+    for r in rows:
+        tower = towers.get(r.tower_id)
+        if tower is None:
+            tower = towers[r.tower_id] = {
+                'tower_id': str(r.tower_id),
+                'tower_name': r.tower_name,
+                'overdue_leases': r.tower_leases,
+                'amount': str(r.tower_amount),
+                'oldest_unpaid': str(r.tower_oldest_unpaid),
+                'leases': []
+            }
+        if include_leases:
+            tower['leases'].append({
+                'lease_id': str(r.lease_id),
+                'unit_number': r.unit_number,
+                'resident_email': r.resident_email,
+                'rent_amount': str(r.rent_amount),
+                'status': r.status,
+                'balance': str(r.balance),
+                'months_overdue': r.months_overdue,
+                'oldest_unpaid': str(r.oldest_unpaid)
+            })
+
+    return jsonify({
+        'as_of': as_of.isoformat(),
+        'due_through': cutoff.isoformat(),
+        'totals': {
+            'overdue_leases': len(rows),
+            'amount': str(sum((Decimal(t['amount']) for t in towers.values()), Decimal(0)))
+        },
+        'unaccrued_leases': unaccrued,
+        'towers': list(towers.values())
+    })
+
 # --- Tenants (Admin) ---
 @api_bp.route('/tenants', methods=['GET'])
+@query_budget(1)
 @admin_required()
 def get_tenants():
     # Active leases
-    leases = Lease.query.filter_by(status='Active').all()
-    return jsonify([{
-        'id': str(l.resident.id),
-        'name': f"{l.resident.first_name} {l.resident.last_name}",
-        'email': l.resident.email,
-        'unit': l.unit.unit_number,
+    query = db.select(
+        User.id, User.first_name, User.last_name, User.email, Unit.unit_number, Lease.start_date, Lease.end_date
+    ).join(User, User.id == Lease.resident_id).join(Unit, Unit.id == Lease.unit_id) \
+        .where(Lease.status == 'Active')
+    return stream_array(query, lambda l: {
+        'id': l.id,
+        'name': f"{l.first_name} {l.last_name}",
+        'email': l.email,
+        'unit': l.unit_number,
         'lease_start': l.start_date.isoformat(),
         'lease_end': l.end_date.isoformat()
-    } for l in leases])
+    })
 
 # --- Community Connect ---
 @api_bp.route('/service-providers', methods=['GET'])
 @jwt_required()
+@catalog_cache.cached('service_providers', args=('type',))
 def get_service_providers():
     type_filter = request.args.get('type')
     
@@ -390,3 +703,40 @@ def get_service_providers():
         
     providers = query.all()
     return jsonify([p.to_dict() for p in providers])
+
+# Keyset order of the available providers. Unrated providers rank as 0, since a NULL
+# rating would drop out of the cursor comparison; the rating indexes are on this expression.
+PROVIDER_RANK = func.coalesce(ServiceProvider.rating, literal_column('0'))
+
+@api_bp.route('/service-providers/available', methods=['GET'])
+@jwt_required()
+def get_available_service_providers():
+    # Providers working at ?at= (local time, default now), best rated first
+    limit = parse_limit(default=20, maximum=100)
+    at = parse_datetime('at')
+    moment = provider_availability.to_local(at) if at else provider_availability.local_now()
+
+    query = provider_availability.available_at(
+        ServiceProvider.query.options(selectinload(ServiceProvider.windows)), moment
+    )
+    type_filter = request.args.get('type')
+    if type_filter and type_filter != 'All':
+        query = query.filter(ServiceProvider.service_type == type_filter)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        rating, provider_id = decode_cursor(cursor, 2)
+        query = query.filter(
+            tuple_(PROVIDER_RANK, ServiceProvider.id) < tuple_(rating, parse_uuid(provider_id, 'cursor'))
+        )
+
+    providers = query.order_by(PROVIDER_RANK.desc(), ServiceProvider.id.desc()).limit(limit + 1).all()
+    providers, next_cursor = page(providers, limit, key=lambda p: (p.rating or 0, p.id))
+
+    return jsonify({
+        'at': moment.isoformat(),
+        'items': [
+            {**p.to_dict(), 'windows': provider_availability.describe(p.windows)} for p in providers
+        ],
+        'next_cursor': next_cursor
+    })
@@ -1,39 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from flask import Flask
+from sqlalchemy import text
 from extensions import db, jwt, migrate, cors
 from config import Config
 from auth import auth_bp
 from api import api_bp
 from admin_routes import admin_bp
+from occupancy import occupancy_cli
+from indexes import indexes_cli
+from revocation import tokens_cli
+from seed import seed_command
+from provider_availability import providers_cli
+from audit_log import audit_cli
+from lease_balances import balances_cli
+from lease_expiry import leases_cli
+from compression import static_cli
+from replicas import replicas_cli
+import audit_log
+import catalog_cache
+import compression
+import db_pool
+import instrumentation
+import json_output
+import metrics
+import replicas
 # Import models so they are registered with SQLAlchemy
 import models 
 
+# One thread: if the database hangs, readiness checks queue behind it and time out
+_readiness_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='readiness')
+
 def create_app():
     app = Flask(__name__, static_folder='static', static_url_path='/')
     app.config.from_object(Config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(app.config)
+    app.config['SQLALCHEMY_BINDS'] = replicas.binds(app.config, lambda uri: db_pool.engine_options(app.config, uri))
+    json_output.init_app(app)
 
     # Initialize extensions
     db.init_app(app)
+    replicas.init_app(app, db)
     jwt.init_app(app)
     migrate.init_app(app, db)
     cors.init_app(app)
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)
+    audit_log.writer.init_app(app)
+    catalog_cache.init_app(app)
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
+    # CLI commands
+    app.cli.add_command(occupancy_cli)
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(tokens_cli)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(providers_cli)
+    app.cli.add_command(audit_cli)
+    app.cli.add_command(balances_cli)
+    app.cli.add_command(leases_cli)
+    app.cli.add_command(static_cli)
+    app.cli.add_command(replicas_cli)
+
     @app.route('/')
     def index():
-        return app.send_static_file('index.html')
+        return compression.send_static(app, 'index.html')
 
     @app.errorhandler(404)
     def not_found(e):
-        return app.send_static_file('index.html')
+        return compression.send_static(app, 'index.html')
 
     @app.route('/health')
     def health_check():
         return {"status": "healthy"}, 200
 
+    @app.route('/health/ready')
+    def readiness_check():
+        def ping():
+            with app.app_context():
+                with db.engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+
+        try:
+            _readiness_executor.submit(ping).result(timeout=app.config['READINESS_DB_TIMEOUT'])
+        except TimeoutError:
+            return {"status": "unavailable", "database": "timeout"}, 503
+        except Exception as e:
+            return {"status": "unavailable", "database": type(e).__name__}, 503
+        return {"status": "ready", "database": "ok"}, 200
+
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,382 @@
+"""Buffered writer for the admin audit log.
+
+``record`` queues an entry on the session; entries reach the writer only when
+that transaction commits, so an action that rolls back leaves no trace and
+admin requests no longer pay for the insert. The writer appends them to its
+worker's journal under AUDIT_SPOOL_DIR before the request returns, then
+inserts its queued entries in one statement when AUDIT_BATCH_SIZE are waiting
+or every AUDIT_FLUSH_INTERVAL seconds, and on exit. A flushed batch's journal
+is deleted once the insert commits, or kept as a spool file if the database
+refuses it; spool files, and the journals of workers that were killed before
+flushing, are replayed by the next successful flush.
+
+On PostgreSQL audit_logs is partitioned by month. Partitions are created on
+demand by the writer (and ahead of time by ``flask audit partitions``);
+``flask audit prune`` drops whole partitions past AUDIT_RETENTION_MONTHS.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, insert, text
+from extensions import db
+from models import AuditLog
+
+audit_cli = AppGroup('audit', help='Maintain the admin audit log.')
+logger = logging.getLogger(__name__)
+
+TABLE = AuditLog.__tablename__
+
+
+def _month(value, offset=0):
+    """First instant of the month ``offset`` months from ``value``'s."""
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f'{TABLE}_{month.year:04d}_{month.month:02d}'
+
+
+# --- Partitions (PostgreSQL) ---
+
+_known_partitions = set()
+
+
+def is_partitioned(conn):
+    return conn.dialect.name == 'postgresql' and conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {'table': TABLE}
+    ).scalar() is True
+
+
+def ensure_partitions(conn, timestamps):
+    """Create the monthly partitions covering ``timestamps`` if they do not exist yet."""
+    months = {_month(t) for t in timestamps} - _known_partitions
+    if not months or not is_partitioned(conn):
+        return
+    for month in sorted(months):
+        # Another worker may be creating the same partition; losing that race is fine
+        with conn.begin_nested():
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {TABLE} '
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_month(month, 1):%Y-%m-%d}')"
+            ))
+        _known_partitions.add(month)
+
+
+def _partitions(conn):
+    """``{month: partition name}`` for the existing partitions of audit_logs."""
+    names = conn.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(:table)'
+    ), {'table': TABLE}).scalars()
+    partitions = {}
+    for name in names:
+        try:
+            partitions[datetime.strptime(name[len(TABLE) + 1:], '%Y_%m')] = name
+        except ValueError:
+            continue
+    return partitions
+
+
+# --- Writing ---
+
+def entry(admin_id, action, target_id=None, details=None):
+    return {
+        'id': uuid.uuid4(),
+        'admin_id': admin_id,
+        'action': action,
+        'target_id': target_id,
+        'details': details,
+        'timestamp': datetime.utcnow()
+    }
+
+
+def write(conn, entries, ignore_existing=False):
+    """Insert entries directly in ``conn``'s transaction (batch jobs that audit their own writes)."""
+    ensure_partitions(conn, [e['timestamp'] for e in entries])
+    statement = insert(AuditLog.__table__)
+    if ignore_existing:
+        # Replayed spool files may overlap a batch that was committed after all
+        if conn.dialect.name == 'postgresql':
+            statement = statement.on_conflict_do_nothing()
+        else:
+            statement = statement.prefix_with('OR IGNORE')
+    conn.execute(statement, entries)
+
+
+def _insert(entries, ignore_existing=False):
+    with db.engine.begin() as conn:
+        write(conn, entries, ignore_existing)
+
+
+def _spool_dir():
+    return current_app.config['AUDIT_SPOOL_DIR'] or os.path.join(current_app.instance_path, 'audit-spool')
+
+
+def _dump(entry):
+    return json.dumps({
+        **entry,
+        'id': str(entry['id']),
+        'admin_id': str(entry['admin_id']),
+        'target_id': str(entry['target_id']) if entry['target_id'] else None,
+        'timestamp': entry['timestamp'].isoformat()
+    })
+
+
+def _load(line):
+    entry = json.loads(line)
+    entry['id'] = uuid.UUID(entry['id'])
+    entry['admin_id'] = uuid.UUID(entry['admin_id'])
+    entry['target_id'] = uuid.UUID(entry['target_id']) if entry['target_id'] else None
+    entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+    return entry
+
+
+def _owner_gone(journal):
+    """Whether the worker that wrote ``journal`` (audit-<pid>-<id>.journal) has exited."""
+    pid = int(os.path.basename(journal).split('-')[1])
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def replay_spool(include_claimed=False):
+    """Insert spooled entries and delete their files; returns the number of entries replayed."""
+    directory = _spool_dir()
+    paths = glob.glob(os.path.join(directory, '*.jsonl'))
+    # Entries a killed worker had journalled but maybe not inserted
+    paths += [p for p in glob.glob(os.path.join(directory, '*.journal')) if _owner_gone(p)]
+    if include_claimed:
+        paths += glob.glob(os.path.join(directory, '*.replaying'))
+    replayed = 0
+    for path in paths:
+        claimed = path if path.endswith('.replaying') else f'{path}.{os.getpid()}.replaying'
+        try:
+            # Renaming is atomic, so only one worker replays each file
+            if claimed != path:
+                os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+        entries = []
+        with open(claimed) as f:
+            for line in f:
+                try:
+                    entries.append(_load(line))
+                except (ValueError, KeyError):
+                    # A line cut short by a crash mid-write
+                    logger.error('Skipping unreadable audit spool line in %s', claimed)
+        try:
+            if entries:
+                _insert(entries, ignore_existing=True)
+        except Exception:
+            if claimed != path:
+                os.rename(claimed, path)
+            raise
+        os.remove(claimed)
+        replayed += len(entries)
+    return replayed
+
+
+class AuditWriter:
+    def __init__(self):
+        self._app = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = []
+        self._journal = None
+
+    def init_app(self, app):
+        if self._app is None:
+            atexit.register(self.close)
+        self._app = app
+
+    def _start(self):
+        # Started lazily so each gunicorn worker runs its own thread after forking
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = []
+            # A journal inherited across fork belongs to the parent
+            self._journal = None
+            threading.Thread(target=self._run, name='audit-writer', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self._app.config['AUDIT_FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            with self._app.app_context():
+                self.flush_quietly()
+
+    def _journal_file(self):
+        if self._journal is None:
+            directory = _spool_dir()
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'audit-{os.getpid()}-{uuid.uuid4().hex}.journal')
+            self._journal = open(path, 'a')
+        return self._journal
+
+    def _rotate(self):
+        """Close the journal of the entries queued so far; returns its path, or None."""
+        journal, self._journal = self._journal, None
+        if journal is None:
+            return None
+        os.fsync(journal.fileno())
+        journal.close()
+        return journal.name
+
+    def add(self, entries):
+        with self._lock:
+            self._start()
+            # Written through to the OS before the request returns, so a killed worker loses nothing
+            journal = self._journal_file()
+            journal.writelines(_dump(e) + '\n' for e in entries)
+            journal.flush()
+            self._pending.extend(entries)
+            full = len(self._pending) >= self._app.config['AUDIT_BATCH_SIZE']
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Insert every queued entry now; keep their journal as a spool file if the database refuses."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                journal = self._rotate()
+            if batch:
+                try:
+                    _insert(batch)
+                except Exception:
+                    logger.exception('Could not write %d audit entries; spooling them', len(batch))
+                    os.rename(journal, journal[:-len('.journal')] + '.jsonl')
+                    return
+            if journal:
+                os.remove(journal)
+            if os.path.isdir(_spool_dir()):
+                replay_spool()
+
+    def flush_quietly(self):
+        """``flush``, logging a failure instead of raising it; the entries stay on disk for the next flush."""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Audit log flush failed')
+
+    def close(self):
+        if self._app is None or self._pid != os.getpid():
+            return
+        with self._app.app_context():
+            self.flush_quietly()
+
+
+writer = AuditWriter()
+
+
+def record(admin_id, action, target_id=None, details=None):
+    """Log an admin action as part of the current transaction."""
+    new = entry(admin_id, action, target_id, details)
+    if not current_app.config['AUDIT_BUFFERED']:
+        ensure_partitions(db.session.connection(), [new['timestamp']])
+        db.session.add(AuditLog(**new))
+        return
+    db.session.info.setdefault('audit_entries', []).append(new)
+
+
+@event.listens_for(db.session, 'after_commit')
+def hand_over_after_commit(session):
+    entries = session.info.pop('audit_entries', None)
+    if entries:
+        writer.add(entries)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_on_rollback(session):
+    session.info.pop('audit_entries', None)
+
+
+# --- CLI ---
+
+@audit_cli.command('partitions')
+@click.option('--ahead', default=3, show_default=True, help='Months after the current one to create.')
+def create_partitions(ahead):
+    """Create this month's and upcoming monthly partitions (PostgreSQL)."""
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        if not is_partitioned(conn):
+            raise click.ClickException(f'{TABLE} is not partitioned; run "flask audit partition" first.')
+        ensure_partitions(conn, [_month(now, i) for i in range(ahead + 1)])
+        click.echo(f'{len(_partitions(conn))} partition(s) exist.')
+
+
+@audit_cli.command('partition')
+def partition_table():
+    """Convert an existing unpartitioned audit_logs table to monthly partitions (PostgreSQL)."""
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('Partitioning needs PostgreSQL.')
+    with db.engine.begin() as conn:
+        if is_partitioned(conn):
+            click.echo(f'{TABLE} is already partitioned.')
+            return
+        legacy = f'{TABLE}_unpartitioned'
+        conn.execute(text(f'ALTER TABLE {TABLE} RENAME TO {legacy}'))
+        # Index and primary key names are schema-wide; free them for the new table
+        for index in AuditLog.__table__.indexes:
+            conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+        conn.execute(text(f'ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {TABLE}_pkey'))
+        AuditLog.__table__.create(conn)
+
+        first = conn.execute(text(f'SELECT min(timestamp) FROM {legacy}')).scalar()
+        now = datetime.utcnow()
+        months, month = [], _month(first or now)
+        while month <= _month(now, 1):
+            months.append(month)
+            month = _month(month, 1)
+        ensure_partitions(conn, months)
+        copied = conn.execute(text(
+            f'INSERT INTO {TABLE} (id, admin_id, action, target_id, details, timestamp) '
+            f"SELECT id, admin_id, action, target_id, details, coalesce(timestamp, now() AT TIME ZONE 'utc') "
+            f'FROM {legacy}'
+        )).rowcount
+        conn.execute(text(f'DROP TABLE {legacy}'))
+    click.echo(f'Moved {copied} audit entries into {len(months)} monthly partition(s).')
+
+
+@audit_cli.command('prune')
+@click.option('--months', type=int, default=None, help='Months to keep (default AUDIT_RETENTION_MONTHS).')
+def prune_command(months):
+    """Drop audit entries older than the retention period, a whole partition at a time on PostgreSQL."""
+    months = months if months is not None else current_app.config['AUDIT_RETENTION_MONTHS']
+    cutoff = _month(datetime.utcnow(), -months)
+    with db.engine.begin() as conn:
+        if is_partitioned(conn):
+            dropped = [name for month, name in sorted(_partitions(conn).items()) if _month(month, 1) <= cutoff]
+            for name in dropped:
+                conn.execute(text(f'DROP TABLE {name}'))
+            _known_partitions.clear()
+            click.echo(f'Dropped {len(dropped)} partition(s) before {cutoff:%Y-%m}.')
+        else:
+            deleted = conn.execute(db.delete(AuditLog).where(AuditLog.timestamp < cutoff)).rowcount
+            click.echo(f'Deleted {deleted} audit entries before {cutoff:%Y-%m}.')
+
+
+@audit_cli.command('replay')
+def replay_command():
+    """Insert audit entries spooled while the database was unavailable."""
+    if not os.path.isdir(_spool_dir()):
+        click.echo('Nothing to replay.')
+        return
+    click.echo(f'Replayed {replay_spool(include_claimed=True)} audit entries.')
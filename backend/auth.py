@@ -1,25 +1,92 @@
 
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
 from functools import wraps
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask import Blueprint, current_app, g, request, jsonify
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt
 from models import User
 from extensions import db
+from passwords import PasswordHasherBusy, hash_password, verify_password
+from revocation import revoke
 
 auth_bp = Blueprint('auth', __name__)
 
+# Short-lived per-process cache of User rows, keyed by id, for the few checks
+# that must not trust possibly stale token claims (e.g. creating admins).
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+USER_CACHE_MAX_ENTRIES = 1024
+
+def load_user(user_id):
+    now = time.monotonic()
+    entry = _user_cache.get(user_id)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    user = db.session.get(User, user_id)
+    snapshot = user.to_dict() if user else None
+    with _user_cache_lock:
+        if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+            _user_cache.clear()
+        _user_cache[user_id] = (now + current_app.config['USER_CACHE_TTL'], snapshot)
+    return snapshot
+
+def invalidate_user(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+class Identity:
+    """The caller of the current request, as asserted by the access token claims."""
+
+    def __init__(self, claims):
+        self.user_id = uuid.UUID(claims['sub'])
+        self.role = claims.get('role')
+        self.is_super_admin = bool(claims.get('is_super_admin'))
+
+    @property
+    def is_admin(self):
+        return self.role == 'Admin'
+
+    def user(self):
+        """The caller's User row as a dict (or None), served from a short TTL cache."""
+        return load_user(self.user_id)
+
+def current_identity():
+    if 'identity' not in g:
+        g.identity = Identity(get_jwt())
+    return g.identity
+
 def admin_required():
     def wrapper(fn):
         @wraps(fn)
         @jwt_required()
         def decorator(*args, **kwargs):
-            claims = get_jwt()
-            if claims.get("role") != "Admin":
+            if not current_identity().is_admin:
                 return jsonify(msg="Admins only!"), 403
             return fn(*args, **kwargs)
         return decorator
     return wrapper
 
+def issue_tokens(user, family=None, refresh_expires=None):
+    # Tokens from one login share a family id so a device session can be revoked as a whole
+    family = family or str(uuid.uuid4())
+    access_token = create_access_token(
+        identity=str(user.id),
+        additional_claims={
+            "role": user.role,
+            "is_super_admin": user.is_super_admin if hasattr(user, 'is_super_admin') else False,
+            "fam": family
+        }
+    )
+    refresh_token = create_refresh_token(
+        identity=str(user.id),
+        additional_claims={"fam": family},
+        expires_delta=refresh_expires
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token}
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -27,18 +94,59 @@ def login():
     password = data.get('password')
 
     user = User.query.filter_by(email=email).first()
+    if not user or not password:
+        return jsonify({"msg": "Bad username or password"}), 401
 
-    if not user or not check_password_hash(user.password_hash, password):
+    try:
+        ok, new_hash = verify_password(user.password_hash, password)
+    except PasswordHasherBusy:
+        return jsonify({"msg": "Too many login attempts, please retry shortly"}), 503, {'Retry-After': '1'}
+
+    if not ok:
         return jsonify({"msg": "Bad username or password"}), 401
 
-    access_token = create_access_token(
-        identity=str(user.id), 
-        additional_claims={
-            "role": user.role,
-            "is_super_admin": user.is_super_admin if hasattr(user, 'is_super_admin') else False
-        }
+    if new_hash:
+        # Stored hash used outdated parameters; upgrade it now that we know the password
+        user.password_hash = new_hash
+        db.session.commit()
+
+    return jsonify(issue_tokens(user))
+
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    payload = get_jwt()
+    # Rotation: each refresh token is exchanged exactly once. A replay of a spent
+    # token ends the whole session, here as well as in the revoked-token handler:
+    # this worker's denylist may not have synced the spend yet.
+    if not revoke(payload):
+        if payload.get('fam'):
+            revoke(payload, family=True)
+            db.session.commit()
+        return jsonify({"msg": "Token has been revoked"}), 401
+
+    user = db.session.get(User, uuid.UUID(payload['sub']))
+    if not user:
+        db.session.rollback()
+        return jsonify({"msg": "User not found"}), 401
+
+    # The new refresh token keeps the family's original expiry
+    expires_at = datetime.fromtimestamp(payload['exp'], tz=timezone.utc)
+    tokens = issue_tokens(
+        user,
+        family=payload.get('fam'),
+        refresh_expires=expires_at - datetime.now(timezone.utc)
     )
-    return jsonify(access_token=access_token)
+    db.session.commit()
+    return jsonify(tokens)
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(refresh=True)
+def logout():
+    payload = get_jwt()
+    revoke(payload, family='fam' in payload)
+    db.session.commit()
+    return jsonify({"msg": "Logged out"}), 200
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -47,7 +155,7 @@ def register():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({"msg": "User already exists"}), 400
         
-    hashed_password = generate_password_hash(data['password'])
+    hashed_password = hash_password(data['password'])
     new_user = User(
         email=data['email'],
         password_hash=hashed_password,
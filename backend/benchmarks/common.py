@@ -0,0 +1,42 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def request(url, payload=None, token=None, headers=None):
+    """Issue one request; returns (status, body bytes, response headers, elapsed seconds)."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, method='POST' if data else 'GET')
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    for name, value in (headers or {}).items():
+        req.add_header(name, value)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            body = response.read()
+            status, response_headers = response.status, response.headers
+    except urllib.error.HTTPError as e:
+        body, status, response_headers = e.read(), e.code, e.headers
+    return status, body, response_headers, time.perf_counter() - started
+
+
+def login(base_url, email, password):
+    status, body, _, _ = request(f'{base_url}/api/auth/login', {'email': email, 'password': password})
+    if status != 200:
+        raise SystemExit(f'Login as {email} failed with HTTP {status}: {body[:200]!r}')
+    return json.loads(body)['access_token']
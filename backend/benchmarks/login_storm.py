@@ -0,0 +1,77 @@
+"""Login storm benchmark.
+
+Hammers /api/auth/login from many clients while a second set of clients
+polls an unrelated endpoint, then reports login throughput and the latency
+the unrelated traffic saw. Run it against a server started the way it runs
+in production, e.g.:
+
+    gunicorn --bind 0.0.0.0:5000 --workers 2 'app:create_app()'
+    python -m benchmarks.login_storm --url http://localhost:5000
+"""
+import argparse
+import json
+import threading
+import time
+from benchmarks.common import login, ms, percentile, request
+
+
+def run(args):
+    token = login(args.url, args.email, args.password)
+    deadline = time.monotonic() + args.duration
+    lock = threading.Lock()
+    logins = {'ok': 0, 'busy': 0, 'other': 0, 'latency': []}
+    probes = []
+
+    def storm():
+        while time.monotonic() < deadline:
+            status, _, _, elapsed = request(f'{args.url}/api/auth/login',
+                                            {'email': args.email, 'password': args.password})
+            with lock:
+                key = 'ok' if status == 200 else 'busy' if status == 503 else 'other'
+                logins[key] += 1
+                if status == 200:
+                    logins['latency'].append(elapsed)
+
+    def probe():
+        while time.monotonic() < deadline:
+            status, _, _, elapsed = request(f'{args.url}{args.probe_path}', token=token)
+            with lock:
+                probes.append((status, elapsed))
+
+    threads = [threading.Thread(target=storm) for _ in range(args.login_clients)]
+    threads += [threading.Thread(target=probe) for _ in range(args.probe_clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    probe_latency = [elapsed for status, elapsed in probes if status == 200]
+    return {
+        'duration_s': args.duration,
+        'logins_per_s': round(logins['ok'] / args.duration, 1),
+        'logins_rejected_503': logins['busy'],
+        'logins_failed': logins['other'],
+        'login_p50_ms': ms(percentile(logins['latency'], 50)),
+        'login_p99_ms': ms(percentile(logins['latency'], 99)),
+        'probe_path': args.probe_path,
+        'probe_requests': len(probes),
+        'probe_errors': len(probes) - len(probe_latency),
+        'probe_p50_ms': ms(percentile(probe_latency, 50)),
+        'probe_p99_ms': ms(percentile(probe_latency, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--email', default='resident@example.com')
+    parser.add_argument('--password', default='resident123')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--login-clients', type=int, default=32)
+    parser.add_argument('--probe-clients', type=int, default=4)
+    parser.add_argument('--probe-path', default='/api/towers')
+    print(json.dumps(run(parser.parse_args()), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from sqlalchemy import insert, update
+from extensions import db
+from models import Booking, Lease, Unit
+import lease_balances
+import occupancy
+import unit_search
+
+ACTIONS = ('approve', 'reject')
+MAX_DECISIONS = 500
+# Approvals create a one-year lease at the placeholder rent, as single approvals always have
+LEASE_DAYS = 365
+DEFAULT_RENT = 1000.00
+
+
+def parse(decisions):
+    """Validate ``[{'booking_id', 'action'}]``; returns ``(ids_in_order, actions_by_id, errors)``."""
+    if not isinstance(decisions, list) or not decisions:
+        return None, None, ['decisions must be a non-empty list']
+    if len(decisions) > MAX_DECISIONS:
+        return None, None, [f'At most {MAX_DECISIONS} decisions per request']
+    order, actions, errors = [], {}, []
+    for index, decision in enumerate(decisions, start=1):
+        decision = decision if isinstance(decision, dict) else {}
+        try:
+            booking_id = uuid.UUID(str(decision.get('booking_id')))
+        except ValueError:
+            errors.append(f'decision {index}: booking_id must be a UUID')
+            continue
+        action = decision.get('action')
+        if action not in ACTIONS:
+            errors.append(f'decision {index}: action must be one of {", ".join(ACTIONS)}')
+        elif booking_id in actions:
+            errors.append(f'decision {index}: booking {booking_id} appears more than once')
+        else:
+            order.append(booking_id)
+            actions[booking_id] = action
+    return order, actions, errors
+
+
+def apply(order, actions):
+    """Approve/reject bookings in the current transaction.
+
+    Bookings and units are locked with FOR UPDATE SKIP LOCKED, so concurrent
+    batches never wait on each other: rows another transaction is deciding
+    come back as 'locked' and can be retried. Approving a unit's booking
+    rejects every other pending booking for that unit.
+
+    Returns ``(results, auto_rejected)``.
+    """
+    bookings = {
+        row.id: row for row in db.session.execute(
+            db.select(Booking.id, Booking.user_id, Booking.unit_id, Booking.status)
+            .where(Booking.id.in_(order))
+            .with_for_update(skip_locked=True)
+        )
+    }
+    # Rows that exist but were skipped are being decided by someone else right now
+    missing = set(order) - set(bookings)
+    existing = set(db.session.scalars(db.select(Booking.id).where(Booking.id.in_(missing)))) if missing else set()
+
+    results = {}
+    to_reject, wanted_units = [], set()
+    for booking_id in order:
+        row = bookings.get(booking_id)
+        if row is None:
+            results[booking_id] = {'outcome': 'locked' if booking_id in existing else 'not_found'}
+        elif row.status != 'Pending':
+            results[booking_id] = {'outcome': 'not_pending', 'status': row.status}
+        elif actions[booking_id] == 'reject':
+            to_reject.append(booking_id)
+            results[booking_id] = {'outcome': 'rejected'}
+        elif row.unit_id is None:
+            results[booking_id] = {'outcome': 'not_unit_booking'}
+        else:
+            wanted_units.add(row.unit_id)
+
+    units = {}
+    if wanted_units:
+        units = {
+            row.id: row for row in db.session.execute(
+                db.select(Unit.id, Unit.tower_id, Unit.status)
+                .where(Unit.id.in_(wanted_units))
+                .with_for_update(skip_locked=True)
+            )
+        }
+
+    # First approval per vacant unit wins, in request order
+    winners = {}
+    for booking_id in order:
+        if booking_id in results:
+            continue
+        unit_id = bookings[booking_id].unit_id
+        unit = units.get(unit_id)
+        if unit is None:
+            results[booking_id] = {'outcome': 'locked'}
+        elif unit.status != 'Vacant':
+            results[booking_id] = {'outcome': 'unit_unavailable', 'status': unit.status}
+        elif unit_id in winners:
+            to_reject.append(booking_id)
+            results[booking_id] = {'outcome': 'rejected', 'superseded_by': str(winners[unit_id])}
+        else:
+            winners[unit_id] = booking_id
+
+    if to_reject:
+        db.session.execute(
+            update(Booking).where(Booking.id.in_(to_reject)).values(status='Rejected')
+            .execution_options(synchronize_session=False)
+        )
+
+    auto_rejected = []
+    if winners:
+        today = date.today()
+        leases = []
+        for unit_id, booking_id in winners.items():
+            lease_id = uuid.uuid4()
+            leases.append({
+                'id': lease_id,
+                'unit_id': unit_id,
+                'resident_id': bookings[booking_id].user_id,
+                'start_date': today,
+                'end_date': today + timedelta(days=LEASE_DAYS),
+                'rent_amount': DEFAULT_RENT,
+                'status': 'Active'
+            })
+            results[booking_id] = {'outcome': 'approved', 'lease_id': str(lease_id)}
+        db.session.execute(insert(Lease.__table__), leases)
+        lease_balances.accrue(db.session.connection(), [lease['id'] for lease in leases])
+
+        approved = list(winners.values())
+        db.session.execute(
+            update(Unit).where(Unit.id.in_(winners)).values(status='Occupied')
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            update(Booking).where(Booking.id.in_(approved)).values(status='Approved')
+            .execution_options(synchronize_session=False)
+        )
+        auto_rejected = [
+            {'booking_id': str(row.id), 'unit_id': str(row.unit_id)}
+            for row in db.session.execute(
+                update(Booking)
+                .where(Booking.unit_id.in_(winners), Booking.status == 'Pending', Booking.id.notin_(approved))
+                .values(status='Rejected')
+                .returning(Booking.id, Booking.unit_id)
+                .execution_options(synchronize_session=False)
+            )
+        ]
+
+        # Core updates bypass the ORM flush hook, so move the snapshot here
+        deltas = Counter()
+        for unit_id in winners:
+            deltas[(units[unit_id].tower_id, 'Vacant')] -= 1
+            deltas[(units[unit_id].tower_id, 'Occupied')] += 1
+        occupancy.apply_deltas(db.session.connection(), deltas)
+        unit_search.record_changes(db.session.connection(), winners)
+
+    return [
+        {'booking_id': str(booking_id), 'action': actions[booking_id], **results[booking_id]}
+        for booking_id in order
+    ], auto_rejected
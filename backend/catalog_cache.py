@@ -0,0 +1,156 @@
+"""Response cache for the read-mostly catalogs (towers, amenities, service providers).
+
+Serialized responses live in a SQLite file shared by every worker on the host,
+keyed by endpoint and the query args the view depends on. Each catalog has a
+version counter in the same file; committing a change to one of its models
+bumps the counter, which orphans every cached response for that catalog.
+Responses carry an ETag, so clients that already have the current version get
+an empty 304.
+"""
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from flask import current_app, make_response, request
+from sqlalchemy import event
+from extensions import db
+from models import Amenity, ServiceProvider, Tower
+from replicas import use_primary
+
+logger = logging.getLogger(__name__)
+
+CATALOGS = {Tower: 'towers', Amenity: 'amenities', ServiceProvider: 'service_providers'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (catalog TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY, catalog TEXT NOT NULL, version INTEGER NOT NULL,
+    etag TEXT NOT NULL, mimetype TEXT NOT NULL, body BLOB NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def init_app(app):
+    if app.config['CATALOG_CACHE_ENABLED'] and app.config['CATALOG_CACHE_DIR']:
+        os.makedirs(app.config['CATALOG_CACHE_DIR'], exist_ok=True)
+
+
+def _store_path():
+    directory = current_app.config['CATALOG_CACHE_DIR'] or tempfile.gettempdir()
+    # One file per database so two apps on a host never share entries
+    digest = hashlib.blake2b(current_app.config['SQLALCHEMY_DATABASE_URI'].encode(), digest_size=6).hexdigest()
+    return os.path.join(directory, f'catalog-cache-{digest}.sqlite3')
+
+
+def _store():
+    path = _store_path()
+    conn = getattr(_local, 'connections', {}).get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        _local.__dict__.setdefault('connections', {})[path] = conn
+    return conn
+
+
+def _version(conn, catalog):
+    conn.execute('INSERT OR IGNORE INTO versions (catalog, version) VALUES (?, 0)', (catalog,))
+    return conn.execute('SELECT version FROM versions WHERE catalog = ?', (catalog,)).fetchone()[0]
+
+
+def bump(*catalogs):
+    # Runs after the commit, so failing here would turn a saved change into an error response
+    try:
+        conn = _store()
+        for catalog in catalogs:
+            conn.execute(
+                'INSERT INTO versions (catalog, version) VALUES (?, 1) '
+                'ON CONFLICT (catalog) DO UPDATE SET version = version + 1',
+                (catalog,)
+            )
+        # Old versions can never be served again
+        conn.execute(
+            'DELETE FROM responses WHERE version < '
+            '(SELECT version FROM versions WHERE versions.catalog = responses.catalog)'
+        )
+    except sqlite3.Error:
+        logger.exception('Could not invalidate the cached %s', ', '.join(sorted(catalogs)))
+
+
+def mark_changed(*catalogs):
+    """Invalidate catalogs once the current transaction commits (for Core writes the hooks cannot see)."""
+    db.session.info.setdefault('changed_catalogs', set()).update(catalogs)
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_catalog_writes(session, flush_context):
+    changed = {
+        CATALOGS[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in CATALOGS
+    }
+    if changed:
+        session.info.setdefault('changed_catalogs', set()).update(changed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_after_commit(session):
+    # Only after commit: bumping earlier would let another worker cache the old rows under the new version
+    changed = session.info.pop('changed_catalogs', None)
+    if changed and current_app.config['CATALOG_CACHE_ENABLED']:
+        bump(*changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_on_rollback(session):
+    session.info.pop('changed_catalogs', None)
+
+
+def cached(catalog, args=()):
+    """Serve the view's 200 responses from the shared cache, validated by ETag.
+
+    ``args`` names the query parameters the response depends on; any others are ignored.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*view_args, **view_kwargs):
+            if not current_app.config['CATALOG_CACHE_ENABLED']:
+                return view(*view_args, **view_kwargs)
+
+            key = request.endpoint + '?' + '&'.join(f'{a}={request.args.get(a, "")}' for a in args)
+            conn = _store()
+            row = conn.execute(
+                'SELECT r.etag, r.mimetype, r.body FROM responses r '
+                'JOIN versions v ON v.catalog = r.catalog AND v.version = r.version '
+                'WHERE r.key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                # Read the version before the data, so a concurrent bump leaves this entry stale rather than wrong
+                version = _version(conn, catalog)
+                response = make_response(view(*view_args, **view_kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, catalog, version, etag, mimetype, body) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, catalog, version, etag, response.mimetype, body)
+                )
+            else:
+                etag, mimetype, body = row
+                response = current_app.response_class(body, mimetype=mimetype)
+
+            response.set_etag(etag)
+            # Authenticated data: browsers may keep it but must revalidate every time
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response.make_conditional(request)
+        # A lagging replica would cache rows older than the version just read
+        return use_primary(wrapper)
+    return decorator
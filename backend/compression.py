@@ -0,0 +1,170 @@
+"""Response compression and static asset caching.
+
+API responses of COMPRESS_MIN_SIZE bytes or more (and every streamed one) are
+compressed with brotli or gzip, whichever the client prefers. The Angular
+bundle is compressed ahead of time by ``flask static compress``; the
+``.br``/``.gz`` siblings are sent as they are to clients that accept them.
+Hashed bundle files are cached for a year, index.html is revalidated.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import zlib
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+static_cli = AppGroup('static', help='Prepare the frontend bundle for serving.')
+
+# Preferred first when the client weighs them equally
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'image/svg+xml', 'application/manifest+json',
+}
+COMPRESSIBLE_EXTENSIONS = ('.js', '.mjs', '.css', '.html', '.json', '.svg', '.txt', '.map', '.xml', '.webmanifest')
+# The application builder's output hashing (angular.json outputHashing): an 8-character
+# base32 hash, as in main-5XQ2ZBNO.js, styles-IHZ6AXZU.css or media/logo-Q4WNCHZ2.png
+HASHED_FILE = re.compile(r'-[A-Z2-7]{8}\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _compressible(mimetype):
+    return mimetype is not None and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def _compressor(encoding):
+    """``(compress, flush, finish)`` for a stream in ``encoding``."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(current_app.config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress(encoding, data):
+    compress, _, finish = _compressor(encoding)
+    return compress(data) + finish()
+
+
+def _compress_stream(encoding, chunks):
+    # The compressor is set up now, while the app context is still there
+    compress, flush, finish = _compressor(encoding)
+
+    def generate():
+        try:
+            for chunk in chunks:
+                # Flushed per chunk so streamed rows still reach the client as they are produced
+                data = compress(chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    return generate()
+
+
+def _weaken_etag(response, only_if=lambda etag: True):
+    # A strong ETag names the identity bytes; a compressed body only matches them semantically.
+    # 304s repeat the weak form when that is what the client holds.
+    etag, weak = response.get_etag()
+    if etag and not weak and only_if(etag):
+        response.set_etag(etag, weak=True)
+
+
+def init_app(app):
+    @app.after_request
+    def compress_response(response):
+        if response.status_code == 304:
+            _weaken_etag(response, only_if=request.if_none_match.is_weak)
+        if not app.config['COMPRESS_RESPONSES'] or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers or not _compressible(response.mimetype) \
+                or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        streamed = response.is_streamed
+        if not streamed and (response.content_length or 0) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if encoding is None:
+            return response
+        if streamed:
+            response.response = _compress_stream(encoding, response.response)
+        else:
+            response.set_data(_compress(encoding, response.get_data()))
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
+
+    app.view_functions['static'] = lambda filename: send_static(app, filename)
+
+
+def send_static(app, filename):
+    """Send a bundle file, precompressed if a matching ``.br``/``.gz`` exists."""
+    folder = app.static_folder
+    path = os.path.join(folder, filename)
+    available = [e for e in ENCODINGS if os.path.isfile(path + SUFFIXES[e])]
+    encoding = request.accept_encodings.best_match(available) if available else None
+
+    response = send_from_directory(
+        folder, filename + SUFFIXES[encoding] if encoding else filename,
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    if available:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+
+    if HASHED_FILE.search(filename):
+        # The name changes whenever the content does
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # index.html and friends: revalidate with the ETag on every load
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+    return response
+
+
+@static_cli.command('compress')
+@click.option('--min-size', default=1024, show_default=True, help='Skip files smaller than this many bytes.')
+def compress_static(min_size):
+    """Write .gz (and .br, with brotli installed) next to each compressible bundle file."""
+    folder = current_app.static_folder
+    if not os.path.isdir(folder):
+        raise click.ClickException(f'No static folder at {folder}; build the frontend first.')
+    written = skipped = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding in ENCODINGS:
+                target = path + SUFFIXES[encoding]
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    skipped += 1
+                    continue
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    click.echo(f'Wrote {written} compressed file(s), {skipped} already up to date.')
@@ -1,6 +1,103 @@
+import ipaddress
 import os
+from datetime import timedelta
 
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://user:password@db:5432/rental_db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15)))
+    # Refresh tokens rotate on use but keep the family's original expiry,
+    # so a device logs in with its password once per this period.
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 7)))
+    # How often each worker polls for tokens revoked elsewhere (seconds)
+    REVOCATION_SYNC_INTERVAL = float(os.getenv('REVOCATION_SYNC_INTERVAL', 30))
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv('REVOCATION_BLOOM_CAPACITY', 100000))
+    # Seconds a worker may serve a cached User row for privilege checks
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+    # Password hashing. Hashes made with other parameters are upgraded on next login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+    # Login checks run in a per-worker process pool; 0 workers verifies inline
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+
+    # Per-request SQL instrumentation: requests slower than this, or issuing more
+    # statements than this (or than the view's @query_budget), are logged with their SQL.
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+    SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', 20))
+    REQUEST_LOG_LEVEL = os.getenv('REQUEST_LOG_LEVEL', 'INFO')
+    # Fail requests that exceed their statement budget instead of only logging them (tests)
+    SQL_QUERY_BUDGET_STRICT = os.getenv('SQL_QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+
+    # Seconds /health/ready waits for a trivial query before reporting the database unavailable
+    READINESS_DB_TIMEOUT = float(os.getenv('READINESS_DB_TIMEOUT', 2))
+
+    # /metrics answers a scraper that sends "Authorization: Bearer <METRICS_TOKEN>" or connects
+    # from METRICS_ALLOWED_IPS (comma-separated addresses or networks); with neither set it is closed
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_ALLOWED_IPS = [
+        ipaddress.ip_network(a.strip(), strict=False) for a in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if a.strip()
+    ]
+
+    # Towers, amenities and service providers are cached in a SQLite file shared by
+    # the workers on a host (defaults to the system temp directory)
+    CATALOG_CACHE_ENABLED = os.getenv('CATALOG_CACHE_ENABLED', 'true').lower() == 'true'
+    CATALOG_CACHE_DIR = os.getenv('CATALOG_CACHE_DIR', '')
+
+    # Unit search keeps facet bitmaps per worker: replay unit changes at most this
+    # often (seconds), and rebuild from the units table at least this often
+    UNIT_SEARCH_SYNC_INTERVAL = float(os.getenv('UNIT_SEARCH_SYNC_INTERVAL', 2))
+    UNIT_SEARCH_REBUILD_INTERVAL = float(os.getenv('UNIT_SEARCH_REBUILD_INTERVAL', 600))
+
+    # Provider availability windows are local wall-clock times in this zone
+    COMMUNITY_TIMEZONE = os.getenv('COMMUNITY_TIMEZONE', 'Asia/Kolkata')
+
+    # Admin audit entries are written after the admin's transaction commits, in batches
+    # of up to AUDIT_BATCH_SIZE at least every AUDIT_FLUSH_INTERVAL seconds. Until then they
+    # are journalled in AUDIT_SPOOL_DIR (default: instance/audit-spool), which also keeps
+    # the batches the database rejects.
+    AUDIT_BUFFERED = os.getenv('AUDIT_BUFFERED', 'true').lower() == 'true'
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 100))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))
+    AUDIT_SPOOL_DIR = os.getenv('AUDIT_SPOOL_DIR', '')
+    # Months of audit history `flask audit prune` keeps
+    AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', 24))
+
+    # Days into a month before its rent counts as overdue in the arrears report
+    RENT_GRACE_DAYS = int(os.getenv('RENT_GRACE_DAYS', 5))
+
+    # 'orjson' (fast, needs the orjson package) or 'stdlib' for jsonify output
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')
+    # Send large list responses (bookings, tenants) as they are read from the database
+    JSON_STREAM_RESPONSES = os.getenv('JSON_STREAM_RESPONSES', 'true').lower() == 'true'
+
+    # gzip/brotli for API responses of at least COMPRESS_MIN_SIZE bytes (streamed ones always)
+    COMPRESS_RESPONSES = os.getenv('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+    # Database connections per worker process. 'pgbouncer' keeps none open and lets a
+    # PgBouncer in transaction mode pool them; gunicorn.conf.py sizes DB_POOL_SIZE to its threads.
+    DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'pooled')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    # Seconds to wait for a free connection before failing the request
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    # Replace connections older than this (seconds), before a firewall or the server drops them
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_APPLICATION_NAME = os.getenv('DB_APPLICATION_NAME', 'rental-backend')
+
+    # Comma-separated read replica URLs; GET requests read from them round-robin
+    DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    # A replica further behind than this (seconds) is skipped until it catches up
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 10))
+    # Seconds between health checks of a healthy replica, and before retrying a failed one
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+    REPLICA_RETRY_AFTER = float(os.getenv('REPLICA_RETRY_AFTER', 30))
+    # Whole seconds a request waits to connect to a PostgreSQL replica before it counts as down
+    REPLICA_CONNECT_TIMEOUT = int(os.getenv('REPLICA_CONNECT_TIMEOUT', 2))
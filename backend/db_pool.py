@@ -0,0 +1,43 @@
+"""SQLAlchemy engine options from the DB_POOL_* settings.
+
+In the default ``pooled`` mode each worker keeps up to DB_POOL_SIZE
+connections open (plus DB_MAX_OVERFLOW under bursts), checks them before use
+and replaces them after DB_POOL_RECYCLE seconds. In ``pgbouncer`` mode the
+app keeps no connections of its own and leaves pooling to a PgBouncer in
+transaction mode; nothing here relies on session state (SET, advisory
+locks, LISTEN) that would leak between clients sharing a server connection.
+"""
+from sqlalchemy.pool import NullPool
+
+POOL_MODES = ('pooled', 'pgbouncer')
+
+
+def engine_options(config, uri=None):
+    """Options for the engine of ``uri`` (default: the primary database)."""
+    mode = config['DB_POOL_MODE']
+    if mode not in POOL_MODES:
+        raise ValueError(f'DB_POOL_MODE must be one of {", ".join(POOL_MODES)}, not {mode!r}')
+    uri = uri or config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        # SQLite's pools take no sizing; Flask-SQLAlchemy's defaults stand
+        return {}
+
+    options = {'connect_args': {'application_name': config['DB_APPLICATION_NAME']}}
+    if mode == 'pgbouncer':
+        # A connection to PgBouncer is cheap and only held for one transaction
+        options['poolclass'] = NullPool
+        if uri.startswith('postgresql+psycopg:'):
+            # psycopg 3 prepares repeated statements server-side, which transaction pooling breaks
+            options['connect_args']['prepare_threshold'] = None
+        return options
+
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+        pool_pre_ping=config['DB_POOL_PRE_PING'],
+        # Reuse the most recently returned connection so surplus idle ones age out
+        pool_use_lifo=True,
+    )
+    return options
@@ -0,0 +1,138 @@
+"""Full-history exports for accounting, streamed as CSV or NDJSON.
+
+Rows are read from a server-side cursor (``yield_per``) and written out a
+batch at a time, optionally through a gzip stream, so a worker's memory stays
+flat however many rows an export has.
+"""
+import csv
+import io
+import zlib
+from datetime import date
+from flask import current_app, stream_with_context
+from extensions import db
+from json_output import _dumpb
+from models import Lease, Payment, Tower, Unit, User
+from pagination import InvalidPageRequest, _encode_value
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+# Rows fetched per round trip and written per chunk
+BATCH_SIZE = 2000
+
+
+def _payments(date_from, date_to, tower_ids):
+    query = db.select(
+        Payment.id, Payment.payment_date, Payment.amount, Payment.payment_type, Payment.status,
+        Payment.lease_id, Tower.name.label('tower'), Unit.unit_number, User.email.label('resident_email')
+    ).join(Lease, Lease.id == Payment.lease_id) \
+        .join(Unit, Unit.id == Lease.unit_id) \
+        .join(Tower, Tower.id == Unit.tower_id) \
+        .join(User, User.id == Lease.resident_id)
+    if date_from:
+        query = query.where(Payment.payment_date >= date_from)
+    if date_to:
+        query = query.where(Payment.payment_date < date_to)
+    if tower_ids:
+        query = query.where(Unit.tower_id.in_(tower_ids))
+    # Served by ix_payments_payment_date_id
+    return query.order_by(Payment.payment_date, Payment.id)
+
+
+def _lease_rows(columns, date_from, date_to, tower_ids):
+    query = db.select(*columns) \
+        .join(Unit, Unit.id == Lease.unit_id) \
+        .join(Tower, Tower.id == Unit.tower_id) \
+        .join(User, User.id == Lease.resident_id)
+    # Leases running on any day in the range
+    if date_from:
+        query = query.where(Lease.end_date >= date_from.date())
+    if date_to:
+        query = query.where(Lease.start_date < date_to.date())
+    if tower_ids:
+        query = query.where(Unit.tower_id.in_(tower_ids))
+    return query.order_by(Lease.start_date, Lease.id)
+
+
+def _leases(date_from, date_to, tower_ids):
+    return _lease_rows((
+        Lease.id, Lease.status, Lease.start_date, Lease.end_date, Lease.rent_amount,
+        Tower.name.label('tower'), Unit.unit_number, Lease.resident_id, User.email.label('resident_email')
+    ), date_from, date_to, tower_ids)
+
+
+def _tenants(date_from, date_to, tower_ids):
+    query = _lease_rows((
+        User.id, User.first_name, User.last_name, User.email, User.phone, User.created_at,
+        Lease.id.label('lease_id'), Lease.status.label('lease_status'), Lease.start_date.label('lease_start'),
+        Lease.end_date.label('lease_end'), Tower.name.label('tower'), Unit.unit_number
+    ), date_from, date_to, tower_ids)
+    if not date_from and not date_to:
+        # Current tenants, as listed by GET /api/tenants
+        query = query.where(Lease.status == 'Active')
+    return query
+
+
+EXPORTS = {
+    'payments': _payments,
+    'leases': _leases,
+    'tenants': _tenants,
+}
+
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_encode_value(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(columns, batches):
+    dumpb = _dumpb()
+    for rows in batches:
+        yield b''.join(dumpb(dict(zip(columns, map(_encode_value, row)))) + b'\n' for row in rows)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export(kind, fmt='csv', date_from=None, date_to=None, tower_ids=(), compress=False):
+    """Streaming response with every ``kind`` row matching the filters, in ``fmt``."""
+    if kind not in EXPORTS:
+        raise InvalidPageRequest(f'Unknown export {kind}; expected one of {", ".join(EXPORTS)}')
+    if fmt not in FORMATS:
+        raise InvalidPageRequest(f'Unknown format {fmt}; expected one of {", ".join(FORMATS)}')
+    if date_from and date_to and date_from >= date_to:
+        raise InvalidPageRequest('from must be before to')
+
+    statement = EXPORTS[kind](date_from, date_to, tower_ids)
+    columns = list(statement.selected_columns.keys())
+
+    def batches():
+        # Runs once the body is being sent, after the view has committed
+        result = db.session.execute(statement.execution_options(yield_per=BATCH_SIZE))
+        yield from result.partitions()
+
+    chunks = (_csv_chunks if fmt == 'csv' else _ndjson_chunks)(columns, batches())
+    mimetype, extension = FORMATS[fmt]
+    filename = f'{kind}-{date.today():%Y%m%d}.{extension}'
+    if compress:
+        chunks = _gzipped(chunks)
+        mimetype, filename = 'application/gzip', f'{filename}.gz'
+
+    response = current_app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -2,8 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from flask_cors import CORS
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+# GET requests read from the replicas when DATABASE_REPLICA_URLS is set
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 migrate = Migrate()
 cors = CORS()
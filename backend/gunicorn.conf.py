@@ -0,0 +1,64 @@
+# gunicorn -c gunicorn.conf.py 'app:create_app()'
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# sync: one request per process. gthread (default): GUNICORN_THREADS requests per
+# process, so a slow /payments call no longer blocks the worker. gevent: many
+# greenlets per process, through the gevent and psycogreen packages.
+WORKER_CLASSES = {'sync': 'sync', 'gthread': 'gthread', 'threaded': 'gthread', 'gevent': 'gevent'}
+requested_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if requested_class not in WORKER_CLASSES:
+    raise RuntimeError(
+        f'Unknown GUNICORN_WORKER_CLASS {requested_class!r}; expected one of {", ".join(WORKER_CLASSES)}'
+    )
+worker_class = WORKER_CLASSES[requested_class]
+
+cpus = multiprocessing.cpu_count()
+if worker_class == 'sync':
+    default_workers, default_threads, db_pool_size = 2 * cpus + 1, 1, 1
+elif worker_class == 'gthread':
+    default_workers, default_threads = cpus + 1, 4
+    db_pool_size = int(os.getenv('GUNICORN_THREADS', default_threads))
+else:
+    # Greenlets queue for the pool instead of each holding a connection
+    default_workers, default_threads, db_pool_size = cpus, 1, 10
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', default_threads))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Each worker's SQLAlchemy pool matches the requests it can run at once (config.py
+# reads this when the app is created in the worker)
+os.environ.setdefault('DB_POOL_SIZE', str(db_pool_size))
+
+# Workers share Prometheus samples through files in this directory; it must be
+# set before any worker imports prometheus_client.
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be added to this one
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+    server.log.info('Worker class %s: %d worker(s) x %s, DB pool %s per worker (%s)',
+                    worker_class, workers,
+                    f'{threads} thread(s)' if worker_class == 'gthread' else
+                    f'{worker_connections} connection(s)' if worker_class == 'gevent' else '1 request',
+                    os.environ['DB_POOL_SIZE'], os.getenv('DB_POOL_MODE', 'pooled'))
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # psycopg2 blocks the whole process on queries unless it yields to the gevent hub
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
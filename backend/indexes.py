@@ -0,0 +1,152 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from extensions import db
+from models import POSTGRES_DDL, User, Lease
+
+indexes_cli = AppGroup('indexes', help='Create indexes and check query plans of hot endpoints.')
+
+# (role, path) pairs whose queries must be answered from an index
+HOT_ENDPOINTS = [
+    ('Resident', '/api/units'),
+    ('Resident', '/api/units?min_floor=1&max_floor=10'),
+    ('Admin', '/api/units?status=Vacant'),
+    ('Resident', '/api/bookings'),
+    ('Resident', '/api/leases'),
+    ('Resident', '/api/leases/current'),
+    ('Resident', '/api/payments'),
+    ('Admin', '/api/payments'),
+    ('Admin', '/api/tenants'),
+    ('Resident', '/api/service-providers?type=Plumber'),
+    ('Resident', '/api/service-providers/available?type=Plumber'),
+    ('Resident', '/api/service-providers/available'),
+    ('Admin', '/api/admin/audit-logs'),
+    ('Admin', '/api/admin/audit-logs?action=CREATE_USER'),
+]
+
+# Tables that grow with the portfolio. Lookup tables such as towers and
+# amenities stay small enough that a sequential scan is the right plan.
+SCALED_TABLES = {
+    'users', 'units', 'unit_amenities', 'bookings', 'leases', 'payments',
+    'audit_logs', 'service_providers',
+}
+
+
+@indexes_cli.command('create')
+def create_indexes():
+    """Create any model-declared index missing from an existing database."""
+    inspector = db.inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    created = 0
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            click.echo(f'Creating {index.name} on {table.name}')
+            index.create(db.engine)
+            created += 1
+
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn:
+            for name, (table, statements) in POSTGRES_DDL.items():
+                # Exclusion constraints are backed by an index of the same name
+                if table not in tables or conn.execute(
+                    db.text('SELECT to_regclass(:name)'), {'name': name}
+                ).scalar():
+                    continue
+                click.echo(f'Creating {name}')
+                for ddl in statements:
+                    conn.execute(ddl)
+                created += 1
+    click.echo(f'{created} index(es) created.')
+
+
+def _token_for(role):
+    query = User.query.filter_by(role=role)
+    if role == 'Resident':
+        # Prefer a resident with an active lease so lease/payment queries have real parameters
+        query = query.join(Lease, Lease.resident_id == User.id).filter(Lease.status == 'Active')
+    user = query.first() or User.query.filter_by(role=role).first()
+    if not user:
+        raise click.ClickException(f'No {role} user found; seed the database first.')
+    return create_access_token(identity=str(user.id), additional_claims={
+        'role': user.role,
+        'is_super_admin': bool(user.is_super_admin)
+    })
+
+
+def _capture_statements(client, path, token):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    # Replicas too: read requests are routed to them when configured
+    engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', record)
+    try:
+        # Buffered: streamed lists run their queries while the body is read, and an
+        # unread streamed response would keep its request context open
+        response = client.get(path, headers={'Authorization': f'Bearer {token}'}, buffered=True)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', record)
+    return response, statements
+
+
+def _seq_scans(plan):
+    node = plan.get('Plan', plan)
+    found = []
+    if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in SCALED_TABLES:
+        found.append(node['Relation Name'])
+    for child in node.get('Plans', []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def explain(statement, parameters):
+    """Return the scaled tables the planner would read sequentially for this statement."""
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # With sequential scans priced out, any remaining Seq Scan means no index
+        # matches the predicate; this holds on a small seeded database too.
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+        plan = cursor.fetchone()[0][0]
+        return _seq_scans(plan)
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+@indexes_cli.command('check')
+def check_plans():
+    """EXPLAIN every query issued by the hot endpoints and fail on sequential scans."""
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('Query plan checks require PostgreSQL.')
+
+    tokens = {role: _token_for(role) for role in {role for role, _ in HOT_ENDPOINTS}}
+    client = current_app.test_client()
+    failures = 0
+    for role, path in HOT_ENDPOINTS:
+        response, statements = _capture_statements(client, path, tokens[role])
+        if response.status_code >= 500:
+            click.echo(f'FAIL {role:<8} {path}: HTTP {response.status_code}')
+            failures += 1
+            continue
+        scans = sorted({table for s, p in statements for table in explain(s, p)})
+        if scans:
+            click.echo(f'FAIL {role:<8} {path}: sequential scan on {", ".join(scans)}')
+            failures += 1
+        else:
+            click.echo(f'ok   {role:<8} {path} ({len(statements)} queries)')
+    if failures:
+        raise click.ClickException(f'{failures} endpoint(s) regressed to sequential scans.')
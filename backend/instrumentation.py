@@ -0,0 +1,153 @@
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('requests')
+
+# Distinct statements tracked per request for the slow-request log
+MAX_RECORDED_STATEMENTS = 200
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        entry = self.statements.get(statement)
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += duration
+        elif len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements[statement] = [1, duration]
+
+    def top_statements(self, limit=5):
+        """Distinct statements ordered by total time, so an N+1 shows up as one line with a high count."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {'sql': ' '.join(statement.split()), 'count': count, 'ms': round(total * 1000, 2)}
+            for statement, (count, total) in ranked[:limit]
+        ]
+
+
+def _active_stats():
+    stats = []
+    if has_request_context() and 'sql_stats' in g:
+        stats.append(g.sql_stats)
+    stats.extend(getattr(_local, 'counters', ()))
+    return stats
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    for stats in _active_stats():
+        stats.record(statement, duration)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+@contextmanager
+def count_queries(max_queries=None):
+    """Count statements run by this thread inside the block, e.g. around a test client call.
+
+        with count_queries(max_queries=3) as stats:
+            client.get('/api/units', headers=headers)
+    """
+    stats = QueryStats()
+    counters = _local.__dict__.setdefault('counters', [])
+    counters.append(stats)
+    try:
+        yield stats
+    finally:
+        counters.remove(stats)
+    if max_queries is not None and stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f'{stats.count} SQL statements, expected at most {max_queries}: '
+            + json.dumps(stats.top_statements(), indent=2)
+        )
+
+
+def query_budget(max_queries):
+    """Declare the most statements a view should issue; enforced when SQL_QUERY_BUDGET_STRICT is on."""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def _server_timing(stats, total):
+    return f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", app;dur={total * 1000:.2f}'
+
+
+def init_app(app):
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(app.config['REQUEST_LOG_LEVEL'])
+
+    @app.before_request
+    def start_request_stats():
+        g.sql_stats = QueryStats()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - g.pop('request_started')
+        response.headers['Server-Timing'] = _server_timing(stats, total)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+            'sql_count': stats.count,
+            'sql_ms': round(stats.duration * 1000, 2),
+        }
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        max_queries = app.config['SLOW_REQUEST_QUERIES'] if budget is None else budget
+        slow = total * 1000 >= app.config['SLOW_REQUEST_MS'] or stats.count > max_queries
+        if slow:
+            record['statements'] = stats.top_statements()
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+        if app.config['SQL_QUERY_BUDGET_STRICT'] and stats.count > max_queries:
+            raise QueryBudgetExceeded(
+                f'{request.method} {request.path} issued {stats.count} SQL statements, '
+                f'budget is {max_queries}'
+            )
+        return response
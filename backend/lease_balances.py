@@ -0,0 +1,336 @@
+"""Per-lease monthly rent ledger and the arrears report built on it.
+
+lease_balances holds, for each lease and calendar month, the rent that fell
+due and the completed rent payments dated in that month. Rent accrues for
+every month a lease overlaps once it is created, and for a new month when
+``flask balances accrue`` runs; the months a lease starts and ends in are
+charged for the days it covers. The report only reads the ledger. Payments move
+``paid`` in the same flush that inserts them.
+
+A lease is in arrears when the rent due up to the grace cutoff exceeds what
+it has paid in total, whenever paid; payments settle the oldest month first.
+"""
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Date, Integer, case, cast, event, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from models import Lease, LeaseBalance, Payment, Tower, Unit, User
+
+balances_cli = AppGroup('balances', help='Maintain the lease balance ledger.')
+
+# Leases in these states keep accruing rent until their end date
+ACCRUING_STATUSES = ('Active', 'Expired')
+RENT_TYPE = 'Rent'
+PAID_STATUS = 'Completed'
+# SQLite allows at most 500 terms in a compound SELECT
+MONTHS_PER_STATEMENT = 400
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _insert(connection):
+    return (pg_insert if connection.dialect.name == 'postgresql' else sqlite_insert)(LeaseBalance.__table__)
+
+
+def _month_of(connection, column):
+    if connection.dialect.name == 'postgresql':
+        return cast(func.date_trunc('month', column), Date)
+    return func.date(column, 'start of month')
+
+
+def _add_months(connection, column, months):
+    if connection.dialect.name == 'postgresql':
+        return cast(column + func.make_interval(0, cast(months, Integer)), Date)
+    return func.date(column, func.printf('%+d months', months))
+
+
+def _overlap_days(connection, start, end, first, last):
+    """Days the dates ``start``..``end`` share with ``first``..``last`` (both inclusive, and overlapping)."""
+    if connection.dialect.name == 'postgresql':
+        return func.least(end, last) - func.greatest(start, first) + 1
+    return func.julianday(func.min(end, last)) - func.julianday(func.max(start, first)) + 1
+
+
+# --- Maintenance ---
+
+def accrue(connection, lease_ids=None, since=None, through=None):
+    """Record rent due for each month from ``since`` to ``through`` (default: this month) that the
+    leases overlap, prorated by day where they cover part of it. Idempotent; all accruing leases
+    when ``lease_ids`` is None."""
+    through = month_start(through or date.today())
+    leases = select(Lease.id, Lease.rent_amount, Lease.start_date, Lease.end_date) \
+        .where(Lease.status.in_(ACCRUING_STATUSES))
+    if lease_ids is not None:
+        if not lease_ids:
+            return
+        leases = leases.where(Lease.id.in_(lease_ids))
+    leases = leases.subquery('accruing')
+    if since is None:
+        first = connection.execute(select(func.min(leases.c.start_date))).scalar()
+        if first is None:
+            return
+        since = first
+    since = month_start(since)
+
+    months = []
+    while since <= through:
+        months.append(since)
+        since = next_month(since)
+    for start in range(0, len(months), MONTHS_PER_STATEMENT):
+        calendar = union_all(*[
+            select(
+                literal(m, Date).label('month'),
+                literal(next_month(m), Date).label('next_month'),
+                literal(next_month(m) - timedelta(days=1), Date).label('last_day'),
+                literal((next_month(m) - m).days, Integer).label('days')
+            )
+            for m in months[start:start + MONTHS_PER_STATEMENT]
+        ]).subquery('calendar')
+        days = _overlap_days(
+            connection, leases.c.start_date, leases.c.end_date, calendar.c.month, calendar.c.last_day
+        )
+        rent_due = case(
+            (days == calendar.c.days, leases.c.rent_amount),
+            else_=func.round(leases.c.rent_amount * days / calendar.c.days, 2)
+        )
+        stmt = _insert(connection).from_select(
+            ['lease_id', 'month', 'rent_due', 'paid'],
+            select(leases.c.id, calendar.c.month, rent_due, literal(0)).where(
+                leases.c.start_date < calendar.c.next_month,
+                leases.c.end_date >= calendar.c.month
+            )
+        )
+        # Payments may have created the row first, with nothing due yet; rows already right are left alone
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['lease_id', 'month'],
+            set_={'rent_due': stmt.excluded.rent_due},
+            where=LeaseBalance.__table__.c.rent_due != stmt.excluded.rent_due
+        ))
+
+
+def apply_payments(connection, deltas):
+    """Add ``{(lease_id, month): amount}`` to the paid column."""
+    rows = [
+        {'lease_id': lease_id, 'month': month, 'rent_due': 0, 'paid': amount}
+        for (lease_id, month), amount in deltas.items() if amount
+    ]
+    if rows:
+        stmt = _insert(connection).values(rows)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['lease_id', 'month'],
+            set_={'paid': LeaseBalance.__table__.c.paid + stmt.excluded.paid}
+        ))
+
+
+PAYMENT_FIELDS = ('lease_id', 'payment_date', 'amount', 'payment_type', 'status')
+
+
+def _contribution(lease_id, payment_date, amount, payment_type, status):
+    """``((lease_id, month), amount)`` a payment adds to the ledger, or ``(None, 0)``."""
+    if payment_type != RENT_TYPE or status != PAID_STATUS or lease_id is None:
+        return None, 0
+    lease_id = lease_id if isinstance(lease_id, uuid.UUID) else uuid.UUID(str(lease_id))
+    return (lease_id, month_start(payment_date)), Decimal(str(amount))
+
+
+@event.listens_for(db.session, 'before_flush')
+def track_payments(session, flush_context, instances):
+    # Changed and removed payments are compared with their stored rows, which are
+    # only still there before the flush; the deltas are applied after it
+    deltas = Counter()
+    changed = [o for o in session.dirty if isinstance(o, Payment) and session.is_modified(o)]
+    removed = [o for o in session.deleted if isinstance(o, Payment)]
+    if changed or removed:
+        stored = session.connection().execute(
+            select(*(Payment.__table__.c[f] for f in PAYMENT_FIELDS))
+            .where(Payment.id.in_([o.id for o in (*changed, *removed)]))
+        )
+        for row in stored:
+            key, amount = _contribution(*row)
+            if key:
+                deltas[key] -= amount
+    for obj in (*session.new, *changed):
+        if not isinstance(obj, Payment):
+            continue
+        if obj.payment_date is None:
+            # Fix the date now so the ledger month matches the stored row
+            obj.payment_date = datetime.utcnow()
+        if obj.status is None:
+            # Column defaults are only filled in by the INSERT, after this hook
+            obj.status = Payment.__table__.c.status.default.arg
+        key, amount = _contribution(*(getattr(obj, f) for f in PAYMENT_FIELDS))
+        if key:
+            deltas[key] += amount
+    if deltas:
+        session.info.setdefault('rent_payments', Counter()).update(deltas)
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_rent(session, flush_context):
+    # Runs inside the flush, so balances move in the same transaction as payments and leases
+    new_leases = [obj.id for obj in session.new if isinstance(obj, Lease)]
+    if new_leases:
+        accrue(session.connection(), new_leases)
+    deltas = session.info.pop('rent_payments', None)
+    if deltas:
+        apply_payments(session.connection(), deltas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_on_rollback(session):
+    session.info.pop('rent_payments', None)
+
+
+def _unaccrued(month):
+    """Running leases with nothing due yet in ``month``."""
+    return select(Lease.id).where(
+        Lease.status.in_(ACCRUING_STATUSES),
+        Lease.rent_amount > 0,
+        Lease.start_date < next_month(month),
+        Lease.end_date >= month,
+        ~select(LeaseBalance.lease_id).where(
+            LeaseBalance.lease_id == Lease.id,
+            LeaseBalance.month == month,
+            LeaseBalance.rent_due > 0
+        ).exists()
+    )
+
+
+def unaccrued_count(connection, through):
+    """How many running leases have no rent recorded yet for ``through``'s month."""
+    return connection.execute(
+        select(func.count()).select_from(_unaccrued(month_start(through)).subquery())
+    ).scalar()
+
+
+def ensure_accrued(connection, through):
+    """Accrue rent for running leases with nothing due yet in ``through``'s month (a new
+    month, or leases missed earlier); returns whether anything was missing."""
+    month = month_start(through)
+    missing = connection.execute(_unaccrued(month)).scalars().all()
+    if missing:
+        accrue(connection, missing, through=month)
+    return bool(missing)
+
+
+def rebuild(connection):
+    """Recompute the whole ledger from leases and payments."""
+    connection.execute(db.delete(LeaseBalance))
+    accrue(connection)
+    month = _month_of(connection, Payment.payment_date)
+    stmt = _insert(connection).from_select(
+        ['lease_id', 'month', 'rent_due', 'paid'],
+        select(Payment.lease_id, month, literal(0), func.sum(Payment.amount))
+        .where(Payment.payment_type == RENT_TYPE, Payment.status == PAID_STATUS)
+        .group_by(Payment.lease_id, month)
+    )
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=['lease_id', 'month'],
+        set_={'paid': stmt.excluded.paid}
+    ))
+
+
+# --- Report ---
+
+def arrears(as_of, grace_days=0, tower_ids=()):
+    """Leases whose rent due by ``as_of`` (less the grace period) exceeds their payments,
+    with their tower's totals, ordered by tower (largest arrears first) and balance.
+
+    Returns ``(cutoff month, rows)``; one aggregate query over the ledger does all the arithmetic.
+    """
+    cutoff = month_start(as_of - timedelta(days=grace_days))
+    connection = db.session.connection()
+    lb = LeaseBalance.__table__.c
+    # Only rent up to the cutoff is due, but payments count whenever they were
+    # made: early in the grace window, or ahead for months not yet due
+    fell_due = (lb.month <= cutoff) & (lb.rent_due > 0)
+    due = func.sum(case((lb.month <= cutoff, lb.rent_due), else_=0))
+    paid = func.sum(lb.paid)
+    ledger = select(
+        lb.lease_id,
+        (due - paid).label('balance'),
+        func.count(case((fell_due, 1))).label('months_due'),
+        func.min(case((fell_due, lb.month))).label('first_due'),
+        func.max(case((fell_due, lb.month))).label('last_due')
+    ).group_by(lb.lease_id).having(due > paid).subquery('ledger')
+    last = LeaseBalance.__table__.alias('last_month')
+
+    # Payments settle the oldest month first: the unpaid months are the last
+    # ceil(balance / rent) of the months that fell due, counting the latest
+    # one in full when the lease ended part way through it
+    owed = ledger.c.balance + Lease.rent_amount - last.c.rent_due
+    months_overdue = func.min(
+        ledger.c.months_due,
+        cast((owed + Lease.rent_amount - 0.005) / Lease.rent_amount, Integer)
+    ) if connection.dialect.name == 'sqlite' else func.least(
+        ledger.c.months_due, cast(func.ceil(owed / Lease.rent_amount), Integer)
+    )
+    leases = select(
+        Tower.id.label('tower_id'),
+        Tower.name.label('tower_name'),
+        Lease.id.label('lease_id'),
+        Unit.unit_number,
+        User.email.label('resident_email'),
+        Lease.rent_amount,
+        Lease.status,
+        ledger.c.balance,
+        months_overdue.label('months_overdue'),
+        ledger.c.months_due,
+        ledger.c.first_due
+    ).select_from(ledger) \
+        .join(Lease, Lease.id == ledger.c.lease_id) \
+        .join(last, (last.c.lease_id == ledger.c.lease_id) & (last.c.month == ledger.c.last_due)) \
+        .join(Unit, Unit.id == Lease.unit_id) \
+        .join(Tower, Tower.id == Unit.tower_id) \
+        .join(User, User.id == Lease.resident_id)
+    if tower_ids:
+        leases = leases.where(Tower.id.in_(tower_ids))
+    leases = leases.subquery('arrears')
+
+    oldest_unpaid = _add_months(connection, leases.c.first_due, leases.c.months_due - leases.c.months_overdue)
+    by_tower = {'partition_by': leases.c.tower_id}
+    rows = connection.execute(
+        select(
+            leases,
+            oldest_unpaid.label('oldest_unpaid'),
+            func.count().over(**by_tower).label('tower_leases'),
+            func.sum(leases.c.balance).over(**by_tower).label('tower_amount'),
+            func.min(oldest_unpaid).over(**by_tower).label('tower_oldest_unpaid')
+        ).order_by(
+            func.sum(leases.c.balance).over(**by_tower).desc(), leases.c.tower_id,
+            leases.c.balance.desc(), leases.c.lease_id
+        )
+    ).all()
+    return cutoff, rows
+
+
+# --- CLI ---
+
+@balances_cli.command('accrue')
+def accrue_command():
+    """Record this month's rent for every running lease (run early each month)."""
+    accrued = ensure_accrued(db.session.connection(), date.today())
+    db.session.commit()
+    click.echo(f'Accrued rent through {date.today():%Y-%m}.' if accrued else 'Already up to date.')
+
+
+@balances_cli.command('rebuild')
+def rebuild_command():
+    """Recompute every lease balance from the leases and payments tables."""
+    connection = db.session.connection()
+    rebuild(connection)
+    count = connection.execute(select(func.count()).select_from(LeaseBalance)).scalar()
+    db.session.commit()
+    click.echo(f'Rebuilt {count} lease balance row(s).')
@@ -0,0 +1,151 @@
+"""Expire leases past their end date and hand their units back.
+
+``flask leases expire`` walks due leases (Active, end_date before the run
+date) in (end_date, id) order, one short transaction per chunk. Each chunk
+marks its leases Expired, flips units with no other active lease (a renewal)
+back to Vacant, moves the occupancy snapshot and the unit search index, and
+writes one audit entry per lease. A chunk commits as a whole, so an
+interrupted run is resumed by running the command again.
+
+On PostgreSQL due leases are locked with FOR UPDATE SKIP LOCKED: leases
+another transaction is changing are left for the next run instead of waited on.
+"""
+import time
+from collections import Counter
+from datetime import date
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, tuple_, update
+from extensions import db
+from models import Lease, Unit, User
+import audit_log
+import occupancy
+import unit_search
+
+leases_cli = AppGroup('leases', help='Lease maintenance jobs.')
+
+DEFAULT_CHUNK = 500
+
+
+def _due(connection, as_of, after, limit, lock):
+    query = select(Lease.id, Lease.unit_id, Lease.resident_id, Lease.end_date) \
+        .where(Lease.status == 'Active', Lease.end_date < as_of)
+    if after is not None:
+        query = query.where(tuple_(Lease.end_date, Lease.id) > tuple_(*after))
+    query = query.order_by(Lease.end_date, Lease.id).limit(limit)
+    if lock:
+        query = query.with_for_update(skip_locked=True)
+    return connection.execute(query).all()
+
+
+def _vacated_units(unit_ids, excluding):
+    """Occupied units among ``unit_ids`` with no active lease left once ``excluding`` expire."""
+    renewed = select(Lease.id).where(
+        Lease.unit_id == Unit.id,
+        Lease.status == 'Active',
+        Lease.id.notin_(excluding)
+    ).exists()
+    return Unit.id.in_(unit_ids) & (Unit.status == 'Occupied') & ~renewed
+
+
+def expire_chunk(as_of, after, limit, admin_id, dry_run=False):
+    """Expire up to ``limit`` due leases after the ``after`` key; returns ``(last key, leases, units)``."""
+    connection = db.session.connection()
+    leases = _due(connection, as_of, after, limit, lock=not dry_run)
+    if not leases:
+        return None, 0, 0
+    last = (leases[-1].end_date, leases[-1].id)
+    lease_ids = [l.id for l in leases]
+    unit_ids = {l.unit_id for l in leases}
+
+    if dry_run:
+        vacated = connection.execute(
+            select(db.func.count()).select_from(Unit).where(_vacated_units(unit_ids, lease_ids))
+        ).scalar()
+        db.session.rollback()
+        return last, len(leases), vacated
+
+    # Locks: the due leases (above), their units, then occupancy rows. Booking approvals
+    # lock bookings, units and occupancy rows, never an existing lease, and skip units
+    # held here rather than wait for them. Occupancy rows are taken last and in key
+    # order by both, so neither holds one the other is waiting on: no deadlock.
+    expired = connection.execute(
+        update(Lease).where(Lease.id.in_(lease_ids), Lease.status == 'Active')
+        .values(status='Expired')
+        .returning(Lease.id, Lease.unit_id, Lease.end_date)
+        .execution_options(synchronize_session=False)
+    ).all()
+    vacated = connection.execute(
+        update(Unit).where(_vacated_units(unit_ids, lease_ids))
+        .values(status='Vacant')
+        .returning(Unit.id, Unit.tower_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # Core updates bypass the ORM flush hooks
+    deltas = Counter()
+    for unit in vacated:
+        deltas[(unit.tower_id, 'Occupied')] -= 1
+        deltas[(unit.tower_id, 'Vacant')] += 1
+    occupancy.apply_deltas(connection, deltas)
+    unit_search.record_changes(connection, [u.id for u in vacated])
+
+    vacated_ids = {u.id for u in vacated}
+    if expired:
+        audit_log.write(connection, [
+            audit_log.entry(admin_id, 'EXPIRE_LEASE', target_id=lease.id, details={
+                'unit_id': str(lease.unit_id),
+                'end_date': lease.end_date.isoformat(),
+                'unit_vacated': lease.unit_id in vacated_ids
+            }) for lease in expired
+        ])
+    db.session.commit()
+    return last, len(expired), len(vacated)
+
+
+def _job_admin(email):
+    query = User.query.filter(User.role == 'Admin')
+    query = query.filter(User.email == email) if email else \
+        query.filter(User.is_super_admin.is_(True)).order_by(User.created_at)
+    admin = query.first()
+    if not admin:
+        raise click.ClickException(f'No admin {email}.' if email else 'No super admin to attribute the job to.')
+    return admin.id
+
+
+@leases_cli.command('expire')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Expire leases that ended before this date (default: today).')
+@click.option('--chunk-size', default=DEFAULT_CHUNK, show_default=True, help='Leases per transaction.')
+@click.option('--limit', type=int, default=None, help='Stop after this many leases.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between chunks.')
+@click.option('--admin', 'admin_email', default=None,
+              help='Admin the audit entries are attributed to (default: the first super admin).')
+@click.option('--dry-run', is_flag=True, help='Count what would change without writing.')
+def expire_command(as_of, chunk_size, limit, pause, admin_email, dry_run):
+    """Mark leases past their end date Expired and vacate their units, in chunks."""
+    as_of = as_of.date() if as_of else date.today()
+    admin_id = _job_admin(admin_email)
+    db.session.commit()
+
+    started = time.perf_counter()
+    after, chunks, total_leases, total_units = None, 0, 0, 0
+    while limit is None or total_leases < limit:
+        chunk_started = time.perf_counter()
+        size = chunk_size if limit is None else min(chunk_size, limit - total_leases)
+        after, leases, units = expire_chunk(as_of, after, size, admin_id, dry_run=dry_run)
+        if after is None:
+            break
+        chunks += 1
+        total_leases += leases
+        total_units += units
+        click.echo(f'chunk {chunks}: {leases} lease(s), {units} unit(s) vacated '
+                   f'in {(time.perf_counter() - chunk_started) * 1000:.0f} ms (through {after[0]})')
+        if pause:
+            time.sleep(pause)
+
+    elapsed = time.perf_counter() - started
+    verb = 'Would expire' if dry_run else 'Expired'
+    click.echo(f'{verb} {total_leases} lease(s) ending before {as_of} and vacate{"" if dry_run else "d"} '
+               f'{total_units} unit(s) in {chunks} chunk(s), {elapsed:.2f}s '
+               f'({total_leases / elapsed if elapsed else 0:.0f} leases/s).')
@@ -0,0 +1,145 @@
+"""Prometheus metrics.
+
+Under gunicorn each worker writes its samples to files in
+PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) and /metrics merges them,
+so any worker can answer a scrape. Without that variable the metrics are
+simply those of the current process. Scrapers must present METRICS_TOKEN or
+connect from METRICS_ALLOWED_IPS.
+"""
+import hmac
+import ipaddress
+import os
+import time
+from flask import Blueprint, Response, current_app, g, got_request_exception, jsonify, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from extensions import db
+
+metrics_bp = Blueprint('metrics', __name__)
+
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests handled',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request',
+    ['blueprint', 'endpoint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size',
+    ['blueprint', 'endpoint'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+EXCEPTIONS = Counter(
+    'http_request_exceptions_total', 'Unhandled exceptions raised while handling a request',
+    ['blueprint', 'endpoint', 'exception']
+)
+# Pool gauges are per worker and engine ('primary' or a replica bind key);
+# 'livesum' adds up the live workers' values
+POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Connections currently checked out of the pool', ['bind'],
+    multiprocess_mode='livesum'
+)
+POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Connections open beyond the pool size', ['bind'], multiprocess_mode='livesum'
+)
+POOL_SIZE = Gauge(
+    'db_pool_size', 'Connections each pool keeps open (0 when PgBouncer pools them)', ['bind'],
+    multiprocess_mode='livesum'
+)
+# Steady under a healthy pool; climbs with recycling, pre-ping failures or NullPool
+POOL_CONNECTS = Counter('db_pool_connections_opened_total', 'Database connections opened', ['bind'])
+
+
+def _labels():
+    endpoint = request.endpoint or 'none'
+    return request.blueprint or 'app', endpoint
+
+
+def _update_overflow(bind, pool):
+    if hasattr(pool, 'overflow'):
+        POOL_OVERFLOW.labels(bind).set(max(pool.overflow(), 0))
+
+
+def _instrument_pool(bind, pool):
+    POOL_SIZE.labels(bind).set(pool.size() if hasattr(pool, 'size') else 0)
+
+    @event.listens_for(pool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        POOL_CONNECTS.labels(bind).inc()
+
+    @event.listens_for(pool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKED_OUT.labels(bind).inc()
+        _update_overflow(bind, pool)
+
+    @event.listens_for(pool, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        POOL_CHECKED_OUT.labels(bind).dec()
+        _update_overflow(bind, pool)
+
+
+def _record_exception(sender, exception, **extra):
+    blueprint, endpoint = _labels()
+    EXCEPTIONS.labels(blueprint, endpoint, type(exception).__name__).inc()
+
+
+def init_app(app):
+    with app.app_context():
+        # The primary and every read replica
+        for key, engine in db.engines.items():
+            _instrument_pool(key or 'primary', engine.pool)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        blueprint, endpoint = _labels()
+        REQUESTS.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+        LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+        # Streamed responses have no length up front
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(blueprint, endpoint).observe(response.content_length)
+        return response
+
+    got_request_exception.connect(_record_exception, app)
+    app.register_blueprint(metrics_bp)
+
+
+def _scrape_allowed():
+    token = current_app.config['METRICS_TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return True
+    allowed = current_app.config['METRICS_ALLOWED_IPS']
+    if not allowed or not request.remote_addr:
+        return False
+    try:
+        address = ipaddress.ip_address(request.remote_addr)
+    except ValueError:
+        return False
+    return any(address in network for network in allowed)
+
+
+@metrics_bp.route('/metrics')
+def export_metrics():
+    # Route names, error rates and pool sizes are not for the public internet
+    if not _scrape_allowed():
+        return jsonify({'msg': 'Forbidden'}), 403
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    # CONTENT_TYPE_LATEST already names its charset; as a mimetype Flask would add another
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -2,9 +2,20 @@
 import uuid
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, ForeignKey, event
 from extensions import db
 
+# Objects create_all cannot express portably, by the name of the relation they
+# create. PostgreSQL only; 'flask indexes create' adds any that are missing.
+POSTGRES_DDL = {}
+
+
+def postgres_ddl(table, name, *statements):
+    ddls = [DDL(statement) for statement in statements]
+    POSTGRES_DDL[name] = (table.name, ddls)
+    for ddl in ddls:
+        event.listen(table, 'after_create', ddl.execute_if(dialect='postgresql'))
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -58,6 +69,44 @@ class Unit(db.Model):
     leases = db.relationship('Lease', backref='unit', lazy=True)
     amenities = db.relationship('Amenity', secondary='unit_amenities', backref='units')
 
+    __table_args__ = (
+        # Resident catalog: status = 'Vacant' ORDER BY unit_number, id
+        db.Index('ix_units_status_unit_number', 'status', 'unit_number', 'id'),
+        # Tower filter and occupancy reconciliation (GROUP BY tower_id, status)
+        db.Index('ix_units_tower_id_status', 'tower_id', 'status'),
+    )
+
+# Free-text unit search (unit number and nearby places); the expression must match
+# unit_search.search_text() exactly for the planner to use the index.
+UNIT_SEARCH_TEXT_SQL = "lower(unit_number || ' ' || coalesce(CAST(nearby_places AS TEXT), ''))"
+postgres_ddl(
+    Unit.__table__, 'ix_units_search_trgm',
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX ix_units_search_trgm ON units USING gin (({UNIT_SEARCH_TEXT_SQL}) gin_trgm_ops)'
+)
+
+class UnitSearchChange(db.Model):
+    __tablename__ = 'unit_search_changes'
+
+    # Units whose search facets may have changed; workers replay these into their
+    # in-memory index. A NULL unit_id asks every worker to rebuild from scratch.
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    unit_id = db.Column(UUID(as_uuid=True), nullable=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_unit_search_changes_changed_at', 'changed_at'),
+    )
+
+class OccupancyCount(db.Model):
+    __tablename__ = 'occupancy_counts'
+
+    # One row per (tower, status). The max UUID (all f's) holds portfolio-wide totals.
+    # Maintained by occupancy.py whenever units are added, removed or change status.
+    tower_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    unit_count = db.Column(db.Integer, nullable=False, default=0)
+
 class Amenity(db.Model):
     __tablename__ = 'amenities'
 
@@ -73,6 +122,11 @@ class UnitAmenity(db.Model):
     unit_id = db.Column(UUID(as_uuid=True), ForeignKey('units.id'), primary_key=True)
     amenity_id = db.Column(UUID(as_uuid=True), ForeignKey('amenities.id'), primary_key=True)
 
+    __table_args__ = (
+        # Amenity facet filter looks up units by amenity
+        db.Index('ix_unit_amenities_amenity_id', 'amenity_id', 'unit_id'),
+    )
+
 class Booking(db.Model):
     __tablename__ = 'bookings'
 
@@ -89,6 +143,25 @@ class Booking(db.Model):
     amenity = db.relationship('Amenity', backref='bookings')
     unit = db.relationship('Unit', backref='bookings')
 
+    __table_args__ = (
+        db.Index('ix_bookings_user_id_status', 'user_id', 'status'),
+        # Pending requests competing for the same unit
+        db.Index('ix_bookings_pending_unit', 'unit_id',
+                 postgresql_where=db.text("status = 'Pending'"),
+                 sqlite_where=db.text("status = 'Pending'")),
+    )
+
+# Active slots of one amenity may not overlap. btree_gist provides the uuid '='
+# for the GiST index, which also serves the availability range queries.
+BOOKING_SLOT_CONSTRAINT = 'ex_bookings_amenity_slot'
+postgres_ddl(
+    Booking.__table__, BOOKING_SLOT_CONSTRAINT,
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    f"ALTER TABLE bookings ADD CONSTRAINT {BOOKING_SLOT_CONSTRAINT} "
+    "EXCLUDE USING gist (amenity_id WITH =, tsrange(start_time, end_time) WITH &&) "
+    "WHERE (amenity_id IS NOT NULL AND status IN ('Pending', 'Confirmed'))"
+)
+
 class Lease(db.Model):
     __tablename__ = 'leases'
 
@@ -102,6 +175,14 @@ class Lease(db.Model):
     
     payments = db.relationship('Payment', backref='lease', lazy=True)
 
+    __table_args__ = (
+        # A resident's leases, and their active lease (resident_id = ? AND status = 'Active')
+        db.Index('ix_leases_resident_id_status', 'resident_id', 'status'),
+        # Tenant listing and expiry sweeps: status = ... [AND end_date < ...]
+        db.Index('ix_leases_status_end_date', 'status', 'end_date'),
+        db.Index('ix_leases_unit_id', 'unit_id'),
+    )
+
 class Payment(db.Model):
     __tablename__ = 'payments'
 
@@ -112,6 +193,22 @@ class Payment(db.Model):
     payment_type = db.Column(db.String(50), nullable=False) # Rent, Deposit, Fee
     status = db.Column(db.String(50), default='Completed') # Pending, Completed, Failed
 
+    __table_args__ = (
+        db.Index('ix_payments_lease_id_payment_date', 'lease_id', 'payment_date'),
+        # Ledger keyset order
+        db.Index('ix_payments_payment_date_id', 'payment_date', 'id'),
+    )
+
+class LeaseBalance(db.Model):
+    __tablename__ = 'lease_balances'
+
+    # One row per lease and calendar month: rent that fell due vs completed rent payments dated
+    # in that month. Maintained by lease_balances.py as leases are created and rent is paid.
+    lease_id = db.Column(UUID(as_uuid=True), ForeignKey('leases.id', ondelete='CASCADE'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True) # First day of the month
+    rent_due = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    paid = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
 class ServiceProvider(db.Model):
     __tablename__ = 'service_providers'
 
@@ -124,6 +221,16 @@ class ServiceProvider(db.Model):
     photo_url = db.Column(db.String(255))
     availability = db.Column(db.String(100), default="9 AM - 6 PM")
 
+    __table_args__ = (
+        # Best rated first, per type or across all types, unrated as 0:
+        # ORDER BY coalesce(rating, 0) DESC, id DESC (see api.PROVIDER_RANK)
+        db.Index('ix_service_providers_type_rank_id', 'service_type', db.func.coalesce(rating, db.literal_column('0')), 'id'),
+        db.Index('ix_service_providers_rank_id', db.func.coalesce(rating, db.literal_column('0')), 'id'),
+    )
+
+    # Parsed from the availability text; see provider_availability.py
+    windows = db.relationship('ProviderAvailability', cascade='all, delete-orphan', lazy=True)
+
     def to_dict(self):
         return {
             'id': str(self.id),
@@ -136,6 +243,22 @@ class ServiceProvider(db.Model):
             'availability': self.availability
         }
 
+class ProviderAvailability(db.Model):
+    __tablename__ = 'provider_availability'
+
+    # Weekly window: weekday 0 = Monday, minutes since local midnight, end exclusive.
+    # Windows that run past midnight are stored as two rows.
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    provider_id = db.Column(UUID(as_uuid=True), ForeignKey('service_providers.id', ondelete='CASCADE'), nullable=False)
+    weekday = db.Column(db.SmallInteger, nullable=False)
+    start_minute = db.Column(db.SmallInteger, nullable=False)
+    end_minute = db.Column(db.SmallInteger, nullable=False)
+
+    __table_args__ = (
+        # "Working now?" probe per provider, answered from the index alone
+        db.Index('ix_provider_availability_lookup', 'provider_id', 'weekday', 'start_minute', 'end_minute'),
+    )
+
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
 
@@ -144,10 +267,18 @@ class AuditLog(db.Model):
     action = db.Column(db.String(50), nullable=False) # 'CREATE_ADMIN', 'CREATE_HELPER', etc.
     target_id = db.Column(UUID(as_uuid=True), nullable=True) # ID of the created/modified entity
     details = db.Column(db.JSON, nullable=True) # Snapshot of data or details
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Part of the primary key because PostgreSQL partitions the table by month on it
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
 
     admin = db.relationship('User', backref='audit_logs')
 
+    __table_args__ = (
+        # Newest first, overall or per admin: ORDER BY timestamp DESC, id DESC
+        db.Index('ix_audit_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_admin_timestamp_id', 'admin_id', 'timestamp', 'id'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+
     def to_dict(self):
         return {
             'id': str(self.id),
@@ -157,3 +288,18 @@ class AuditLog(db.Model):
             'details': self.details,
             'timestamp': self.timestamp.isoformat()
         }
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+
+    # jti of a revoked token, or the family id when a whole device session is revoked
+    jti = db.Column(db.String(36), primary_key=True)
+    token_type = db.Column(db.String(10), nullable=False) # access, refresh, family
+    user_id = db.Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Workers poll for revocations newer than their last sync
+        db.Index('ix_revoked_tokens_revoked_at', 'revoked_at'),
+    )
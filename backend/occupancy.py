@@ -0,0 +1,152 @@
+import uuid
+from collections import Counter
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from models import OccupancyCount, Unit
+
+# Tower id under which the portfolio-wide totals are stored
+ALL_TOWERS = uuid.UUID(int=(1 << 128) - 1)
+
+DEFAULT_STATUS = 'Vacant'
+
+occupancy_cli = AppGroup('occupancy', help='Maintain the occupancy snapshot.')
+
+
+def _upsert(connection, rows):
+    insert = pg_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+    stmt = insert(OccupancyCount.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['tower_id', 'status'],
+        set_={'unit_count': OccupancyCount.__table__.c.unit_count + stmt.excluded.unit_count}
+    )
+    connection.execute(stmt)
+
+
+def apply_deltas(connection, deltas):
+    """Add ``{(tower_id, status): delta}`` to the snapshot, including the totals rows."""
+    combined = Counter()
+    for (tower_id, status), delta in deltas.items():
+        # Callers may pass a tower's id as a string; one tower must be one row of the upsert
+        if not isinstance(tower_id, uuid.UUID):
+            tower_id = uuid.UUID(str(tower_id))
+        combined[(tower_id, status)] += delta
+        combined[(ALL_TOWERS, status)] += delta
+    # Upserted in key order, so concurrent writers lock the rows in the same order
+    rows = [
+        {'tower_id': tower_id, 'status': status, 'unit_count': delta}
+        for (tower_id, status), delta in sorted(combined.items())
+        if delta
+    ]
+    if rows:
+        _upsert(connection, rows)
+
+
+def _history_value(history):
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_unit_status(session, flush_context):
+    # Runs inside the flush, so the snapshot moves in the same transaction as the units
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Unit):
+            deltas[(obj.tower_id, obj.status or DEFAULT_STATUS)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Unit):
+            state = inspect(obj)
+            tower_id = _history_value(state.attrs.tower_id.history)
+            status = _history_value(state.attrs.status.history)
+            deltas[(tower_id, status or DEFAULT_STATUS)] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Unit):
+            continue
+        state = inspect(obj)
+        tower_history = state.attrs.tower_id.history
+        status_history = state.attrs.status.history
+        if not tower_history.has_changes() and not status_history.has_changes():
+            continue
+        old_status = _history_value(status_history) or DEFAULT_STATUS
+        deltas[(_history_value(tower_history), old_status)] -= 1
+        deltas[(obj.tower_id, obj.status or DEFAULT_STATUS)] += 1
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def get_counts(tower_id=ALL_TOWERS):
+    rows = db.session.query(OccupancyCount.status, OccupancyCount.unit_count) \
+        .filter(OccupancyCount.tower_id == tower_id).all()
+    return {status: count for status, count in rows}
+
+
+def summarize(counts):
+    total_units = sum(counts.values())
+    occupied_units = counts.get('Occupied', 0)
+    occupancy_rate = (occupied_units / total_units * 100) if total_units > 0 else 0
+    return {
+        "total_units": total_units,
+        "occupied_units": occupied_units,
+        "available_units": counts.get('Vacant', 0),
+        "occupancy_rate": round(occupancy_rate, 2)
+    }
+
+
+def compute_from_units():
+    rows = db.session.query(Unit.tower_id, Unit.status, func.count(Unit.id)) \
+        .group_by(Unit.tower_id, Unit.status).all()
+    actual = Counter()
+    for tower_id, status, count in rows:
+        actual[(tower_id, status or DEFAULT_STATUS)] += count
+        actual[(ALL_TOWERS, status or DEFAULT_STATUS)] += count
+    return actual
+
+
+def reconcile(dry_run=False):
+    """Rebuild the snapshot from the units table and return the drift that was found."""
+    # Lock the snapshot so concurrent status changes wait for the rebuild
+    query = OccupancyCount.query
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update()
+    stored = Counter({(r.tower_id, r.status): r.unit_count for r in query.all()})
+    actual = compute_from_units()
+
+    drift = {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in set(stored) | set(actual)
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+
+    if not dry_run:
+        OccupancyCount.query.delete()
+        db.session.add_all(
+            OccupancyCount(tower_id=tower_id, status=status, unit_count=count)
+            for (tower_id, status), count in actual.items()
+        )
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return drift
+
+
+@occupancy_cli.command('reconcile')
+@click.option('--dry-run', is_flag=True, help='Report drift without rewriting the snapshot.')
+def reconcile_command(dry_run):
+    """Rebuild occupancy counts from the units table and report any drift."""
+    drift = reconcile(dry_run=dry_run)
+    if not drift:
+        click.echo('Occupancy snapshot is consistent.')
+        return
+    for (tower_id, status), (stored, actual) in sorted(drift.items(), key=lambda i: (str(i[0][0]), i[0][1])):
+        scope = 'all towers' if tower_id == ALL_TOWERS else f'tower {tower_id}'
+        click.echo(f'{scope} / {status}: snapshot {stored}, actual {actual}')
+    click.echo('Dry run, snapshot left unchanged.' if dry_run else f'Rebuilt snapshot ({len(drift)} drifted rows).')
+    if dry_run:
+        raise SystemExit(1)
@@ -0,0 +1,94 @@
+import base64
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidPageRequest(ValueError):
+    """Raised when a cursor, limit or filter argument cannot be parsed."""
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values):
+    # Opaque to clients: url-safe base64 of the sort key of the last row returned
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidPageRequest('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidPageRequest('Invalid cursor')
+    return values
+
+
+def parse_limit(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    raw = request.args.get('limit')
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise InvalidPageRequest('limit must be an integer')
+    if limit < 1:
+        raise InvalidPageRequest('limit must be positive')
+    return min(limit, maximum)
+
+
+def parse_uuid(value, field):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise InvalidPageRequest(f'Invalid {field}')
+
+
+def parse_uuid_list(field):
+    # Accepts both ?field=a&field=b and ?field=a,b
+    values = []
+    for raw in request.args.getlist(field):
+        values.extend(v for v in raw.split(',') if v)
+    return [parse_uuid(v, field) for v in values]
+
+
+def parse_int(field):
+    raw = request.args.get(field)
+    if raw is None or raw == '':
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise InvalidPageRequest(f'{field} must be an integer')
+
+
+def parse_datetime(field):
+    raw = request.args.get(field)
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise InvalidPageRequest(f'{field} must be an ISO 8601 date or datetime')
+
+
+def page(rows, limit, key):
+    """Trim a ``limit + 1`` result set and build the cursor for the next page."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*key(rows[-1])) if has_more and rows else None
+    return rows, next_cursor
@@ -0,0 +1,86 @@
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password checks are already queued or one timed out."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def hash_password(password):
+    return generate_password_hash(
+        password,
+        method=current_app.config['PASSWORD_HASH_METHOD'],
+        salt_length=current_app.config['PASSWORD_SALT_LENGTH']
+    )
+
+
+@lru_cache(maxsize=None)
+def _canonical_method(method):
+    # "scrypt" is stored as "scrypt:32768:8:1"; hash once to learn the spelled-out form
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def needs_rehash(pwhash, method):
+    # Werkzeug hashes are "<method>$<salt>$<hash>"; the method carries the cost parameters
+    return pwhash.split('$', 1)[0] != _canonical_method(method)
+
+
+def _verify(pwhash, password, method, salt_length):
+    """Runs in a pool process: check the password and rehash it if its parameters are outdated."""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if needs_rehash(pwhash, method):
+        return True, generate_password_hash(password, method=method, salt_length=salt_length)
+    return True, None
+
+
+def _get_pool(workers, max_pending):
+    global _pool, _slots
+    # Created lazily so each gunicorn worker gets its own pool after forking
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(max_pending)
+                _pool = ProcessPoolExecutor(max_workers=workers)
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool, _slots
+
+
+def verify_password(pwhash, password):
+    """Check ``password`` against ``pwhash`` off the request thread.
+
+    Returns ``(ok, new_hash)`` where ``new_hash`` is set when the stored hash
+    used outdated parameters and should be replaced. Raises
+    PasswordHasherBusy when the queue is full so callers can shed load.
+    """
+    config = current_app.config
+    args = (pwhash, password, config['PASSWORD_HASH_METHOD'], config['PASSWORD_SALT_LENGTH'])
+
+    workers = config['PASSWORD_HASH_WORKERS']
+    if not workers:
+        return _verify(*args)
+
+    pool, slots = _get_pool(workers, config['PASSWORD_HASH_MAX_PENDING'])
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy('Too many logins in progress')
+    try:
+        future = pool.submit(_verify, *args)
+    except Exception:
+        slots.release()
+        raise
+    # The slot is held until the check really finishes, even if we stop waiting for it
+    future.add_done_callback(lambda f: slots.release())
+    try:
+        return future.result(timeout=config['PASSWORD_HASH_TIMEOUT'])
+    except FutureTimeout:
+        future.cancel()
+        raise PasswordHasherBusy('Password check timed out')
@@ -0,0 +1,181 @@
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import selectinload
+from extensions import db
+from models import ProviderAvailability, ServiceProvider
+
+providers_cli = AppGroup('providers', help='Maintain service provider data.')
+
+DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+DAY_NAMES = {name.lower(): i for i, name in enumerate(DAYS)}
+DAY_NAMES.update({
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'tues': 1, 'wed': 2, 'thur': 3, 'thurs': 3,
+})
+DAY_GROUPS = {
+    'daily': range(7), 'everyday': range(7), 'weekdays': range(5), 'weekends': (5, 6), 'weekend': (5, 6),
+}
+ALL_DAY = 24 * 60
+
+TIME = r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)?'
+RANGE = re.compile(rf'{TIME}\s*(?:-|–|to)\s*{TIME}')
+ALWAYS = re.compile(r'^\s*(24\s*[/x]\s*7|24 hours|anytime|always)\s*$')
+
+
+class InvalidAvailability(ValueError):
+    pass
+
+
+def _minute(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise InvalidAvailability(f'{hour} is not a 12-hour clock time')
+        hour = hour % 12 + (12 if meridiem.startswith('p') else 0)
+    if hour == 24 and minute == 0:
+        return ALL_DAY
+    if hour > 23 or minute > 59:
+        raise InvalidAvailability(f'{hour}:{minute:02d} is not a time of day')
+    return hour * 60 + minute
+
+
+def _days(text):
+    """Weekdays named by text such as 'Mon-Fri', 'Sat, Sun' or 'Weekdays'; all week if none are named."""
+    text = text.strip(' ,:').lower()
+    if not text:
+        return list(range(7))
+    days = []
+    for part in re.split(r'\s*(?:,|&|and)\s*', text):
+        if part in DAY_GROUPS:
+            days.extend(DAY_GROUPS[part])
+            continue
+        bounds = re.split(r'\s*(?:-|–|to)\s*', part)
+        try:
+            first, last = DAY_NAMES[bounds[0]], DAY_NAMES[bounds[-1]]
+        except KeyError:
+            raise InvalidAvailability(f'Unknown day "{part}"')
+        days.extend((first + i) % 7 for i in range((last - first) % 7 + 1))
+    return sorted(set(days))
+
+
+def parse(text):
+    """Weekly windows ``[(weekday, start_minute, end_minute)]`` for text like '9 AM - 6 PM', '24/7'
+    or 'Mon-Fri 9 AM - 6 PM; Sat 10 AM - 2 PM'. Windows past midnight continue on the next day."""
+    if not text or not text.strip():
+        raise InvalidAvailability('Availability is empty')
+    if ALWAYS.match(text.lower()):
+        return [(day, 0, ALL_DAY) for day in range(7)]
+
+    windows = set()
+    for segment in re.split(r'[;\n]', text.lower()):
+        if not segment.strip():
+            continue
+        ranges = list(RANGE.finditer(segment))
+        if not ranges:
+            raise InvalidAvailability(f'No time range in "{segment.strip()}"')
+        days = _days(segment[:ranges[0].start()])
+        for match in ranges:
+            h1, m1, p1, h2, m2, p2 = match.groups()
+            end = _minute(h2, m2, p2 or p1)
+            if p1 or not p2:
+                start = _minute(h1, m1, p1)
+                if not (p1 or p2) and 1 <= int(h2) < 12 and end <= start < min(end + 12 * 60, 13 * 60):
+                    # '9-5' is a working day, not a night: a bare end hour before a
+                    # morning start is in the afternoon ('22-6' still runs overnight)
+                    end += 12 * 60
+            else:
+                # '10 - 11 PM' shares the meridiem, '9 - 6 PM' means 9 AM
+                start = _minute(h1, m1, p2)
+                if start >= end:
+                    start = _minute(h1, m1, 'am')
+            for day in days:
+                if end > start:
+                    windows.add((day, start, end))
+                else:
+                    windows.add((day, start, ALL_DAY))
+                    if end:
+                        windows.add(((day + 1) % 7, 0, end))
+    return sorted(windows)
+
+
+def windows_for(text):
+    return [ProviderAvailability(weekday=d, start_minute=s, end_minute=e) for d, s, e in parse(text)]
+
+
+@event.listens_for(db.session, 'before_flush')
+def sync_windows(session, flush_context, instances):
+    # Keep the structured windows in step with the display text, whoever writes it
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, ServiceProvider):
+            continue
+        if obj in session.new and obj.availability is None:
+            # The column default would only be filled in by the INSERT, after this hook
+            obj.availability = ServiceProvider.__table__.c.availability.default.arg
+        if obj in session.new or inspect(obj).attrs.availability.history.has_changes():
+            try:
+                obj.windows = windows_for(obj.availability)
+            except InvalidAvailability:
+                obj.windows = []
+
+
+def _zone():
+    return ZoneInfo(current_app.config['COMMUNITY_TIMEZONE'])
+
+
+def local_now():
+    return datetime.now(_zone()).replace(tzinfo=None)
+
+
+def to_local(moment):
+    """Naive community wall-clock time; naive input is taken to be local already."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(_zone()).replace(tzinfo=None)
+    return moment
+
+
+def available_at(query, moment):
+    """Restrict a ServiceProvider query to providers working at ``moment`` (local wall-clock time)."""
+    minute = moment.hour * 60 + moment.minute
+    return query.filter(db.select(ProviderAvailability.provider_id).where(
+        ProviderAvailability.provider_id == ServiceProvider.id,
+        ProviderAvailability.weekday == moment.weekday(),
+        ProviderAvailability.start_minute <= minute,
+        ProviderAvailability.end_minute > minute
+    ).exists())
+
+
+def describe(windows):
+    return [{
+        'day': DAYS[w.weekday],
+        'start': f'{w.start_minute // 60:02d}:{w.start_minute % 60:02d}',
+        'end': f'{w.end_minute // 60:02d}:{w.end_minute % 60:02d}'
+    } for w in sorted(windows, key=lambda w: (w.weekday, w.start_minute))]
+
+
+@providers_cli.command('backfill-availability')
+@click.option('--dry-run', is_flag=True, help='Report what would change without writing.')
+def backfill_availability(dry_run):
+    """Parse every provider's availability text into weekly windows."""
+    providers = ServiceProvider.query.options(selectinload(ServiceProvider.windows)).all()
+    updated, unparsed = 0, []
+    for provider in providers:
+        try:
+            windows = parse(provider.availability)
+        except InvalidAvailability as e:
+            unparsed.append(f'{provider.name} ({provider.id}): "{provider.availability}" - {e}')
+            windows = []
+        current = sorted((w.weekday, w.start_minute, w.end_minute) for w in provider.windows)
+        if current != windows:
+            updated += 1
+            if not dry_run:
+                provider.windows = windows_for(provider.availability) if windows else []
+    if not dry_run:
+        db.session.commit()
+    click.echo(f'{updated} of {len(providers)} provider(s) {"would be " if dry_run else ""}updated.')
+    for line in unparsed:
+        click.echo(f'Could not parse {line}', err=True)
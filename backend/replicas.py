@@ -0,0 +1,180 @@
+"""Read-replica routing for db.session.
+
+With DATABASE_REPLICA_URLS set, SELECTs issued while handling a GET or HEAD
+request go to one replica, chosen round-robin per request. Everything else
+stays on the primary: other methods, CLI commands and background threads,
+views marked with ``@use_primary``, and every statement of a request after
+its first write (a flush, a DML statement, ``SELECT ... FOR UPDATE`` or a raw
+``session.connection()``), so a request always reads its own writes.
+
+Each worker checks a replica before routing to it and again every
+REPLICA_CHECK_INTERVAL seconds, giving up on a PostgreSQL connection after
+REPLICA_CONNECT_TIMEOUT seconds. A replica that cannot be reached, or (on
+PostgreSQL) lags by more than REPLICA_MAX_LAG seconds, is skipped for
+REPLICA_RETRY_AFTER seconds; with no healthy replica reads fall back to the
+primary.
+"""
+import itertools
+import logging
+import threading
+import time
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc, text
+
+replicas_cli = AppGroup('replicas', help='Inspect the read replicas.')
+logger = logging.getLogger(__name__)
+
+BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+# Seconds since the last replayed transaction, or 0 when the replica has replayed everything it received
+PG_LAG = text(
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+def use_primary(view):
+    """Keep a read-only view on the primary (it writes, or must see writes made just before it)."""
+    view.use_primary = True
+    return view
+
+
+def binds(config, engine_options):
+    """SQLALCHEMY_BINDS entries for the replicas; ``engine_options(uri)`` gives each one's pool options."""
+    entries = {}
+    for i, uri in enumerate(config['DATABASE_REPLICA_URLS']):
+        options = engine_options(uri)
+        if uri.startswith('postgresql'):
+            # Health checks connect in the request path, so an unreachable replica
+            # must fail fast rather than wait out the OS's TCP timeout
+            options['connect_args'] = {
+                **options.get('connect_args', {}), 'connect_timeout': config['REPLICA_CONNECT_TIMEOUT']
+            }
+        entries[f'{BIND_PREFIX}{i}'] = {'url': uri, **options}
+    return entries
+
+
+class ReplicaSet:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        # bind key -> (healthy, lag seconds, monotonic time to check again)
+        self._health = {}
+        self.max_lag = self.check_interval = self.retry_after = 0
+
+    def init_app(self, app):
+        self.max_lag = app.config['REPLICA_MAX_LAG']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.retry_after = app.config['REPLICA_RETRY_AFTER']
+
+    def keys(self, engines):
+        return sorted(k for k in engines if k and k.startswith(BIND_PREFIX))
+
+    def pick(self, engines):
+        """Bind key of the next healthy replica, or None."""
+        keys = self.keys(engines)
+        if not keys:
+            return None
+        start = next(self._turn)
+        for i in range(len(keys)):
+            key = keys[(start + i) % len(keys)]
+            if self.healthy(key, engines[key]):
+                return key
+        return None
+
+    def healthy(self, key, engine):
+        with self._lock:
+            state = self._health.get(key)
+        if state and time.monotonic() < state[2]:
+            return state[0]
+        healthy, lag = self.check(engine)
+        self._record(key, healthy, lag)
+        return healthy
+
+    def check(self, engine):
+        """``(healthy, lag seconds)`` for one replica."""
+        try:
+            with engine.connect() as conn:
+                lag = conn.execute(PG_LAG).scalar() if engine.dialect.name == 'postgresql' else 0
+        except Exception as e:
+            logger.warning('Replica %s is unavailable: %s', engine.url.render_as_string(), e)
+            return False, None
+        lag = float(lag or 0)
+        return lag <= self.max_lag, lag
+
+    def _record(self, key, healthy, lag):
+        wait = self.check_interval if healthy else self.retry_after
+        with self._lock:
+            self._health[key] = (healthy, lag, time.monotonic() + wait)
+
+    def mark_down(self, key):
+        # Checked again after REPLICA_RETRY_AFTER
+        self._record(key, False, None)
+
+
+replica_set = ReplicaSet()
+
+
+def _primary_only(session, clause):
+    """Whether this statement, and the rest of the request, must use the primary."""
+    if session.info.get('primary'):
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    if request.method not in READ_METHODS or getattr(view, 'use_primary', False) \
+            or session._flushing or clause is None or not getattr(clause, 'is_select', False) \
+            or getattr(clause, '_for_update_arg', None) is not None:
+        session.info['primary'] = True
+        return True
+    return False
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends a read-only request's SELECTs to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and not _primary_only(self, clause):
+            engines = self._db.engines
+            key = self.info.get('replica')
+            if key is None:
+                key = replica_set.pick(engines)
+                if key is None:
+                    self.info['primary'] = True
+                else:
+                    self.info['replica'] = key
+            if key is not None:
+                return engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_app(app, db):
+    replica_set.init_app(app)
+    with app.app_context():
+        for key in replica_set.keys(db.engines):
+            event.listen(db.engines[key], 'handle_error', _on_error(key))
+
+
+def _on_error(key):
+    def handle_error(context):
+        # Lost connections and refused logins take the replica out of rotation
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, exc.OperationalError):
+            replica_set.mark_down(key)
+    return handle_error
+
+
+@replicas_cli.command('status')
+def status_command():
+    """Check each replica and show whether reads would be routed to it."""
+    engines = current_app.extensions['sqlalchemy'].engines
+    keys = replica_set.keys(engines)
+    if not keys:
+        click.echo('No replicas configured (DATABASE_REPLICA_URLS).')
+        return
+    for key in keys:
+        engine = engines[key]
+        healthy, lag = replica_set.check(engine)
+        state = 'healthy' if healthy else 'unavailable' if lag is None else 'lagging'
+        lag_text = '' if lag is None else f', lag {lag:.1f}s'
+        click.echo(f'{key}: {engine.url.render_as_string()} {state}{lag_text}')
@@ -0,0 +1,149 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app, jsonify
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from extensions import db, jwt
+from models import RevokedToken
+
+tokens_cli = AppGroup('tokens', help='Manage revoked tokens.')
+
+# Revocations written by other workers are picked up within one sync interval;
+# allow for clock skew between workers when asking for "newer than" rows.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; may report false positives, never false negatives."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class Denylist:
+    """Per-process cache of revoked token ids.
+
+    Lookups hit the Bloom filter only; the database is consulted when the
+    filter reports a (possible) match, and polled for new revocations at most
+    once per sync interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._synced_at = None
+        self._next_sync = 0
+
+    @staticmethod
+    def _read(statement):
+        # Always on the primary: a replica lagging past SYNC_OVERLAP would hide
+        # revocations that the next sync no longer asks for
+        return db.session.execute(statement, bind_arguments={'bind': db.engine}).all()
+
+    def _rebuild(self):
+        now = datetime.utcnow()
+        rows = self._read(db.select(RevokedToken.jti).where(RevokedToken.expires_at > now))
+        bloom = BloomFilter(max(len(rows) * 2, current_app.config['REVOCATION_BLOOM_CAPACITY']))
+        for (jti,) in rows:
+            bloom.add(jti)
+        self._bloom, self._synced_at = bloom, now
+
+    def _sync(self):
+        now = datetime.utcnow()
+        rows = self._read(
+            db.select(RevokedToken.jti).where(RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP)
+        )
+        for (jti,) in rows:
+            self._bloom.add(jti)
+        self._synced_at = now
+
+    def _refresh(self):
+        if time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            if self._bloom is None:
+                self._rebuild()
+            else:
+                self._sync()
+            self._next_sync = time.monotonic() + current_app.config['REVOCATION_SYNC_INTERVAL']
+
+    def add(self, jti):
+        if self._bloom is not None:
+            self._bloom.add(jti)
+
+    def is_revoked(self, *keys):
+        self._refresh()
+        candidates = [k for k in keys if k and k in self._bloom]
+        if not candidates:
+            return False
+        # Possible match (or false positive): confirm against the table
+        return bool(self._read(db.select(RevokedToken.jti).where(RevokedToken.jti.in_(candidates)).limit(1)))
+
+
+denylist = Denylist()
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return denylist.is_revoked(jwt_payload['jti'], jwt_payload.get('fam'))
+
+
+@jwt.revoked_token_loader
+def revoked_token_response(jwt_header, jwt_payload):
+    if jwt_payload['type'] == 'refresh' and jwt_payload.get('fam'):
+        # A spent refresh token was replayed, so it may have leaked: end the whole device session
+        revoke(jwt_payload, family=True)
+        db.session.commit()
+    return jsonify(msg='Token has been revoked'), 401
+
+
+def _expiry(jwt_payload):
+    return datetime.fromtimestamp(jwt_payload['exp'], tz=timezone.utc).replace(tzinfo=None)
+
+
+def revoke(jwt_payload, family=False):
+    """Record a token (or its whole family) as revoked. Returns False if it already was."""
+    jti = jwt_payload['fam'] if family else jwt_payload['jti']
+    try:
+        with db.session.begin_nested():
+            db.session.add(RevokedToken(
+                jti=jti,
+                token_type='family' if family else jwt_payload['type'],
+                user_id=uuid.UUID(jwt_payload['sub']),
+                expires_at=_expiry(jwt_payload)
+            ))
+    except IntegrityError:
+        return False
+    denylist.add(jti)
+    return True
+
+
+@tokens_cli.command('prune')
+def prune_command():
+    """Delete revocation records for tokens that have expired anyway."""
+    deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+    db.session.commit()
+    click.echo(f'Pruned {deleted} expired revocation(s).')
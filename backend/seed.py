@@ -1,201 +1,385 @@
-from app import create_app
-from extensions import db
-from models import User, Tower, Unit, Amenity, ServiceProvider, Lease, Booking
-from werkzeug.security import generate_password_hash
-import uuid
+import csv
+import io
+import json
 import random
-from datetime import date, timedelta, datetime
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from models import User, Tower, Unit, Amenity, UnitAmenity, ServiceProvider, Lease, Booking, Payment
+from passwords import hash_password
+import catalog_cache
+import lease_balances
+import occupancy
+import unit_search
 
-app = create_app()
+INSERT_CHUNK = 5000
 
-def seed_data():
-    with app.app_context():
-        db.create_all()
-        
-        print("Seeding database...")
+DEMO_USERS = [
+    {"email": "admin@example.com", "password": "admin123", "role": "Admin", "is_super_admin": True,
+     "first_name": "Super", "last_name": "Admin", "phone": "1234567890"},
+    {"email": "regular_admin@example.com", "password": "regadmin123", "role": "Admin", "is_super_admin": False,
+     "first_name": "Regular", "last_name": "Admin", "phone": "1122334455"},
+    {"email": "resident@example.com", "password": "resident123", "role": "Resident", "is_super_admin": False,
+     "first_name": "John", "last_name": "Doe", "phone": "0987654321"},
+]
 
-        # 1. Users
-        admin = User.query.filter_by(email="admin@example.com").first()
-        if not admin:
-            print("Creating Admin user...")
-            admin = User(
-                email="admin@example.com",
-                password_hash=generate_password_hash("admin123"),
-                role="Admin",
-                is_super_admin=True,
-                first_name="Super",
-                last_name="Admin",
-                phone="1234567890"
-            )
-            db.session.add(admin)
-        else:
-            print("Updating Admin user privileges...")
-            admin.is_super_admin = True
-            db.session.add(admin)
-        
-        # Regular Admin
-        regular_admin = User.query.filter_by(email="regular_admin@example.com").first()
-        if not regular_admin:
-            print("Creating Regular Admin user...")
-            regular_admin = User(
-                email="regular_admin@example.com",
-                password_hash=generate_password_hash("regadmin123"),
-                role="Admin",
-                is_super_admin=False,
-                first_name="Regular",
-                last_name="Admin",
-                phone="1122334455"
-            )
-            db.session.add(regular_admin)
-        else:
-            print("Regular Admin already exists, ensuring role...")
-            regular_admin.role = "Admin"
-            regular_admin.is_super_admin = False
-            db.session.add(regular_admin)
-        
-        resident = User.query.filter_by(email="resident@example.com").first()
-        if not resident:
-            print("Creating Resident user...")
-            resident = User(
-                email="resident@example.com",
-                password_hash=generate_password_hash("resident123"),
-                role="Resident",
-                first_name="John",
-                last_name="Doe",
-                phone="0987654321"
+DEMO_TOWERS = [
+    {"name": "Tower A", "location": "North Wing", "prefix": "A"},
+    {"name": "Tower B", "location": "South Wing", "prefix": "B"},
+]
+
+AMENITIES = [
+    {"name": "Balcony", "category": "UnitFeature", "description": "Private balcony with city view"},
+    {"name": "Central AC", "category": "UnitFeature", "description": "Climate control for all seasons"},
+    {"name": "Modern Kitchen", "category": "UnitFeature", "description": "Equipped with latest appliances"},
+    {"name": "High-speed Internet", "category": "UnitFeature", "description": "Fiber optic connection available"},
+    {"name": "Gym Access", "category": "CommonArea", "description": "24/7 access to fitness center", "is_bookable": True},
+    {"name": "Swimming Pool", "category": "CommonArea", "description": "Outdoor pool with lounge area", "is_bookable": True}
+]
+
+SAMPLE_PHOTOS = [
+    "https://placehold.co/600x400?text=Living+Room",
+    "https://placehold.co/600x400?text=Bedroom",
+    "https://placehold.co/600x400?text=Kitchen"
+]
+SAMPLE_NEARBY = [
+    "Central Park (0.5 miles)",
+    "City Mall (1.2 miles)",
+    "General Hospital (2.0 miles)",
+    "Subway Station (0.3 miles)"
+]
+
+PROVIDERS = [
+    {"name": "Sunita Devi", "service_type": "Maid", "phone_number": "9876543210", "rating": 4.8, "is_verified": True, "availability": "8 AM - 5 PM"},
+    {"name": "Ramesh Kumar", "service_type": "Driver", "phone_number": "9876543211", "rating": 4.5, "is_verified": True, "availability": "24/7"},
+    {"name": "Rajesh Gupta", "service_type": "Plumber", "phone_number": "9876543212", "rating": 4.2, "is_verified": True, "availability": "9 AM - 6 PM"},
+    {"name": "Lakshmi", "service_type": "Cook", "phone_number": "9876543213", "rating": 4.9, "is_verified": True, "availability": "7 AM - 9 PM"},
+    {"name": "Suresh", "service_type": "Electrician", "phone_number": "9876543214", "rating": 4.6, "is_verified": True, "availability": "10 AM - 7 PM"}
+]
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Kavya", "Nikhil", "Sneha",
+               "James", "Maria", "David", "Sarah", "Omar", "Li", "Fatima", "Carlos", "Yuki", "Elena"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Khan", "Gupta", "Nair", "Singh", "Das", "Mehta",
+              "Smith", "Garcia", "Chen", "Kim", "Müller", "Rossi", "Silva", "Tanaka", "Okafor", "Novak"]
+
+
+def _dialect_insert(table):
+    dialect = db.session.get_bind().dialect.name
+    return (pg_insert if dialect == 'postgresql' else sqlite_insert)(table)
+
+
+def _csv_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, db.JSON):
+        return json.dumps(value)
+    return value
+
+
+def bulk_insert(model, rows):
+    """Write rows in the current transaction: COPY on PostgreSQL, batched INSERTs elsewhere."""
+    if not rows:
+        return
+    table = model.__table__
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        columns = [table.c[name] for name in rows[0]]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_csv_value(c, row[c.name]) for c in columns])
+        buffer.seek(0)
+        # Same DBAPI connection, so the COPY is part of the surrounding transaction
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f'COPY {table.name} ({", ".join(c.name for c in columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+    else:
+        for start in range(0, len(rows), INSERT_CHUNK):
+            connection.execute(insert(table), rows[start:start + INSERT_CHUNK])
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    days_in_month = [31, 29 if leap else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1]
+    return date(year, month, min(day.day, days_in_month))
+
+
+def seed_demo():
+    """Fixed demo accounts and catalog. Safe to run repeatedly."""
+    # 1. Users: upsert on email so reruns restore the demo roles
+    stmt = _dialect_insert(User.__table__).values([
+        {
+            'id': uuid.uuid4(),
+            'email': u['email'],
+            'password_hash': hash_password(u['password']),
+            'role': u['role'],
+            'is_super_admin': u['is_super_admin'],
+            'first_name': u['first_name'],
+            'last_name': u['last_name'],
+            'phone': u['phone'],
+            'created_at': datetime.utcnow()
+        } for u in DEMO_USERS
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['email'],
+        set_={'role': stmt.excluded.role, 'is_super_admin': stmt.excluded.is_super_admin}
+    ))
+    print(f"Upserted {len(DEMO_USERS)} demo users")
+
+    # 2. Towers and 3. Amenities: insert whatever is missing by unique name
+    db.session.execute(_dialect_insert(Tower.__table__).values([
+        {'id': uuid.uuid4(), 'name': t['name'], 'location': t['location']} for t in DEMO_TOWERS
+    ]).on_conflict_do_nothing(index_elements=['name']))
+    db.session.execute(_dialect_insert(Amenity.__table__).values([
+        {'id': uuid.uuid4(), 'is_bookable': False, **a} for a in AMENITIES
+    ]).on_conflict_do_nothing(index_elements=['name']))
+    catalog_cache.mark_changed('towers', 'amenities')
+
+    towers = {t.name: t for t in Tower.query.filter(Tower.name.in_([t['name'] for t in DEMO_TOWERS]))}
+    unit_features = Amenity.query.filter_by(category='UnitFeature').all()
+
+    # 4. Units: five per demo tower, skipping unit numbers that already exist
+    existing = {number for (number,) in db.session.query(Unit.unit_number)
+                .filter(Unit.tower_id.in_([t.id for t in towers.values()]))}
+    for spec in DEMO_TOWERS:
+        tower = towers[spec['name']]
+        for i in range(1, 6):
+            u_num = f"{spec['prefix']}-10{i}"
+            if u_num in existing:
+                continue
+            print(f"Creating Unit: {u_num}")
+            unit = Unit(
+                tower_id=tower.id,
+                unit_number=u_num,
+                floor=1,
+                status="Vacant",
+                photos=SAMPLE_PHOTOS,
+                nearby_places=SAMPLE_NEARBY
             )
-            db.session.add(resident)
-        
-        db.session.flush()
-
-        # 2. Towers
-        tower_a = Tower.query.filter_by(name="Tower A").first()
-        if not tower_a:
-            print("Creating Tower A...")
-            tower_a = Tower(name="Tower A", location="North Wing")
-            db.session.add(tower_a)
-            
-        tower_b = Tower.query.filter_by(name="Tower B").first()
-        if not tower_b:
-            print("Creating Tower B...")
-            tower_b = Tower(name="Tower B", location="South Wing")
-            db.session.add(tower_b)
-            
-        db.session.flush()
-
-        # 3. Amenities
-        amenities_data = [
-            {"name": "Balcony", "category": "UnitFeature", "description": "Private balcony with city view"},
-            {"name": "Central AC", "category": "UnitFeature", "description": "Climate control for all seasons"},
-            {"name": "Modern Kitchen", "category": "UnitFeature", "description": "Equipped with latest appliances"},
-            {"name": "High-speed Internet", "category": "UnitFeature", "description": "Fiber optic connection available"},
-            {"name": "Gym Access", "category": "CommonArea", "description": "24/7 access to fitness center"},
-            {"name": "Swimming Pool", "category": "CommonArea", "description": "Outdoor pool with lounge area"}
-        ]
-        
-        created_amenities = []
-        for a_data in amenities_data:
-            amenity = Amenity.query.filter_by(name=a_data["name"]).first()
-            if not amenity:
-                print(f"Creating Amenity: {a_data['name']}")
-                amenity = Amenity(**a_data)
-                db.session.add(amenity)
-            created_amenities.append(amenity)
-        
-        db.session.flush()
-        
-        unit_features = [a for a in created_amenities if a.category == "UnitFeature"]
-
-        # 4. Units
-        sample_photos = [
-            "https://placehold.co/600x400?text=Living+Room",
-            "https://placehold.co/600x400?text=Bedroom", 
-            "https://placehold.co/600x400?text=Kitchen"
-        ]
-        sample_nearby = [
-            "Central Park (0.5 miles)",
-            "City Mall (1.2 miles)",
-            "General Hospital (2.0 miles)",
-            "Subway Station (0.3 miles)"
-        ]
-
-        # Helper to create units if they don't exist
-        def create_units_for_tower(tower, prefix):
-            for i in range(1, 6):
-                u_num = f"{prefix}-10{i}"
-                unit = Unit.query.filter_by(unit_number=u_num).first()
-                if not unit:
-                    print(f"Creating Unit: {u_num}")
-                    unit = Unit(
-                        tower_id=tower.id, 
-                        unit_number=u_num, 
-                        floor=1, 
-                        status="Vacant",
-                        photos=sample_photos,
-                        nearby_places=sample_nearby
-                    )
-                    # Assign random amenities
-                    if unit_features:
-                         unit.amenities.extend(random.sample(unit_features, k=random.randint(1, len(unit_features))))
-                    db.session.add(unit)
-        
-        if tower_a: create_units_for_tower(tower_a, "A")
-        if tower_b: create_units_for_tower(tower_b, "B")
-        
-        db.session.flush()
-
-        # 5. Lease for Resident
-        # Assign resident to first unit in Tower A
-        if resident:
-            # Check if resident already has a lease
-            existing_lease = Lease.query.filter_by(resident_id=resident.id, status='Active').first()
-            if not existing_lease:
-                # Find a vacant unit
-                target_unit = Unit.query.filter_by(status='Vacant').first()
-                if target_unit:
-                    print(f"Creating Lease for {resident.email} in Unit {target_unit.unit_number}")
-                    lease = Lease(
-                        unit_id=target_unit.id,
-                        resident_id=resident.id,
-                        start_date=date.today(),
-                        end_date=date.today() + timedelta(days=365),
-                        rent_amount=1500.00,
-                        status='Active'
-                    )
-                    target_unit.status = 'Occupied'
-                    db.session.add(lease)
-                    db.session.add(target_unit) # Update status
-
-                    # Create corresponding Approved Booking
-                    print(f"Creating Approved Booking for {resident.email} in Unit {target_unit.unit_number}")
-                    booking = Booking(
-                        user_id=resident.id,
-                        unit_id=target_unit.id,
-                        start_time=datetime.utcnow(),
-                        end_time=datetime.utcnow() + timedelta(days=365),
-                        status='Approved'
-                    )
-                    db.session.add(booking)
-
-        db.session.flush()
-
-        # 6. Community Connect (Service Providers)
-        providers_data = [
-            {"name": "Sunita Devi", "service_type": "Maid", "phone_number": "9876543210", "rating": 4.8, "is_verified": True, "availability": "8 AM - 5 PM"},
-            {"name": "Ramesh Kumar", "service_type": "Driver", "phone_number": "9876543211", "rating": 4.5, "is_verified": True, "availability": "24/7"},
-            {"name": "Rajesh Gupta", "service_type": "Plumber", "phone_number": "9876543212", "rating": 4.2, "is_verified": True, "availability": "9 AM - 6 PM"},
-            {"name": "Lakshmi", "service_type": "Cook", "phone_number": "9876543213", "rating": 4.9, "is_verified": True, "availability": "7 AM - 9 PM"},
-            {"name": "Suresh", "service_type": "Electrician", "phone_number": "9876543214", "rating": 4.6, "is_verified": True, "availability": "10 AM - 7 PM"}
-        ]
-        
-        for p_data in providers_data:
-            exists = ServiceProvider.query.filter_by(phone_number=p_data['phone_number']).first()
-            if not exists:
-                print(f"Adding Service Provider: {p_data['name']}")
-                provider = ServiceProvider(**p_data)
-                db.session.add(provider)
-        
+            # Assign random amenities
+            if unit_features:
+                unit.amenities.extend(random.sample(unit_features, k=random.randint(1, len(unit_features))))
+            db.session.add(unit)
+    db.session.flush()
+
+    # 5. Lease for Resident
+    resident = User.query.filter_by(email="resident@example.com").first()
+    existing_lease = Lease.query.filter_by(resident_id=resident.id, status='Active').first()
+    if not existing_lease:
+        # Find a vacant unit
+        target_unit = Unit.query.filter_by(status='Vacant').order_by(Unit.unit_number).first()
+        if target_unit:
+            print(f"Creating Lease for {resident.email} in Unit {target_unit.unit_number}")
+            db.session.add(Lease(
+                unit_id=target_unit.id,
+                resident_id=resident.id,
+                start_date=date.today(),
+                end_date=date.today() + timedelta(days=365),
+                rent_amount=1500.00,
+                status='Active'
+            ))
+            target_unit.status = 'Occupied'
+
+            # Create corresponding Approved Booking
+            db.session.add(Booking(
+                user_id=resident.id,
+                unit_id=target_unit.id,
+                start_time=datetime.utcnow(),
+                end_time=datetime.utcnow() + timedelta(days=365),
+                status='Approved'
+            ))
+
+    # 6. Community Connect (Service Providers)
+    phones = {p for (p,) in db.session.query(ServiceProvider.phone_number)
+              .filter(ServiceProvider.phone_number.in_([p['phone_number'] for p in PROVIDERS]))}
+    for p_data in PROVIDERS:
+        if p_data['phone_number'] not in phones:
+            print(f"Adding Service Provider: {p_data['name']}")
+            db.session.add(ServiceProvider(**p_data))
+
+    db.session.commit()
+
+
+class SyntheticPortfolio:
+    """Deterministic generator for capacity-testing data; the same seed yields the same rows."""
+
+    def __init__(self, seed, units_per_tower, payments_per_lease, occupancy_rate, pending_per_tower):
+        self.rng = random.Random(seed)
+        self.units_per_tower = units_per_tower
+        self.payments_per_lease = payments_per_lease
+        self.occupancy_rate = occupancy_rate
+        self.pending_per_tower = pending_per_tower
+        self.today = date.today()
+        # Fixed anchor so timestamps do not depend on the moment of the run
+        self.now = datetime.combine(self.today, datetime.min.time())
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def tower(self, index, unit_features, password_hash):
+        rng = self.rng
+        tower_id = self.uuid()
+        rows = {model: [] for model in (Tower, User, Unit, UnitAmenity, Lease, Booking, Payment)}
+        rows[Tower].append({'id': tower_id, 'name': f"Tower S{index:03d}", 'location': f"Block {index:03d}"})
+
+        vacant = []
+        for n in range(self.units_per_tower):
+            # Ten flats per floor
+            floor = n // 10 + 1
+            unit_id = self.uuid()
+            occupied = rng.random() < self.occupancy_rate
+            rows[Unit].append({
+                'id': unit_id,
+                'tower_id': tower_id,
+                'unit_number': f"S{index:03d}-{floor:02d}{n % 10 + 1:02d}",
+                'floor': floor,
+                'status': 'Occupied' if occupied else 'Vacant',
+                'photos': SAMPLE_PHOTOS,
+                'nearby_places': rng.sample(SAMPLE_NEARBY, k=rng.randint(1, len(SAMPLE_NEARBY)))
+            })
+            for amenity_id in rng.sample(unit_features, k=rng.randint(1, len(unit_features))):
+                rows[UnitAmenity].append({'unit_id': unit_id, 'amenity_id': amenity_id})
+
+            if not occupied:
+                vacant.append(unit_id)
+                continue
+
+            resident_id = self.uuid()
+            rows[User].append(self._resident(resident_id, f"{index:03d}.{n:04d}", password_hash))
+            rent = rng.choice([900, 1000, 1200, 1500, 1800, 2200, 2500])
+            # Leases started long enough ago to carry exactly the requested rent history
+            months = self.payments_per_lease
+            start = add_months(self.today, -months) - timedelta(days=rng.randint(0, 27))
+            lease_id = self.uuid()
+            rows[Lease].append({
+                'id': lease_id,
+                'unit_id': unit_id,
+                'resident_id': resident_id,
+                'start_date': start,
+                'end_date': add_months(start, max(12, months + rng.choice([1, 3, 6, 12]))),
+                'rent_amount': rent,
+                'status': 'Active'
+            })
+            requested = datetime.combine(start, datetime.min.time()) - timedelta(days=rng.randint(3, 30))
+            rows[Booking].append({
+                'id': self.uuid(), 'user_id': resident_id, 'amenity_id': None, 'unit_id': unit_id,
+                'start_time': requested, 'end_time': requested + timedelta(days=365), 'status': 'Approved'
+            })
+            for m in range(months):
+                paid = datetime.combine(add_months(start, m), datetime.min.time()) + timedelta(
+                    days=rng.randint(0, 9), minutes=rng.randint(0, 24 * 60 - 1))
+                late = rng.random() < 0.03
+                rows[Payment].append({
+                    'id': self.uuid(),
+                    'lease_id': lease_id,
+                    'amount': rent,
+                    'payment_date': paid,
+                    'payment_type': 'Rent',
+                    'status': 'Failed' if late else 'Completed'
+                })
+
+        # A few applicants waiting on vacant flats
+        for unit_id in rng.sample(vacant, k=min(len(vacant), self.pending_per_tower)):
+            applicant = self.uuid()
+            rows[User].append(self._resident(applicant, f"{index:03d}.a{len(rows[Booking]):04d}", password_hash))
+            requested = self.now - timedelta(hours=rng.randint(1, 240))
+            rows[Booking].append({
+                'id': self.uuid(), 'user_id': applicant, 'amenity_id': None, 'unit_id': unit_id,
+                'start_time': requested, 'end_time': requested + timedelta(days=365), 'status': 'Pending'
+            })
+        return rows
+
+    def _resident(self, user_id, suffix, password_hash):
+        rng = self.rng
+        return {
+            'id': user_id,
+            'email': f"resident.{suffix}@example.com",
+            'password_hash': password_hash,
+            'role': 'Resident',
+            'is_super_admin': False,
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'phone': f"9{rng.randint(0, 999999999):09d}",
+            'created_at': self.now
+        }
+
+
+def seed_synthetic(towers, units_per_tower, payments_per_lease, occupancy_rate=0.85,
+                   pending_per_tower=5, seed=42, password='password123'):
+    names = [f"Tower S{i:03d}" for i in range(1, towers + 1)]
+    if Tower.query.filter(Tower.name.in_(names)).first():
+        raise click.ClickException('Synthetic towers already exist; seed into a fresh database.')
+
+    unit_features = [a.id for a in Amenity.query.filter_by(category='UnitFeature').order_by(Amenity.name)]
+    if not unit_features:
+        raise click.ClickException('No unit amenities found; run the demo seed first.')
+
+    generator = SyntheticPortfolio(seed, units_per_tower, payments_per_lease, occupancy_rate, pending_per_tower)
+    # Every synthetic resident shares one hash; hashing per user would dominate the run
+    password_hash = hash_password(password)
+    totals = Counter()
+    for index in range(1, towers + 1):
+        started = time.perf_counter()
+        rows = generator.tower(index, unit_features, password_hash)
+        # Parents before children to satisfy foreign keys
+        for model in (Tower, User, Unit, UnitAmenity, Lease, Booking, Payment):
+            bulk_insert(model, rows[model])
+            totals[model.__tablename__] += len(rows[model])
+        occupancy.apply_deltas(db.session.connection(), Counter(
+            (u['tower_id'], u['status']) for u in rows[Unit]
+        ))
+        catalog_cache.mark_changed('towers')
+        unit_search.record_changes(db.session.connection(), [None])
+        lease_balances.accrue(db.session.connection(), [l['id'] for l in rows[Lease]])
+        paid = Counter()
+        for p in rows[Payment]:
+            if p['payment_type'] == lease_balances.RENT_TYPE and p['status'] == lease_balances.PAID_STATUS:
+                paid[(p['lease_id'], lease_balances.month_start(p['payment_date']))] += p['amount']
+        lease_balances.apply_payments(db.session.connection(), paid)
         db.session.commit()
+        print(f"Tower S{index:03d}: {len(rows[Unit])} units, {len(rows[Lease])} leases, "
+              f"{len(rows[Payment])} payments in {time.perf_counter() - started:.2f}s")
+    return totals
+
+
+@click.command('seed')
+@with_appcontext
+@click.option('--towers', default=0, show_default=True, help='Synthetic towers to generate on top of the demo data.')
+@click.option('--units-per-tower', default=400, show_default=True)
+@click.option('--payments-per-lease', default=36, show_default=True, help='Months of rent payments per lease.')
+@click.option('--occupancy', 'occupancy_rate', default=0.85, show_default=True, help='Share of units that are leased.')
+@click.option('--pending-per-tower', default=5, show_default=True, help='Pending unit bookings per tower.')
+@click.option('--seed', default=42, show_default=True, help='Random seed; equal seeds produce equal datasets.')
+def seed_command(towers, units_per_tower, payments_per_lease, occupancy_rate, pending_per_tower, seed):
+    """Seed the demo accounts and optionally a large synthetic portfolio."""
+    started = time.perf_counter()
+    db.create_all()
+    print("Seeding database...")
+    seed_demo()
+    if towers:
+        totals = seed_synthetic(towers, units_per_tower, payments_per_lease, occupancy_rate, pending_per_tower, seed)
+        print(", ".join(f"{count} {table}" for table, count in totals.items()))
+    print(f"Seeding complete in {time.perf_counter() - started:.1f}s!")
+
+
+def seed_data():
+    from app import create_app
+    with create_app().app_context():
+        db.create_all()
+        print("Seeding database...")
+        seed_demo()
         print("Seeding complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""The app under test runs against TEST_DATABASE_URL (default: a throwaway SQLite
+file), seeded once per session with the demo accounts and two synthetic towers."""
+import os
+import tempfile
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix='rental-tests-')
+# Set before the app is imported: config.py reads the environment once
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or f'sqlite:///{_scratch}/test.sqlite'
+os.environ['DATABASE_REPLICA_URLS'] = ''
+os.environ['AUDIT_SPOOL_DIR'] = os.path.join(_scratch, 'audit-spool')
+# Every request reaches the database, and counts never include a periodic denylist sync
+os.environ['CATALOG_CACHE_ENABLED'] = 'false'
+os.environ['REVOCATION_SYNC_INTERVAL'] = '3600'
+# Audit entries reach the table when a test flushes them, not on the writer thread's timer
+os.environ['AUDIT_FLUSH_INTERVAL'] = '3600'
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from indexes import _token_for  # noqa: E402
+from models import Tower  # noqa: E402
+import seed  # noqa: E402
+
+POSTGRES = os.environ['DATABASE_URL'].startswith('postgresql')
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        seed.seed_demo()
+        if not Tower.query.filter_by(name='Tower S001').first():
+            seed.seed_synthetic(2, 50, 6)
+    if POSTGRES:
+        result = app.test_cli_runner().invoke(args=['indexes', 'create'])
+        assert result.exit_code == 0, result.output
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def tokens(app):
+    """Access tokens for an admin and for a resident with an active lease."""
+    with app.app_context():
+        return {role: _token_for(role) for role in ('Admin', 'Resident')}
@@ -0,0 +1,133 @@
+"""The buffered audit writer: journal, spool files, replay, and monthly partitions."""
+import glob
+import os
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from conftest import POSTGRES
+from extensions import db
+from models import AuditLog, User
+import audit_log
+
+# Above the largest pid_max Linux allows, so never a live process
+DEAD_PID = 2 ** 22 + 1
+
+
+def refuse(*args, **kwargs):
+    raise OperationalError('INSERT INTO audit_logs', {}, Exception('database is unavailable'))
+
+
+def spool(pattern='*'):
+    return glob.glob(os.path.join(audit_log._spool_dir(), pattern))
+
+
+def logged(action):
+    return AuditLog.query.filter_by(action=action).count()
+
+
+@pytest.fixture
+def admin_id(app):
+    with app.app_context():
+        yield User.query.filter_by(email='admin@example.com').one().id
+        # Leave nothing queued or spooled for the next test
+        audit_log.writer.flush()
+        assert spool() == []
+
+
+def test_only_committed_actions_are_logged(app, admin_id):
+    audit_log.record(admin_id, 'TEST_ROLLED_BACK')
+    db.session.rollback()
+    audit_log.record(admin_id, 'TEST_COMMITTED')
+    db.session.commit()
+
+    audit_log.writer.flush()
+    assert logged('TEST_ROLLED_BACK') == 0
+    assert logged('TEST_COMMITTED') == 1
+
+
+def test_entries_survive_a_failed_flush(app, admin_id, monkeypatch):
+    entries = [audit_log.entry(admin_id, 'TEST_SPOOLED', details={'n': n}) for n in range(3)]
+    audit_log.writer.add(entries)
+
+    monkeypatch.setattr(audit_log, '_insert', refuse)
+    audit_log.writer.flush()
+    [spooled] = spool('*.jsonl')
+    assert spool('*.journal') == []
+    with open(spooled) as f:
+        assert [audit_log._load(line)['id'] for line in f] == [e['id'] for e in entries]
+    assert logged('TEST_SPOOLED') == 0
+
+    monkeypatch.undo()
+    audit_log.writer.flush()
+    assert logged('TEST_SPOOLED') == 3
+    assert spool() == []
+
+
+def test_replay_does_not_duplicate_written_entries(app, admin_id):
+    written = audit_log.entry(admin_id, 'TEST_REPLAYED')
+    missing = audit_log.entry(admin_id, 'TEST_REPLAYED')
+    audit_log._insert([written])
+    os.makedirs(audit_log._spool_dir(), exist_ok=True)
+    # The batch was committed after all, then spooled; the last line was cut short by a crash
+    with open(os.path.join(audit_log._spool_dir(), 'audit-1-replay.jsonl'), 'w') as f:
+        f.write(audit_log._dump(written) + '\n' + audit_log._dump(missing) + '\n')
+        f.write(audit_log._dump(missing)[:20])
+
+    assert audit_log.replay_spool() == 2
+    assert sorted(id for id, in db.session.query(AuditLog.id).filter_by(action='TEST_REPLAYED')) \
+        == sorted([written['id'], missing['id']])
+    assert audit_log.replay_spool() == 0
+    assert logged('TEST_REPLAYED') == 2
+
+
+def test_journal_of_a_killed_worker_is_replayed(app, admin_id):
+    orphan = audit_log.entry(admin_id, 'TEST_ORPHANED')
+    live = audit_log.entry(admin_id, 'TEST_ORPHANED')
+    os.makedirs(audit_log._spool_dir(), exist_ok=True)
+    for pid, entry in ((DEAD_PID, orphan), (os.getpid(), live)):
+        with open(os.path.join(audit_log._spool_dir(), f'audit-{pid}-test.journal'), 'w') as f:
+            f.write(audit_log._dump(entry) + '\n')
+
+    assert audit_log.replay_spool() == 1
+    assert db.session.query(AuditLog.id).filter_by(action='TEST_ORPHANED').scalar() == orphan['id']
+    # This worker's own journal is still being written to
+    [journal] = spool('*.journal')
+    os.remove(journal)
+
+
+def test_audit_log_stays_readable_while_the_database_refuses_entries(app, client, tokens, admin_id,
+                                                                     monkeypatch):
+    audit_log.writer.add([audit_log.entry(admin_id, 'TEST_UNREADABLE_DB')])
+    monkeypatch.setattr(audit_log, '_insert', refuse)
+    response = client.get('/api/admin/audit-logs', headers={'Authorization': f'Bearer {tokens["Admin"]}'})
+    assert response.status_code == 200
+    assert len(spool('*.jsonl')) == 1
+
+    # Nothing queued now, but the spool file cannot be replayed either
+    response = client.get('/api/admin/audit-logs', headers={'Authorization': f'Bearer {tokens["Admin"]}'})
+    assert response.status_code == 200
+    assert len(spool('*.jsonl')) == 1
+    monkeypatch.undo()
+
+
+@pytest.mark.skipif(not POSTGRES, reason='partitioning needs PostgreSQL (set TEST_DATABASE_URL)')
+def test_partitions_are_created_on_demand_and_pruned_whole(app, admin_id):
+    now = datetime.utcnow()
+    old = audit_log._month(now, -30)
+    with db.engine.begin() as conn:
+        assert audit_log.is_partitioned(conn)
+        audit_log.write(conn, [
+            {**audit_log.entry(admin_id, 'TEST_PARTITIONED'), 'timestamp': old},
+            audit_log.entry(admin_id, 'TEST_PARTITIONED')
+        ])
+        partitions = audit_log._partitions(conn)
+    assert {old, audit_log._month(now)} <= set(partitions)
+
+    result = app.test_cli_runner().invoke(args=['audit', 'prune', '--months', '24'])
+    assert result.exit_code == 0, result.output
+    with db.engine.connect() as conn:
+        assert old not in audit_log._partitions(conn)
+        assert conn.execute(text(
+            "SELECT count(*) FROM audit_logs WHERE action = 'TEST_PARTITIONED'"
+        )).scalar() == 1
@@ -0,0 +1,42 @@
+"""Refresh token rotation and replay detection."""
+from flask_jwt_extended import decode_token
+from models import RevokedToken
+from revocation import BloomFilter, denylist
+
+
+def login(client, email='resident@example.com', password='resident123'):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def refresh(client, token):
+    return client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {token}'})
+
+
+def test_refresh_rotates_the_token(client):
+    tokens = login(client)
+    response = refresh(client, tokens['refresh_token'])
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert refresh(client, rotated['refresh_token']).status_code == 200
+
+
+def test_replayed_refresh_token_ends_the_session_on_an_unsynced_worker(app, client):
+    tokens = login(client)
+    rotated = refresh(client, tokens['refresh_token']).get_json()
+
+    denylist._bloom = BloomFilter(app.config['REVOCATION_BLOOM_CAPACITY'])
+    denylist._next_sync = float('inf')
+    try:
+        assert refresh(client, tokens['refresh_token']).status_code == 401
+        with app.app_context():
+            family = decode_token(tokens['refresh_token'])['fam']
+            assert RevokedToken.query.filter_by(jti=family, token_type='family').count() == 1
+    finally:
+        denylist._bloom = None
+        denylist._next_sync = 0
+
+    # The token issued by the legitimate refresh belongs to the same session
+    assert refresh(client, rotated['refresh_token']).status_code == 401
@@ -0,0 +1,91 @@
+"""Approving and rejecting unit bookings, singly and in batches."""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from extensions import db
+from models import Booking, Lease, Tower, Unit, User
+import occupancy
+
+
+@pytest.fixture
+def unit_with_requests(app):
+    """A vacant unit in a tower of its own, with pending bookings from three residents."""
+    with app.app_context():
+        tower = Tower(name=f'Decisions {uuid.uuid4().hex[:8]}')
+        unit = Unit(tower=tower, unit_number='D-101', floor=1, status='Vacant')
+        residents = User.query.filter_by(role='Resident').order_by(User.email).limit(3).all()
+        start = datetime.utcnow() + timedelta(days=7)
+        bookings = [
+            Booking(user_id=resident.id, unit=unit, start_time=start, end_time=start + timedelta(days=1))
+            for resident in residents
+        ]
+        db.session.add_all([tower, unit, *bookings])
+        db.session.commit()
+        return tower.id, unit.id, [booking.id for booking in bookings]
+
+
+def decide(client, tokens, decisions):
+    return client.put('/api/bookings/decisions', json={'decisions': [
+        {'booking_id': str(booking_id), 'action': action} for booking_id, action in decisions
+    ]}, headers={'Authorization': f'Bearer {tokens["Admin"]}'})
+
+
+def test_approval_leases_the_unit_and_rejects_the_other_requests(app, client, tokens, unit_with_requests):
+    tower_id, unit_id, (first, second, third) = unit_with_requests
+    with app.app_context():
+        before = occupancy.get_counts()
+
+    response = decide(client, tokens, [(first, 'approve')])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['results'][0]['outcome'] == 'approved'
+    assert sorted(row['booking_id'] for row in body['auto_rejected']) == sorted([str(second), str(third)])
+
+    with app.app_context():
+        leases = Lease.query.filter_by(unit_id=unit_id).all()
+        assert len(leases) == 1
+        assert str(leases[0].id) == body['results'][0]['lease_id']
+        assert db.session.get(Unit, unit_id).status == 'Occupied'
+        statuses = {b.id: b.status for b in Booking.query.filter_by(unit_id=unit_id)}
+        assert statuses == {first: 'Approved', second: 'Rejected', third: 'Rejected'}
+
+        assert occupancy.get_counts(tower_id) == {'Vacant': 0, 'Occupied': 1}
+        after = occupancy.get_counts()
+        assert after.get('Vacant', 0) == before.get('Vacant', 0) - 1
+        assert after.get('Occupied', 0) == before.get('Occupied', 0) + 1
+        assert occupancy.reconcile(dry_run=True) == {}
+
+
+def test_first_approval_in_a_batch_wins(app, client, tokens, unit_with_requests):
+    _, unit_id, (first, second, third) = unit_with_requests
+    response = decide(client, tokens, [(second, 'approve'), (first, 'approve'), (third, 'reject')])
+    assert response.status_code == 200
+    results = {row['booking_id']: row for row in response.get_json()['results']}
+    assert results[str(second)]['outcome'] == 'approved'
+    assert results[str(first)] == {
+        'booking_id': str(first), 'action': 'approve', 'outcome': 'rejected', 'superseded_by': str(second)
+    }
+    assert results[str(third)]['outcome'] == 'rejected'
+    with app.app_context():
+        assert Lease.query.filter_by(unit_id=unit_id).count() == 1
+
+
+def test_a_decided_booking_is_not_decided_again(app, client, tokens, unit_with_requests):
+    _, unit_id, (first, second, _) = unit_with_requests
+    assert decide(client, tokens, [(first, 'approve')]).status_code == 200
+
+    response = decide(client, tokens, [(first, 'approve'), (second, 'approve')])
+    outcomes = [row['outcome'] for row in response.get_json()['results']]
+    assert outcomes == ['not_pending', 'not_pending']
+    with app.app_context():
+        assert Lease.query.filter_by(unit_id=unit_id).count() == 1
+
+
+def test_invalid_decisions_change_nothing(app, client, tokens, unit_with_requests):
+    _, unit_id, (first, _, _) = unit_with_requests
+    response = decide(client, tokens, [(first, 'approve'), (first, 'reject'), ('not-a-uuid', 'approve')])
+    assert response.status_code == 400
+    assert len(response.get_json()['errors']) == 2
+    with app.app_context():
+        assert db.session.get(Booking, first).status == 'Pending'
+        assert db.session.get(Unit, unit_id).status == 'Vacant'
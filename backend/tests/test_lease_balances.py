@@ -0,0 +1,142 @@
+"""The lease balance ledger: rent accrual, payments, and the arrears report built on it."""
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import pytest
+from extensions import db
+from models import Lease, LeaseBalance, Payment, Tower, Unit, User
+from lease_balances import month_start, next_month
+import lease_balances
+
+RENT = Decimal('3000.00')
+
+
+def months_back(month, count):
+    for _ in range(count):
+        month = month_start(month - timedelta(days=1))
+    return month
+
+
+def ledger(lease_id):
+    rows = LeaseBalance.query.filter_by(lease_id=lease_id).order_by(LeaseBalance.month)
+    return {row.month: (row.rent_due, row.paid) for row in rows}
+
+
+@pytest.fixture
+def lease(app):
+    """A lease in a tower of its own that started on the 16th, two months before this one."""
+    with app.app_context():
+        tower = Tower(name=f'Ledger {uuid.uuid4().hex[:8]}')
+        unit = Unit(tower=tower, unit_number='L-101', floor=1, status='Occupied')
+        resident = User.query.filter_by(email='resident@example.com').one()
+        start = months_back(month_start(date.today()), 2).replace(day=16)
+        lease = Lease(unit=unit, resident_id=resident.id, start_date=start,
+                      end_date=date.today() + timedelta(days=365), rent_amount=RENT, status='Active')
+        db.session.add_all([tower, unit, lease])
+        db.session.commit()
+        return tower.id, lease.id, start
+
+
+def test_new_lease_accrues_every_month_it_has_run(app, lease):
+    _, lease_id, start = lease
+    first = month_start(start)
+    days = (next_month(first) - first).days
+    with app.app_context():
+        assert ledger(lease_id) == {
+            first: (round(RENT * (days - 15) / days, 2), 0),
+            next_month(first): (RENT, 0),
+            month_start(date.today()): (RENT, 0),
+        }
+
+
+def test_payments_move_the_paid_column(app, lease):
+    _, lease_id, _ = lease
+    this_month = month_start(date.today())
+    with app.app_context():
+        rent = Payment(lease_id=lease_id, amount=Decimal('1200.00'), payment_type='Rent')
+        deposit = Payment(lease_id=lease_id, amount=Decimal('5000.00'), payment_type='Deposit')
+        db.session.add_all([rent, deposit])
+        db.session.commit()
+        assert ledger(lease_id)[this_month] == (RENT, Decimal('1200.00'))
+
+        rent.amount = Decimal('1000.00')
+        db.session.commit()
+        assert ledger(lease_id)[this_month] == (RENT, Decimal('1000.00'))
+
+        rent.status = 'Failed'
+        db.session.commit()
+        assert ledger(lease_id)[this_month] == (RENT, 0)
+
+        rent.status = 'Completed'
+        db.session.commit()
+        db.session.delete(rent)
+        db.session.commit()
+        assert ledger(lease_id)[this_month] == (RENT, 0)
+
+
+def test_rolled_back_payment_leaves_no_trace(app, lease):
+    _, lease_id, _ = lease
+    with app.app_context():
+        db.session.add(Payment(lease_id=lease_id, amount=Decimal('500.00'), payment_type='Rent'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.add(Payment(lease_id=lease_id, amount=Decimal('1.00'), payment_type='Deposit'))
+        db.session.commit()
+        assert all(paid == 0 for _, paid in ledger(lease_id).values())
+
+
+def test_rebuild_reproduces_the_ledger(app, lease):
+    _, lease_id, _ = lease
+    with app.app_context():
+        db.session.add(Payment(lease_id=lease_id, amount=Decimal('750.00'), payment_type='Rent',
+                               payment_date=datetime.utcnow() - timedelta(days=40)))
+        db.session.commit()
+        before = ledger(lease_id)
+        lease_balances.rebuild(db.session.connection())
+        db.session.commit()
+        assert ledger(lease_id) == before
+
+
+def test_arrears_report_totals(app, client, tokens, lease):
+    tower_id, lease_id, _ = lease
+    with app.app_context():
+        db.session.add(Payment(lease_id=lease_id, amount=Decimal('2000.00'), payment_type='Rent'))
+        db.session.commit()
+        cutoff = month_start(date.today() - timedelta(days=app.config['RENT_GRACE_DAYS']))
+        due = sum(rent_due for month, (rent_due, _) in ledger(lease_id).items() if month <= cutoff)
+
+    response = client.get(f'/api/reports/arrears?tower_id={tower_id}',
+                          headers={'Authorization': f'Bearer {tokens["Admin"]}'})
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['due_through'] == cutoff.isoformat()
+    assert report['unaccrued_leases'] == 0
+    assert report['totals']['overdue_leases'] == 1
+    assert Decimal(report['totals']['amount']) == due - 2000
+    [tower] = report['towers']
+    assert tower['tower_id'] == str(tower_id)
+    assert Decimal(tower['amount']) == due - 2000
+    [row] = tower['leases']
+    assert row['lease_id'] == str(lease_id)
+    assert Decimal(row['balance']) == due - 2000
+
+
+def test_report_only_reads_and_the_job_accrues(app, client, tokens, lease):
+    tower_id, lease_id, _ = lease
+    headers = {'Authorization': f'Bearer {tokens["Admin"]}'}
+    with app.app_context():
+        cutoff = month_start(date.today() - timedelta(days=app.config['RENT_GRACE_DAYS']))
+        LeaseBalance.query.filter_by(lease_id=lease_id, month=cutoff).delete()
+        db.session.commit()
+
+    report = client.get(f'/api/reports/arrears?tower_id={tower_id}', headers=headers).get_json()
+    assert report['unaccrued_leases'] == 1
+    with app.app_context():
+        assert cutoff not in ledger(lease_id)
+
+    result = app.test_cli_runner().invoke(args=['balances', 'accrue'])
+    assert result.exit_code == 0, result.output
+    report = client.get(f'/api/reports/arrears?tower_id={tower_id}', headers=headers).get_json()
+    assert report['unaccrued_leases'] == 0
+    with app.app_context():
+        assert ledger(lease_id)[cutoff] == (RENT, 0)
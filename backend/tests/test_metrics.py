@@ -0,0 +1,37 @@
+"""Access to the Prometheus scrape endpoint."""
+import ipaddress
+import pytest
+
+
+@pytest.fixture
+def metrics_config(app):
+    saved = app.config['METRICS_TOKEN'], app.config['METRICS_ALLOWED_IPS']
+    yield app.config
+    app.config['METRICS_TOKEN'], app.config['METRICS_ALLOWED_IPS'] = saved
+
+
+def scrape(client, addr='203.0.113.7', token=None):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': addr})
+
+
+def test_metrics_are_closed_by_default(client, metrics_config):
+    metrics_config['METRICS_TOKEN'], metrics_config['METRICS_ALLOWED_IPS'] = '', []
+    assert scrape(client).status_code == 403
+    assert scrape(client, addr='127.0.0.1').status_code == 403
+    assert scrape(client, token='anything').status_code == 403
+
+
+def test_metrics_need_the_token(client, metrics_config):
+    metrics_config['METRICS_TOKEN'] = 's3cret'
+    assert scrape(client, token='wrong').status_code == 403
+    response = scrape(client, token='s3cret')
+    assert response.status_code == 200
+    assert b'http_requests_total' in response.data
+
+
+def test_metrics_from_allowed_networks(client, metrics_config):
+    metrics_config['METRICS_ALLOWED_IPS'] = [ipaddress.ip_network('10.0.0.0/8'), ipaddress.ip_network('::1')]
+    assert scrape(client, addr='10.1.2.3').status_code == 200
+    assert scrape(client, addr='::1').status_code == 200
+    assert scrape(client, addr='11.1.2.3').status_code == 403
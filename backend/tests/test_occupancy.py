@@ -0,0 +1,42 @@
+"""The occupancy snapshot kept alongside the units table."""
+import uuid
+from collections import Counter
+from extensions import db
+from models import Tower, Unit
+import occupancy
+
+
+def test_deltas_for_one_tower_land_on_one_row_whatever_the_id_type(app):
+    with app.app_context():
+        tower = Tower(name=f'Occupancy {uuid.uuid4().hex[:8]}')
+        db.session.add(tower)
+        db.session.commit()
+        before = occupancy.get_counts()
+
+        occupancy.apply_deltas(db.session.connection(), Counter({
+            (tower.id, 'Vacant'): 2,
+            (str(tower.id), 'Vacant'): 1,
+            (str(tower.id), 'Occupied'): 1,
+        }))
+        try:
+            assert occupancy.get_counts(tower.id) == {'Vacant': 3, 'Occupied': 1}
+            after = occupancy.get_counts()
+            assert after['Vacant'] == before.get('Vacant', 0) + 3
+            assert after['Occupied'] == before.get('Occupied', 0) + 1
+        finally:
+            db.session.rollback()
+
+
+def test_unit_changes_move_the_snapshot(app):
+    with app.app_context():
+        tower = Tower(name=f'Occupancy {uuid.uuid4().hex[:8]}')
+        units = [Unit(tower=tower, unit_number=f'O-{n}', floor=1) for n in range(3)]
+        db.session.add_all([tower, *units])
+        db.session.commit()
+        assert occupancy.get_counts(tower.id) == {'Vacant': 3}
+
+        units[0].status = 'Occupied'
+        db.session.delete(units[1])
+        db.session.commit()
+        assert occupancy.get_counts(tower.id) == {'Vacant': 1, 'Occupied': 1}
+        assert occupancy.reconcile(dry_run=True) == {}
@@ -0,0 +1,103 @@
+"""Parsing provider hours and keeping the stored windows in step with the text."""
+from datetime import datetime
+import pytest
+from extensions import db
+from models import ServiceProvider
+from provider_availability import ALL_DAY, InvalidAvailability, available_at, parse
+
+
+def hours(text):
+    return sorted({(start, end) for _, start, end in parse(text)})
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('9 AM - 6 PM', [(9 * 60, 18 * 60)]),
+    ('9-6 PM', [(9 * 60, 18 * 60)]),
+    ('10 - 11 PM', [(22 * 60, 23 * 60)]),
+    ('9-5', [(9 * 60, 17 * 60)]),
+    ('8:30-4:30', [(8 * 60 + 30, 16 * 60 + 30)]),
+    ('7-19', [(7 * 60, 19 * 60)]),
+    ('22-6', [(0, 6 * 60), (22 * 60, ALL_DAY)]),
+    ('10 PM - 2 AM', [(0, 2 * 60), (22 * 60, ALL_DAY)]),
+    ('24/7', [(0, ALL_DAY)]),
+])
+def test_parse_hours(text, expected):
+    assert hours(text) == expected
+
+
+def test_parse_days():
+    windows = parse('Mon-Fri 9-5; Sat 10 AM - 2 PM')
+    assert {day for day, _, _ in windows} == set(range(6))
+    assert (5, 10 * 60, 14 * 60) in windows
+
+
+@pytest.mark.parametrize('text', ['', 'whenever', 'Funday 9-5', '13 PM - 2 PM', '25:00-26:00'])
+def test_parse_rejects(text):
+    with pytest.raises(InvalidAvailability):
+        parse(text)
+
+
+def test_provider_without_availability_gets_the_default_hours(app):
+    with app.app_context():
+        provider = ServiceProvider(name='Default Hours', service_type='Plumber', phone_number='900')
+        db.session.add(provider)
+        db.session.flush()
+        try:
+            assert provider.availability == '9 AM - 6 PM'
+            assert len(provider.windows) == 7
+            monday_10am = datetime(2026, 10, 19, 10, 0)
+            query = available_at(ServiceProvider.query.filter_by(id=provider.id), monday_10am)
+            assert query.count() == 1
+        finally:
+            db.session.rollback()
+
+
+def test_changed_text_replaces_the_windows(app):
+    with app.app_context():
+        provider = ServiceProvider(name='Night Shift', service_type='Driver', phone_number='901',
+                                   availability='Mon 9-5')
+        db.session.add(provider)
+        db.session.flush()
+        try:
+            provider.availability = 'Sat 22-6'
+            db.session.flush()
+            assert sorted((w.weekday, w.start_minute, w.end_minute) for w in provider.windows) == [
+                (5, 22 * 60, ALL_DAY), (6, 0, 6 * 60)
+            ]
+        finally:
+            db.session.rollback()
+
+
+def test_unrated_providers_page_after_the_rated_ones(app, client, tokens):
+    service_type = 'Pager'
+    with app.app_context():
+        providers = [
+            ServiceProvider(name=name, service_type=service_type, phone_number='902', rating=rating,
+                            availability='24/7')
+            for name, rating in (('Rated high', 4.9), ('Unrated', None), ('Rated low', 1.0))
+        ]
+        db.session.add_all(providers)
+        db.session.flush()
+        # The column default also fills in an explicit None on insert
+        db.session.execute(db.update(ServiceProvider).where(ServiceProvider.id == providers[1].id)
+                           .values(rating=None))
+        db.session.commit()
+
+    names, cursor = [], None
+    try:
+        while True:
+            path = f'/api/service-providers/available?type={service_type}&limit=1'
+            response = client.get(path + (f'&cursor={cursor}' if cursor else ''),
+                                  headers={'Authorization': f'Bearer {tokens["Resident"]}'})
+            assert response.status_code == 200
+            body = response.get_json()
+            names += [p['name'] for p in body['items']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        assert names == ['Rated high', 'Rated low', 'Unrated']
+    finally:
+        with app.app_context():
+            for provider in ServiceProvider.query.filter_by(service_type=service_type):
+                db.session.delete(provider)
+            db.session.commit()
@@ -0,0 +1,52 @@
+"""Statement counts of the list endpoints, so an N+1 cannot creep back in unnoticed.
+
+Each page holds many rows, so a per-row lazy load would blow the budget.
+"""
+import pytest
+from instrumentation import count_queries
+
+# (role, path, most statements) - never above the view's @query_budget, which covers its
+# costliest variant: a plain payments page needs one statement, ?totals=true a second
+BUDGETS = [
+    ('Resident', '/api/units', 2),
+    ('Admin', '/api/units?status=Vacant&min_floor=1&max_floor=10', 2),
+    ('Resident', '/api/bookings', 1),
+    ('Admin', '/api/bookings', 1),
+    ('Resident', '/api/leases', 1),
+    ('Resident', '/api/payments', 1),
+    ('Admin', '/api/payments', 1),
+    ('Admin', '/api/payments?totals=true', 2),
+    ('Admin', '/api/tenants', 1),
+    ('Admin', '/api/admin/users', 1),
+]
+
+
+@pytest.mark.parametrize('role, path, max_queries', BUDGETS)
+def test_list_endpoint_stays_within_budget(app, client, tokens, role, path, max_queries):
+    endpoint, _ = app.url_map.bind('localhost').match(path.split('?')[0])
+    assert max_queries <= app.view_functions[endpoint].query_budget
+    headers = {'Authorization': f'Bearer {tokens[role]}'}
+    # The first request also fills the per-worker caches (revocation denylist, user rows)
+    client.get(path, headers=headers, buffered=True)
+    with count_queries(max_queries=max_queries):
+        response = client.get(path, headers=headers, buffered=True)
+    assert response.status_code == 200
+    body = response.get_json()
+    # A paged body is a dict that is never empty; the rows are what the budget is about
+    rows = body['items'] if isinstance(body, dict) else body
+    assert len(rows) > 0
+
+
+def test_strict_mode_fails_a_request_over_its_budget(app, client, tokens):
+    headers = {'Authorization': f'Bearer {tokens["Admin"]}'}
+    view = app.view_functions['api.get_payments']
+    budget = view.query_budget
+    app.config['SQL_QUERY_BUDGET_STRICT'] = True
+    view.query_budget = 1
+    try:
+        assert client.get('/api/payments', headers=headers).status_code == 200
+        with pytest.raises(AssertionError, match='budget is 1'):
+            client.get('/api/payments?totals=true', headers=headers)
+    finally:
+        view.query_budget = budget
+        app.config['SQL_QUERY_BUDGET_STRICT'] = False
@@ -0,0 +1,22 @@
+"""Engine options of the read replica binds."""
+import db_pool
+import replicas
+
+
+def test_postgres_replicas_fail_fast_on_connect(app):
+    config = {
+        **app.config, 'DB_POOL_MODE': 'pooled', 'REPLICA_CONNECT_TIMEOUT': 3,
+        'DATABASE_REPLICA_URLS': ['postgresql://replica-1/rental', 'sqlite:///replica.db'],
+    }
+    binds = replicas.binds(config, lambda uri: db_pool.engine_options(config, uri))
+    assert binds['replica_0']['connect_args'] == {
+        'application_name': config['DB_APPLICATION_NAME'], 'connect_timeout': 3
+    }
+    assert binds['replica_0']['pool_size'] == config['DB_POOL_SIZE']
+    # SQLite has no connect timeout to set
+    assert binds['replica_1'] == {'url': 'sqlite:///replica.db'}
+
+
+def test_primary_keeps_its_own_connect_options(app):
+    config = {**app.config, 'DB_POOL_MODE': 'pooled'}
+    assert 'connect_timeout' not in db_pool.engine_options(config, 'postgresql://primary/rental')['connect_args']
@@ -0,0 +1,122 @@
+"""Bulk unit provisioning (JSON and CSV) and set-based amenity updates."""
+import uuid
+import pytest
+from extensions import db
+from models import Amenity, Tower, Unit, UnitAmenity
+import occupancy
+import unit_import
+
+
+@pytest.fixture
+def tower_id(app):
+    """An empty tower of its own, holding one existing unit, A-1."""
+    with app.app_context():
+        tower = Tower(name=f'Import {uuid.uuid4().hex[:8]}')
+        db.session.add_all([tower, Unit(tower=tower, unit_number='A-1', floor=1)])
+        db.session.commit()
+        return tower.id
+
+
+@pytest.fixture
+def amenities(app):
+    with app.app_context():
+        return [(a.id, a.name) for a in Amenity.query.order_by(Amenity.name).limit(3)]
+
+
+def bulk(client, tokens, tower_id, units):
+    return client.post('/api/units/bulk', json={'tower_id': str(tower_id), 'units': units},
+                       headers={'Authorization': f'Bearer {tokens["Admin"]}'})
+
+
+def linked(unit_id):
+    return set(db.session.scalars(db.select(UnitAmenity.amenity_id).where(UnitAmenity.unit_id == unit_id)))
+
+
+def test_read_csv():
+    rows = unit_import.read_csv(
+        'unit_number, floor ,status,amenities,photos,nearby_places\n'
+        'B-1,2,,Gym; Pool,a.jpg;b.jpg,\n'
+        ' B-2 ,3,Maintenance,,,Park\n'
+    )
+    assert rows == [
+        {'unit_number': 'B-1', 'floor': '2', 'amenities': 'Gym; Pool', 'photos': ['a.jpg', 'b.jpg']},
+        {'unit_number': 'B-2', 'floor': '3', 'status': 'Maintenance', 'amenities': '', 'nearby_places': ['Park']},
+    ]
+
+
+def test_validate_reports_every_bad_row(app, tower_id, amenities):
+    (first_id, _), (_, second_name), _ = amenities
+    unknown = uuid.uuid4()
+    with app.app_context():
+        units, links, errors = unit_import.validate(str(tower_id), [
+            {'unit_number': 'A-1', 'floor': 1},
+            {'unit_number': 'A-2', 'floor': 2, 'amenities': [str(first_id), second_name]},
+            {'unit_number': 'A-2', 'floor': 2},
+            {'unit_number': '', 'floor': 'two', 'status': 'Demolished'},
+            {'unit_number': 'A-3', 'floor': 3, 'amenities': f'{unknown};Helipad'},
+        ])
+    assert errors == [
+        {'row': 1, 'unit_number': 'A-1', 'errors': ['unit_number already exists in this tower']},
+        {'row': 3, 'unit_number': 'A-2', 'errors': ['unit_number is duplicated in this upload']},
+        {'row': 4, 'unit_number': None, 'errors': [
+            'unit_number is required', 'floor must be an integer',
+            'status must be one of Vacant, Occupied, Maintenance'
+        ]},
+        {'row': 5, 'unit_number': 'A-3', 'errors': [f'unknown amenity {unknown}', 'unknown amenity Helipad']},
+    ]
+    [unit] = units
+    assert unit['tower_id'] == tower_id
+    assert {link['amenity_id'] for link in links} == {first_id, amenities[1][0]}
+
+
+def test_bulk_create_is_all_or_nothing(app, client, tokens, tower_id):
+    response = bulk(client, tokens, tower_id, [
+        {'unit_number': 'A-2', 'floor': 2},
+        {'unit_number': 'A-3', 'floor': 'three'},
+    ])
+    assert response.status_code == 400
+    assert [e['row'] for e in response.get_json()['errors']] == [2]
+    with app.app_context():
+        assert Unit.query.filter_by(tower_id=tower_id).count() == 1
+
+
+def test_bulk_create_caps_the_upload(client, tokens, tower_id, monkeypatch):
+    monkeypatch.setattr(unit_import, 'MAX_BULK_UNITS', 2)
+    response = bulk(client, tokens, tower_id, [{'unit_number': f'C-{n}', 'floor': 1} for n in range(3)])
+    assert response.status_code == 400
+    assert response.get_json()['msg'] == 'At most 2 units per request'
+
+
+def test_bulk_create_from_csv(app, client, tokens, tower_id, amenities):
+    (first_id, first_name), _, _ = amenities
+    response = client.post(
+        f'/api/units/bulk?tower_id={tower_id}',
+        data=f'unit_number,floor,status,amenities\nD-1,4,,{first_name}\nD-2,4,Occupied,\n',
+        content_type='text/csv', headers={'Authorization': f'Bearer {tokens["Admin"]}'}
+    )
+    assert response.status_code == 201
+    ids = [uuid.UUID(i) for i in response.get_json()['ids']]
+    with app.app_context():
+        units = {u.unit_number: u for u in Unit.query.filter(Unit.id.in_(ids))}
+        assert units['D-2'].status == 'Occupied'
+        assert linked(units['D-1'].id) == {first_id}
+        assert linked(units['D-2'].id) == set()
+        assert occupancy.get_counts(tower_id) == {'Vacant': 2, 'Occupied': 1}
+
+
+def test_replace_amenities_touches_only_the_difference(app, tower_id, amenities):
+    (first_id, _), (second_id, second_name), (third_id, _) = amenities
+    with app.app_context():
+        unit = Unit.query.filter_by(tower_id=tower_id).one()
+        db.session.add_all(UnitAmenity(unit_id=unit.id, amenity_id=a) for a in (first_id, second_id))
+        db.session.commit()
+
+        added, removed = unit_import.replace_amenities(unit.id, [second_name, str(third_id)])
+        db.session.commit()
+        assert (added, removed) == ({third_id}, {first_id})
+        assert linked(unit.id) == {second_id, third_id}
+
+        assert unit_import.replace_amenities(unit.id, [str(second_id), str(third_id)]) == (set(), set())
+        assert unit_import.replace_amenities(unit.id, []) == (set(), {second_id, third_id})
+        db.session.commit()
+        assert linked(unit.id) == set()
@@ -0,0 +1,159 @@
+import csv
+import io
+import uuid
+from collections import Counter
+from sqlalchemy import insert, or_
+from extensions import db
+from models import Amenity, Unit, UnitAmenity
+import occupancy
+import unit_search
+
+UNIT_STATUSES = ('Vacant', 'Occupied', 'Maintenance')
+MAX_BULK_UNITS = 5000
+
+
+def parse_amenity_refs(values):
+    """Split amenity references into UUIDs and names; CSV cells use ';' between them."""
+    if isinstance(values, str):
+        values = values.split(';')
+    ids, names = set(), set()
+    for value in values or []:
+        value = str(value).strip()
+        if not value:
+            continue
+        try:
+            ids.add(uuid.UUID(value))
+        except ValueError:
+            names.add(value)
+    return ids, names
+
+
+def read_csv(text):
+    """Rows from a CSV with a header of unit_number, floor[, status, amenities, photos, nearby_places]."""
+    rows = []
+    for record in csv.DictReader(io.StringIO(text)):
+        row = {k.strip(): (v or '').strip() for k, v in record.items() if k}
+        for field in ('photos', 'nearby_places'):
+            if row.get(field):
+                row[field] = [p.strip() for p in row[field].split(';') if p.strip()]
+            else:
+                row.pop(field, None)
+        if not row.get('status'):
+            row.pop('status', None)
+        rows.append(row)
+    return rows
+
+
+def load_amenities(rows):
+    """Fetch every amenity referenced by any row with a single IN query."""
+    ids, names = set(), set()
+    for row in rows:
+        row_ids, row_names = parse_amenity_refs(row.get('amenities'))
+        ids |= row_ids
+        names |= row_names
+    if not ids and not names:
+        return {}, {}
+    amenities = Amenity.query.filter(or_(Amenity.id.in_(ids), Amenity.name.in_(names))).all()
+    return {a.id: a for a in amenities}, {a.name: a for a in amenities}
+
+
+def validate(tower_id, rows):
+    """Return ``(units, links, errors)`` ready for insertion, or per-row errors."""
+    # Core inserts and the occupancy snapshot need the UUID, not its string
+    tower_id = tower_id if isinstance(tower_id, uuid.UUID) else uuid.UUID(str(tower_id))
+    by_id, by_name = load_amenities(rows)
+    existing = {
+        number for (number,) in db.session.query(Unit.unit_number).filter(Unit.tower_id == tower_id)
+    }
+    seen = set()
+    units, links, errors = [], [], []
+
+    for index, row in enumerate(rows, start=1):
+        row_errors = []
+        unit_number = str(row.get('unit_number') or '').strip()
+        if not unit_number:
+            row_errors.append('unit_number is required')
+        elif unit_number in existing:
+            row_errors.append('unit_number already exists in this tower')
+        elif unit_number in seen:
+            row_errors.append('unit_number is duplicated in this upload')
+        seen.add(unit_number)
+
+        try:
+            floor = int(row.get('floor'))
+        except (TypeError, ValueError):
+            floor = None
+            row_errors.append('floor must be an integer')
+
+        status = row.get('status', 'Vacant')
+        if status not in UNIT_STATUSES:
+            row_errors.append(f'status must be one of {", ".join(UNIT_STATUSES)}')
+
+        ids, names = parse_amenity_refs(row.get('amenities'))
+        amenity_ids = set()
+        for ref in ids:
+            if ref in by_id:
+                amenity_ids.add(ref)
+            else:
+                row_errors.append(f'unknown amenity {ref}')
+        for ref in names:
+            if ref in by_name:
+                amenity_ids.add(by_name[ref].id)
+            else:
+                row_errors.append(f'unknown amenity {ref}')
+
+        if row_errors:
+            errors.append({'row': index, 'unit_number': unit_number or None, 'errors': row_errors})
+            continue
+
+        unit_id = uuid.uuid4()
+        units.append({
+            'id': unit_id,
+            'tower_id': tower_id,
+            'unit_number': unit_number,
+            'floor': floor,
+            'status': status,
+            'photos': row.get('photos'),
+            'nearby_places': row.get('nearby_places')
+        })
+        links.extend({'unit_id': unit_id, 'amenity_id': a} for a in amenity_ids)
+
+    return units, links, errors
+
+
+def insert_units(units, links):
+    """Insert units and their amenity links as batched multi-row INSERTs in the current transaction."""
+    if units:
+        db.session.execute(insert(Unit.__table__), units)
+    if links:
+        db.session.execute(insert(UnitAmenity.__table__), links)
+    # Core inserts bypass the ORM flush hook, so move the snapshot here
+    deltas = Counter((u['tower_id'], u['status']) for u in units)
+    occupancy.apply_deltas(db.session.connection(), deltas)
+    unit_search.record_changes(db.session.connection(), [u['id'] for u in units])
+
+
+def replace_amenities(unit_id, values):
+    """Make the unit's amenities exactly ``values`` by inserting and deleting only the difference."""
+    ids, names = parse_amenity_refs(values)
+    wanted = set()
+    if ids or names:
+        wanted = set(db.session.scalars(
+            db.select(Amenity.id).where(or_(Amenity.id.in_(ids), Amenity.name.in_(names)))
+        ))
+    current = set(db.session.scalars(
+        db.select(UnitAmenity.amenity_id).where(UnitAmenity.unit_id == unit_id)
+    ))
+    removed = current - wanted
+    added = wanted - current
+    if removed:
+        db.session.execute(db.delete(UnitAmenity).where(
+            UnitAmenity.unit_id == unit_id, UnitAmenity.amenity_id.in_(removed)
+        ))
+    if added:
+        db.session.execute(insert(UnitAmenity.__table__), [
+            {'unit_id': unit_id, 'amenity_id': a} for a in added
+        ])
+    if added or removed:
+        unit_search.record_changes(db.session.connection(), [unit_id])
+    return added, removed
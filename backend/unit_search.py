@@ -0,0 +1,283 @@
+"""Faceted search over vacant units.
+
+Facet filters and counts run on per-process bitmaps: every vacant unit gets a
+bit position, and each tower, floor and amenity has an int whose set bits are
+the units carrying it. Counting a facet value is one AND and a popcount, so
+the cost does not grow with the number of matching units.
+
+Writers record touched unit ids in unit_search_changes (in the same
+transaction as the write); each worker replays new entries into its bitmaps
+at most every UNIT_SEARCH_SYNC_INTERVAL seconds and rebuilds from scratch
+every UNIT_SEARCH_REBUILD_INTERVAL seconds. Free text is matched in the
+database against the towers table and a trigram index on units.
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, insert, literal_column
+from extensions import db
+from models import Amenity, Tower, Unit, UnitAmenity, UnitSearchChange
+
+SEARCH_STATUS = 'Vacant'
+# Allow for clock skew between workers and for transactions that commit late
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def search_text():
+    # Must render the same expression as ix_units_search_trgm (models.UNIT_SEARCH_TEXT_SQL)
+    return literal_column("lower(units.unit_number || ' ' || coalesce(CAST(units.nearby_places AS TEXT), ''))")
+
+
+def _like_pattern(text):
+    escaped = text.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _on_primary(statement):
+    # The index state is only ever read from the primary: a replica lagging past
+    # SYNC_OVERLAP would hide changes that the next sync no longer asks for
+    return db.session.execute(statement, bind_arguments={'bind': db.engine})
+
+
+def record_changes(connection, unit_ids):
+    """Queue units for re-indexing in the current transaction; ``None`` in ``unit_ids`` forces a rebuild."""
+    rows = [{'unit_id': unit_id, 'changed_at': datetime.utcnow()} for unit_id in set(unit_ids)]
+    if rows:
+        connection.execute(insert(UnitSearchChange.__table__), rows)
+        db.session.info['unit_search_changed'] = True
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_unit_changes(session, flush_context):
+    unit_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Unit):
+            unit_ids.add(obj.id)
+        elif isinstance(obj, UnitAmenity):
+            unit_ids.add(obj.unit_id)
+        elif isinstance(obj, Amenity) and obj in session.deleted:
+            unit_ids.add(None)
+    if unit_ids:
+        record_changes(session.connection(), unit_ids)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_on_rollback(session):
+    session.info.pop('unit_search_changed', None)
+
+
+@event.listens_for(db.session, 'after_commit')
+def sync_own_writes(session):
+    # This worker's next search should see what it just wrote
+    if session.info.pop('unit_search_changed', None):
+        index.expire()
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._synced_at = None
+        self._applied = {}
+        self._next_sync = 0
+        self._next_rebuild = 0
+        self._reset()
+
+    def _reset(self):
+        self.slots = {}            # unit id -> bit position
+        self.keys = {}             # bit position -> (unit_number, unit id)
+        self.facets = {}           # unit id -> (tower_id, floor, amenity ids)
+        self.free_slots = []
+        self.next_slot = 0
+        self.vacant = 0
+        self.towers = defaultdict(int)
+        self.floors = defaultdict(int)
+        self.amenities = defaultdict(int)
+
+    def _add(self, unit_id, unit_number, tower_id, floor, amenity_ids):
+        slot = self.free_slots.pop() if self.free_slots else self._new_slot()
+        bit = 1 << slot
+        self.slots[unit_id] = slot
+        self.keys[slot] = (unit_number, unit_id)
+        self.facets[unit_id] = (tower_id, floor, amenity_ids)
+        self.vacant |= bit
+        self.towers[tower_id] |= bit
+        self.floors[floor] |= bit
+        for amenity_id in amenity_ids:
+            self.amenities[amenity_id] |= bit
+
+    def _new_slot(self):
+        self.next_slot += 1
+        return self.next_slot - 1
+
+    def _remove(self, unit_id):
+        slot = self.slots.pop(unit_id, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        tower_id, floor, amenity_ids = self.facets.pop(unit_id)
+        del self.keys[slot]
+        self.vacant &= mask
+        self.towers[tower_id] &= mask
+        self.floors[floor] &= mask
+        for amenity_id in amenity_ids:
+            self.amenities[amenity_id] &= mask
+        self.free_slots.append(slot)
+
+    def _load(self, unit_ids=None):
+        """Vacant units (optionally only ``unit_ids``) with their amenity ids, in one round trip each."""
+        units = db.select(Unit.id, Unit.unit_number, Unit.tower_id, Unit.floor) \
+            .where(Unit.status == SEARCH_STATUS)
+        links = db.select(UnitAmenity.unit_id, UnitAmenity.amenity_id) \
+            .join(Unit, Unit.id == UnitAmenity.unit_id).where(Unit.status == SEARCH_STATUS)
+        if unit_ids is not None:
+            units = units.where(Unit.id.in_(unit_ids))
+            links = links.where(Unit.id.in_(unit_ids))
+        amenities = defaultdict(set)
+        for unit_id, amenity_id in _on_primary(links):
+            amenities[unit_id].add(amenity_id)
+        return [(*row, frozenset(amenities[row[0]])) for row in _on_primary(units)]
+
+    def _changes_since(self, since):
+        return _on_primary(
+            db.select(UnitSearchChange.id, UnitSearchChange.unit_id, UnitSearchChange.changed_at)
+            .where(UnitSearchChange.changed_at >= since - SYNC_OVERLAP)
+        ).all()
+
+    def _rebuild(self):
+        now = datetime.utcnow()
+        # Changes already reflected in the rebuilt state must not be replayed,
+        # least of all a rebuild request, which would rebuild again
+        self._applied = {change.id: change.changed_at for change in self._changes_since(now)}
+        rows = self._load()
+        self._reset()
+        for row in rows:
+            self._add(*row)
+        self._built_at = self._synced_at = now
+        # Entries older than two rebuild intervals are covered by every worker's last rebuild
+        cutoff = now - 2 * timedelta(seconds=current_app.config['UNIT_SEARCH_REBUILD_INTERVAL'])
+        with db.engine.begin() as conn:
+            conn.execute(db.delete(UnitSearchChange).where(UnitSearchChange.changed_at < cutoff))
+
+    def _sync(self):
+        now = datetime.utcnow()
+        # The overlap window re-reads recent entries so late commits are not missed
+        changes = [c for c in self._changes_since(self._synced_at) if c.id not in self._applied]
+        if any(c.unit_id is None for c in changes):
+            self._rebuild()
+            return
+        changed = {c.unit_id for c in changes}
+        if changed:
+            rows = self._load(changed)
+            for unit_id in changed:
+                self._remove(unit_id)
+            for row in rows:
+                self._add(*row)
+        horizon = now - 2 * SYNC_OVERLAP
+        self._applied = {i: t for i, t in self._applied.items() if t >= horizon}
+        self._applied.update((c.id, c.changed_at) for c in changes)
+        self._synced_at = now
+
+    def _refresh(self):
+        if time.monotonic() < self._next_sync:
+            return
+        config = current_app.config
+        if self._built_at is None or time.monotonic() >= self._next_rebuild:
+            self._rebuild()
+            self._next_rebuild = time.monotonic() + config['UNIT_SEARCH_REBUILD_INTERVAL']
+        else:
+            self._sync()
+        self._next_sync = time.monotonic() + config['UNIT_SEARCH_SYNC_INTERVAL']
+
+    def expire(self):
+        self._next_sync = 0
+
+    def search(self, text=None, tower_ids=(), min_floor=None, max_floor=None, amenity_ids=(),
+               after=None, limit=50):
+        """Return ``(unit ids for one page, total, facet counts)``.
+
+        Towers are OR-ed, floors are a range and amenities must all be present.
+        Each facet's counts apply every filter except its own, except amenities,
+        whose counts say how many results would remain if that amenity were added.
+        """
+        text_towers, text_units = _match_text(text) if text else (None, None)
+        with self._lock:
+            self._refresh()
+
+            base = self.vacant
+            if text:
+                matched = 0
+                for tower_id in text_towers:
+                    matched |= self.towers.get(tower_id, 0)
+                for unit_id in text_units:
+                    slot = self.slots.get(unit_id)
+                    if slot is not None:
+                        matched |= 1 << slot
+                base &= matched
+
+            tower_mask = self.vacant
+            if tower_ids:
+                tower_mask = 0
+                for tower_id in tower_ids:
+                    tower_mask |= self.towers.get(tower_id, 0)
+
+            floor_mask = self.vacant
+            if min_floor is not None or max_floor is not None:
+                floor_mask = 0
+                for floor, bits in self.floors.items():
+                    if (min_floor is None or floor >= min_floor) and (max_floor is None or floor <= max_floor):
+                        floor_mask |= bits
+
+            amenity_mask = self.vacant
+            for amenity_id in amenity_ids:
+                amenity_mask &= self.amenities.get(amenity_id, 0)
+
+            result = base & tower_mask & floor_mask & amenity_mask
+            counts = {
+                'towers': _counts(self.towers, base & floor_mask & amenity_mask),
+                'floors': _counts(self.floors, base & tower_mask & amenity_mask),
+                'amenities': _counts(self.amenities, result),
+            }
+
+            keys = (self.keys[slot] for slot in _positions(result))
+            if after is not None:
+                keys = (key for key in keys if key > after)
+            page = heapq.nsmallest(limit + 1, keys)
+
+        return page, result.bit_count(), counts
+
+
+def _counts(bitmaps, mask):
+    counts = {}
+    for value, bits in bitmaps.items():
+        count = (bits & mask).bit_count()
+        if count:
+            counts[value] = count
+    return counts
+
+
+def _positions(bits):
+    # Scanning the binary string is far cheaper than peeling bits off a big int one at a time
+    binary = bin(bits)[:1:-1]
+    position = binary.find('1')
+    while position != -1:
+        yield position
+        position = binary.find('1', position + 1)
+
+
+def _match_text(text):
+    """Towers whose name matches, and vacant units whose number or nearby places match."""
+    pattern = _like_pattern(text)
+    tower_ids = set(db.session.scalars(
+        db.select(Tower.id).where(Tower.name.ilike(pattern, escape='\\'))
+    ))
+    unit_ids = set(db.session.scalars(
+        db.select(Unit.id).where(Unit.status == SEARCH_STATUS, search_text().like(pattern, escape='\\'))
+    ))
+    return tower_ids, unit_ids
+
+
+index = FacetIndex()
@@ -13,7 +13,7 @@ import { CommonModule } from '@angular/common';
       <div class="bg-white rounded-lg shadow-lg overflow-hidden border border-gray-200">
         <div class="px-6 py-4 border-b border-gray-200 bg-gray-50 flex justify-between items-center">
            <h3 class="text-lg font-medium text-gray-900">Transaction History</h3>
-           <span class="text-sm text-gray-500">{{ payments().length }} records found</span>
+           <span class="text-sm text-gray-500">{{ totals()?.count ?? payments().length }} records found<span *ngIf="totals()"> • {{ totals()!.amount | currency }} total</span></span>
         </div>
         
         <div class="overflow-x-auto">
@@ -60,6 +60,9 @@ import { CommonModule } from '@angular/common';
             </tbody>
           </table>
         </div>
+        <div *ngIf="nextCursor()" class="px-6 py-4 border-t border-gray-200 text-center">
+          <button (click)="loadMore()" class="text-indigo-600 hover:text-indigo-900 text-sm font-medium">Load more</button>
+        </div>
       </div>
     </div>
   `
@@ -67,8 +70,23 @@ import { CommonModule } from '@angular/common';
 export class AllPaymentsComponent {
   api = inject(ApiService);
   payments = signal<any[]>([]);
+  nextCursor = signal<string | null>(null);
+  totals = signal<{ count: number; amount: string } | null>(null);
 
   constructor() {
-    this.api.getPayments().subscribe(data => this.payments.set(data));
+    this.api.getPayments({ totals: 1 }).subscribe(page => {
+      this.payments.set(page.items);
+      this.nextCursor.set(page.next_cursor);
+      this.totals.set(page.totals ?? null);
+    });
+  }
+
+  loadMore() {
+    const cursor = this.nextCursor();
+    if (!cursor) return;
+    this.api.getPayments({ cursor }).subscribe(page => {
+      this.payments.update(payments => [...payments, ...page.items]);
+      this.nextCursor.set(page.next_cursor);
+    });
   }
 }
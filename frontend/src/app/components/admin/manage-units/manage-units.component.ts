@@ -164,6 +164,9 @@ import { FormBuilder, ReactiveFormsModule, Validators } from '@angular/forms';
             </tr>
           </tbody>
         </table>
+        <div *ngIf="nextCursor()" class="px-6 py-4 border-t border-gray-200 text-center">
+          <button (click)="loadMoreUnits()" class="text-indigo-600 hover:text-indigo-900 text-sm font-medium">Load more</button>
+        </div>
       </div>
     </div>
   `
@@ -174,6 +177,7 @@ export class ManageUnitsComponent {
   fb = inject(FormBuilder);
   
   units = signal<any[]>([]);
+  nextCursor = signal<string | null>(null);
   towers = signal<any[]>([]);
   amenities = signal<any[]>([]);
   activeForm = signal<'tower' | 'amenity' | 'unit' | null>(null);
@@ -205,11 +209,23 @@ export class ManageUnitsComponent {
   }
 
   loadData() {
-    this.api.getUnits().subscribe(data => this.units.set(data));
+    this.api.getUnits().subscribe(page => {
+      this.units.set(page.items);
+      this.nextCursor.set(page.next_cursor);
+    });
     this.api.getTowers().subscribe(data => this.towers.set(data));
     this.api.getAmenities().subscribe(data => this.amenities.set(data));
   }
 
+  loadMoreUnits() {
+    const cursor = this.nextCursor();
+    if (!cursor) return;
+    this.api.getUnits({ cursor }).subscribe(page => {
+      this.units.update(units => [...units, ...page.items]);
+      this.nextCursor.set(page.next_cursor);
+    });
+  }
+
   editUnit(unit: any) {
     this.editingUnitId.set(unit.id);
     this.unitForm.patchValue({
@@ -1,17 +1,48 @@
 import { Component, inject, signal } from '@angular/core';
-import { ApiService } from '../../../services/api.service';
+import { ApiService, Facet, UnitSearchPage } from '../../../services/api.service';
 import { NotificationService } from '../../../services/notification.service';
 import { UnitDetailsModalComponent } from '../../shared/unit-details-modal/unit-details-modal.component';
 import { CommonModule } from '@angular/common';
+import { FormsModule } from '@angular/forms';
 
 @Component({
   selector: 'app-browse-units',
   standalone: true,
-  imports: [CommonModule, UnitDetailsModalComponent],
+  imports: [CommonModule, FormsModule, UnitDetailsModalComponent],
   template: `
     <div class="container mx-auto p-4">
       <h2 class="text-3xl font-bold mb-6 text-gray-800">Available Flats</h2>
 
+      <div class="bg-white rounded-xl shadow-sm border border-gray-100 p-4 mb-8 space-y-4">
+        <input type="search" [(ngModel)]="query" (ngModelChange)="onQueryChange()"
+          placeholder="Search by unit, tower or nearby places"
+          class="w-full border rounded-lg py-2 px-3 text-gray-700 focus:outline-none focus:ring-2 focus:ring-indigo-200">
+
+        <div class="flex flex-wrap items-center gap-2">
+          <span class="text-xs font-semibold text-gray-500 uppercase w-20">Towers</span>
+          <button *ngFor="let f of facets().towers" (click)="toggle(selectedTowers, f.id!)"
+            [class]="chipClass(selectedTowers.has(f.id!))">{{ f.name }} ({{ f.count }})</button>
+        </div>
+        <div class="flex flex-wrap items-center gap-2">
+          <span class="text-xs font-semibold text-gray-500 uppercase w-20">Floors</span>
+          <select [(ngModel)]="minFloor" (ngModelChange)="search()" class="border rounded py-1 px-2 text-sm bg-white">
+            <option [ngValue]="null">Any</option>
+            <option *ngFor="let f of facets().floors" [ngValue]="f.floor">{{ f.floor }} ({{ f.count }})</option>
+          </select>
+          <span class="text-gray-400 text-sm">to</span>
+          <select [(ngModel)]="maxFloor" (ngModelChange)="search()" class="border rounded py-1 px-2 text-sm bg-white">
+            <option [ngValue]="null">Any</option>
+            <option *ngFor="let f of facets().floors" [ngValue]="f.floor">{{ f.floor }} ({{ f.count }})</option>
+          </select>
+        </div>
+        <div class="flex flex-wrap items-center gap-2">
+          <span class="text-xs font-semibold text-gray-500 uppercase w-20">Amenities</span>
+          <button *ngFor="let f of facets().amenities" (click)="toggle(selectedAmenities, f.id!)"
+            [class]="chipClass(selectedAmenities.has(f.id!))">{{ f.name }} ({{ f.count }})</button>
+        </div>
+        <p class="text-sm text-gray-500">{{ total() }} flat{{ total() === 1 ? '' : 's' }} match</p>
+      </div>
+
       <div *ngIf="loading()" class="flex justify-center py-10">
         <div class="animate-spin rounded-full h-12 w-12 border-b-2 border-indigo-600"></div>
       </div>
@@ -60,6 +91,13 @@ import { CommonModule } from '@angular/common';
         </div>
       </div>
 
+      <div *ngIf="nextCursor()" class="flex justify-center mt-8">
+        <button (click)="loadMore()" [disabled]="loading()"
+          class="text-indigo-600 border border-indigo-200 hover:bg-indigo-50 px-6 py-2 rounded-lg font-medium text-sm transition-colors disabled:opacity-50">
+          Load more
+        </button>
+      </div>
+
       <div *ngIf="!loading() && units().length === 0" class="text-center py-20 bg-gray-50 rounded-lg mt-6">
         <p class="text-gray-500 text-lg">No available units found at the moment.</p>
       </div>
@@ -79,23 +117,83 @@ export class BrowseUnitsComponent {
   
   units = signal<any[]>([]);
   loading = signal(true);
+  nextCursor = signal<string | null>(null);
   selectedUnit = signal<any>(null);
+  total = signal(0);
+  facets = signal<{ towers: Facet[]; floors: Facet[]; amenities: Facet[] }>({ towers: [], floors: [], amenities: [] });
+
+  query = '';
+  minFloor: number | null = null;
+  maxFloor: number | null = null;
+  selectedTowers = new Set<string>();
+  selectedAmenities = new Set<string>();
+  private queryTimer: any;
 
   constructor() {
     this.loadUnits();
   }
 
+  private filters(): Record<string, string | number | string[]> {
+    const filters: Record<string, string | number | string[]> = {};
+    if (this.query.trim()) filters['q'] = this.query.trim();
+    if (this.minFloor !== null) filters['min_floor'] = this.minFloor;
+    if (this.maxFloor !== null) filters['max_floor'] = this.maxFloor;
+    if (this.selectedTowers.size) filters['tower_id'] = [...this.selectedTowers];
+    if (this.selectedAmenities.size) filters['amenity_ids'] = [...this.selectedAmenities];
+    return filters;
+  }
+
   loadUnits() {
     this.loading.set(true);
-    this.api.getUnits().subscribe({
-      next: (data) => {
-        this.units.set(data);
-        this.loading.set(false);
+    this.api.searchUnits(this.filters()).subscribe({
+      next: (page) => {
+        this.units.set(page.items);
+        this.applyPage(page);
       },
       error: () => this.loading.set(false)
     });
   }
-  
+
+  loadMore() {
+    const cursor = this.nextCursor();
+    if (!cursor) return;
+    this.loading.set(true);
+    this.api.searchUnits({ ...this.filters(), cursor }).subscribe({
+      next: (page) => {
+        this.units.update(units => [...units, ...page.items]);
+        this.applyPage(page);
+      },
+      error: () => this.loading.set(false)
+    });
+  }
+
+  private applyPage(page: UnitSearchPage<any>) {
+    this.nextCursor.set(page.next_cursor);
+    this.total.set(page.total);
+    this.facets.set(page.facets);
+    this.loading.set(false);
+  }
+
+  search() {
+    this.loadUnits();
+  }
+
+  onQueryChange() {
+    // Wait for typing to pause before hitting the server
+    clearTimeout(this.queryTimer);
+    this.queryTimer = setTimeout(() => this.search(), 300);
+  }
+
+  toggle(selected: Set<string>, id: string) {
+    selected.has(id) ? selected.delete(id) : selected.add(id);
+    this.search();
+  }
+
+  chipClass(active: boolean) {
+    return 'text-xs px-3 py-1 rounded-full border transition-colors ' +
+      (active ? 'bg-indigo-600 text-white border-indigo-600' : 'bg-indigo-50 text-indigo-700 border-indigo-100 hover:bg-indigo-100');
+  }
+
   openDetails(unit: any) {
     this.selectedUnit.set(unit);
   }
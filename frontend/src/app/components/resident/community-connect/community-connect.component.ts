@@ -3,6 +3,7 @@ import { CommonModule } from '@angular/common';
 import { ApiService } from '../../../services/api.service';
 import { NotificationService } from '../../../services/notification.service';
 import { FormsModule } from '@angular/forms';
+import { map } from 'rxjs';
 
 @Component({
   selector: 'app-community-connect',
@@ -30,6 +31,13 @@ import { FormsModule } from '@angular/forms';
           {{ type === 'All' ? 'All Helpers' : type }}
         </button>
       </div>
+      <div class="mb-8 flex justify-center">
+        <label class="inline-flex items-center gap-2 text-gray-700 font-medium cursor-pointer">
+          <input type="checkbox" [ngModel]="availableNow()" (ngModelChange)="toggleAvailableNow($event)"
+                 class="h-4 w-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-500">
+          Available now
+        </label>
+      </div>
 
       <div *ngIf="loading()" class="flex justify-center py-12">
         <div class="animate-spin rounded-full h-16 w-16 border-t-4 border-b-4 border-indigo-600"></div>
@@ -107,6 +115,7 @@ export class CommunityConnectComponent implements OnInit {
   filteredProviders = signal<any[]>([]);
   loading = signal<boolean>(true);
   selectedType = signal<string>('All');
+  availableNow = signal<boolean>(false);
   
   serviceTypes = ['All', 'Maid', 'Cook', 'Driver', 'Cleaner', 'Plumber', 'Electrician'];
 
@@ -121,7 +130,10 @@ export class CommunityConnectComponent implements OnInit {
 
   loadProviders() {
     this.loading.set(true);
-    this.api.getServiceProviders().subscribe({
+    const source = this.availableNow()
+      ? this.api.getAvailableProviders({ limit: 100 }).pipe(map(page => page.items))
+      : this.api.getServiceProviders();
+    source.subscribe({
       next: (data) => {
         this.providers.set(data);
         this.filterType(this.selectedType());
@@ -135,6 +147,11 @@ export class CommunityConnectComponent implements OnInit {
     });
   }
 
+  toggleAvailableNow(value: boolean) {
+    this.availableNow.set(value);
+    this.loadProviders();
+  }
+
   filterType(type: string) {
     this.selectedType.set(type);
     if (type === 'All') {
@@ -46,6 +46,9 @@ import { FormsModule } from '@angular/forms';
             </tr>
           </tbody>
         </table>
+        <div *ngIf="nextCursor()" class="px-6 py-4 border-t border-gray-200 text-center">
+          <button (click)="loadMorePayments()" class="text-indigo-600 hover:text-indigo-900 text-sm font-medium">Load more</button>
+        </div>
       </div>
       
       <!-- Payment Form -->
@@ -95,6 +98,7 @@ export class MyPaymentsComponent {
   notification = inject(NotificationService);
   
   payments = signal<any[]>([]);
+  nextCursor = signal<string | null>(null);
   leases = signal<any[]>([]);
   selectedLeaseId = signal<string>('');
   
@@ -113,7 +117,19 @@ export class MyPaymentsComponent {
   }
 
   loadPayments() {
-    this.api.getPayments().subscribe(data => this.payments.set(data));
+    this.api.getPayments().subscribe(page => {
+      this.payments.set(page.items);
+      this.nextCursor.set(page.next_cursor);
+    });
+  }
+
+  loadMorePayments() {
+    const cursor = this.nextCursor();
+    if (!cursor) return;
+    this.api.getPayments({ cursor }).subscribe(page => {
+      this.payments.update(payments => [...payments, ...page.items]);
+      this.nextCursor.set(page.next_cursor);
+    });
   }
 
   loadLeases() {
@@ -1,19 +1,32 @@
-import { HttpInterceptorFn } from '@angular/common/http';
+import { HttpErrorResponse, HttpInterceptorFn, HttpRequest } from '@angular/common/http';
 import { inject } from '@angular/core';
+import { catchError, switchMap, throwError } from 'rxjs';
 import { AuthService } from '../services/auth.service';
 
+const withToken = (req: HttpRequest<unknown>, token: string | null) =>
+  token ? req.clone({ setHeaders: { Authorization: `Bearer ${token}` } }) : req;
+
 export const authInterceptor: HttpInterceptorFn = (req, next) => {
   const authService = inject(AuthService);
-  const token = authService.getToken();
 
-  if (token) {
-    const cloned = req.clone({
-      setHeaders: {
-        Authorization: `Bearer ${token}`
-      }
-    });
-    return next(cloned);
+  // Auth endpoints carry their own credentials (password or refresh token)
+  if (req.url.startsWith('/api/auth/')) {
+    return next(req);
   }
 
-  return next(req);
+  return next(withToken(req, authService.getToken())).pipe(
+    catchError((err: unknown) => {
+      if (!(err instanceof HttpErrorResponse) || err.status !== 401 || !authService.hasValidRefreshToken()) {
+        return throwError(() => err);
+      }
+      // Access token expired: refresh once and replay the request
+      return authService.refresh().pipe(
+        switchMap(token => next(withToken(req, token))),
+        catchError(refreshErr => {
+          authService.logout();
+          return throwError(() => refreshErr);
+        })
+      );
+    })
+  );
 };
@@ -1,5 +1,23 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
+import { HttpClient, HttpParams } from '@angular/common/http';
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+  totals?: { count: number; amount: string };
+}
+
+export interface Facet {
+  id?: string;
+  name?: string;
+  floor?: number;
+  count: number;
+}
+
+export interface UnitSearchPage<T> extends Page<T> {
+  total: number;
+  facets: { towers: Facet[]; floors: Facet[]; amenities: Facet[] };
+}
 
 @Injectable({
   providedIn: 'root'
@@ -24,10 +42,16 @@ export class ApiService {
   }
 
   // Units
-  getUnits() {
-    return this.http.get<any[]>(`${this.apiUrl}/units`);
+  getUnits(filters: Record<string, string | number> = {}) {
+    const params = new HttpParams({ fromObject: filters });
+    return this.http.get<Page<any>>(`${this.apiUrl}/units`, { params });
   }
   
+  searchUnits(filters: Record<string, string | number | string[]> = {}) {
+    const params = new HttpParams({ fromObject: filters });
+    return this.http.get<UnitSearchPage<any>>(`${this.apiUrl}/units/search`, { params });
+  }
+
   createUnit(data: any) {
     return this.http.post(`${this.apiUrl}/units`, data);
   }
@@ -76,8 +100,9 @@ export class ApiService {
   }
 
   // Payments
-  getPayments() {
-    return this.http.get<any[]>(`${this.apiUrl}/payments`);
+  getPayments(filters: Record<string, string | number> = {}) {
+    const params = new HttpParams({ fromObject: filters });
+    return this.http.get<Page<any>>(`${this.apiUrl}/payments`, { params });
   }
 
   makePayment(data: any) {
@@ -97,4 +122,9 @@ export class ApiService {
     }
     return this.http.get<any[]>(url);
   }
+
+  getAvailableProviders(filters: Record<string, string | number> = {}) {
+    const params = new HttpParams({ fromObject: filters });
+    return this.http.get<Page<any>>(`${this.apiUrl}/service-providers/available`, { params });
+  }
 }
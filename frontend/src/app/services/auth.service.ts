@@ -1,7 +1,8 @@
 import { Injectable, signal, computed } from '@angular/core';
 import { Router } from '@angular/router';
 import { HttpClient } from '@angular/common/http';
-import { tap } from 'rxjs/operators';
+import { Observable } from 'rxjs';
+import { finalize, map, shareReplay, tap } from 'rxjs/operators';
 import { jwtDecode } from 'jwt-decode';
 
 @Injectable({
@@ -10,6 +11,8 @@ import { jwtDecode } from 'jwt-decode';
 export class AuthService {
   private apiUrl = '/api/auth';
   private tokenKey = 'auth_token';
+  private refreshTokenKey = 'refresh_token';
+  private refreshInFlight: Observable<string> | null = null;
   
   // Signals
   currentUser = signal<any>(null);
@@ -26,8 +29,9 @@ export class AuthService {
     if (token) {
       try {
         const decoded: any = jwtDecode(token);
-        // Check for expiration
-        if (decoded.exp && decoded.exp * 1000 < Date.now()) {
+        // An expired access token is fine while the refresh token is still valid;
+        // the interceptor exchanges it on the first 401.
+        if (decoded.exp && decoded.exp * 1000 < Date.now() && !this.hasValidRefreshToken()) {
           this.logout();
           return;
         }
@@ -39,24 +43,62 @@ export class AuthService {
   }
 
   login(credentials: any) {
-    return this.http.post<{ access_token: string }>(`${this.apiUrl}/login`, credentials).pipe(
-      tap(response => {
-        localStorage.setItem(this.tokenKey, response.access_token);
-        const decoded: any = jwtDecode(response.access_token);
-        // JWT decode usually gives 'sub' as identity.
-        // My backend returns { identity: id, role: role } in claims.
-        // Let's ensure backend claims are consistent.
-        this.currentUser.set(decoded);
-      })
+    return this.http.post<{ access_token: string, refresh_token: string }>(`${this.apiUrl}/login`, credentials).pipe(
+      tap(response => this.storeTokens(response))
     );
   }
 
+  // Exchanges the refresh token for a new token pair. Concurrent callers share
+  // one request, since a refresh token may only be used once.
+  refresh(): Observable<string> {
+    if (!this.refreshInFlight) {
+      const refreshToken = localStorage.getItem(this.refreshTokenKey);
+      this.refreshInFlight = this.http.post<{ access_token: string, refresh_token: string }>(
+        `${this.apiUrl}/refresh`, {}, { headers: { Authorization: `Bearer ${refreshToken}` } }
+      ).pipe(
+        tap(response => this.storeTokens(response)),
+        map(response => response.access_token),
+        finalize(() => this.refreshInFlight = null),
+        shareReplay(1)
+      );
+    }
+    return this.refreshInFlight;
+  }
+
+  hasValidRefreshToken() {
+    const refreshToken = localStorage.getItem(this.refreshTokenKey);
+    if (!refreshToken) return false;
+    try {
+      const decoded: any = jwtDecode(refreshToken);
+      return !decoded.exp || decoded.exp * 1000 > Date.now();
+    } catch (e) {
+      return false;
+    }
+  }
+
+  private storeTokens(response: { access_token: string, refresh_token: string }) {
+    localStorage.setItem(this.tokenKey, response.access_token);
+    localStorage.setItem(this.refreshTokenKey, response.refresh_token);
+    const decoded: any = jwtDecode(response.access_token);
+    // JWT decode usually gives 'sub' as identity.
+    // My backend returns { identity: id, role: role } in claims.
+    // Let's ensure backend claims are consistent.
+    this.currentUser.set(decoded);
+  }
+
   register(data: any) {
     return this.http.post(`${this.apiUrl}/register`, data);
   }
 
   logout() {
+    const refreshToken = localStorage.getItem(this.refreshTokenKey);
+    if (refreshToken) {
+      // Revoke the device session server-side; nothing to do if it fails
+      this.http.post(`${this.apiUrl}/logout`, {}, { headers: { Authorization: `Bearer ${refreshToken}` } })
+        .subscribe({ error: () => {} });
+    }
     localStorage.removeItem(this.tokenKey);
+    localStorage.removeItem(this.refreshTokenKey);
     this.currentUser.set(null);
     this.router.navigate(['/login']);
   }